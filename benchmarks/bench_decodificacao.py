@@ -0,0 +1,63 @@
+"""
+Benchmark da decodificação de respostas de criação de plano.
+
+Compara o caminho antigo, com requests.Response.json() e astimezone(pytz.UTC), com a decodificação direta dos bytes
+de pygseguro.decodificacao usando cada backend de json instalado. A resposta é a típica do pagseguro, cujo
+Content-Type não informa o charset.
+
+Execute a partir da raiz do projeto com: python -m benchmarks.bench_decodificacao
+"""
+import timeit
+from datetime import datetime
+
+import pytz
+import requests
+
+from pygseguro.decodificacao import BACKENDS_JSON, decodificar_data, decodificar_json, definir_backend_json
+
+REPETICOES = 50_000
+CONTEUDO = b'{"code":"5CDF6542C6C6D5F114674FB885E40FC0","date":"2019-04-29T21:38:04-03:00"}'
+HEADERS = {'Content-Type': 'application/json'}
+
+
+def _resposta_requests() -> requests.Response:
+    resposta = requests.Response()
+    resposta.status_code = 200
+    resposta._content = CONTEUDO
+    resposta.headers.update(HEADERS)
+    return resposta
+
+
+RESPOSTA = _resposta_requests()
+
+
+def _caminho_antigo():
+    dados = RESPOSTA.json()
+    return dados['code'], datetime.fromisoformat(dados['date']).astimezone(pytz.UTC)
+
+
+def _caminho_novo():
+    dados = decodificar_json(RESPOSTA.content, RESPOSTA.headers)
+    return dados['code'], decodificar_data(dados['date'])
+
+
+def _microsegundos(funcao) -> float:
+    return min(timeit.repeat(funcao, number=REPETICOES, repeat=5)) / REPETICOES * 1e6
+
+
+def main() -> None:
+    antigo = _microsegundos(_caminho_antigo)
+    print(f'{"requests.json + pytz":24} {antigo:6.2f} us/resposta')
+    for nome in BACKENDS_JSON:
+        try:
+            definir_backend_json(nome)
+        except ImportError:
+            print(f'{nome:24} não instalado')
+            continue
+        novo = _microsegundos(_caminho_novo)
+        print(f'{nome:24} {novo:6.2f} us/resposta ({antigo / novo:.1f}x)')
+    definir_backend_json('json')
+
+
+if __name__ == '__main__':
+    main()
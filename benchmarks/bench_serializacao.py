@@ -0,0 +1,46 @@
+"""
+Benchmark da serialização do corpo de criação de plano.
+
+Compara o caminho antigo, em que o dicionário inteiro é convertido para json a cada requisição, com o corpo
+pré-serializado de um ModeloPlanoRecorrente, em que apenas a referência é serializada por requisição.
+
+Execute a partir da raiz do projeto com: python -m benchmarks.bench_serializacao
+"""
+import json
+import timeit
+from decimal import Decimal
+
+from pygseguro import ConfigConta, CriadorPlanoRecorrente, SANDBOX
+
+REPETICOES = 100_000
+
+
+def _passo_tipico():
+    cfg = ConfigConta('renzo@python.pro.br', '396FC29DE4A54967BF6DCADE65100E88', SANDBOX)
+    return CriadorPlanoRecorrente(cfg).plano_automatico_idenficacao(
+        'SEU_CODIGO_DE_REFERENCIA', 'Plano Turma de Curso de Python', 'Plano de pagamento da turma Luciano Ramalho',
+        'renzo@python.pro.br').expiracao_em_meses(10).valores_automaticos(
+        Decimal('180.00'), Decimal('30.39')).frequencia_mensal().trial(2).limite_de_uso(100).urls_gancho(
+        'https://seusite.com.br/obrigado', 'https://seusite.com.br/revisar', 'https://seusite.com.br/cancelar')
+
+
+def main() -> None:
+    passo = _passo_tipico()
+    modelo = passo.compilar_modelo()
+    main_data = passo._main_data
+
+    def antigo():
+        dados = dict(main_data, reference='REF-123456')
+        return json.dumps(dados).encode('utf-8')
+
+    def pre_serializado():
+        return modelo.corpo('REF-123456')
+
+    assert json.loads(antigo()) == json.loads(pre_serializado())
+    for nome, funcao in (('json.dumps por requisição', antigo), ('corpo pré-serializado', pre_serializado)):
+        segundos = min(timeit.repeat(funcao, number=REPETICOES, repeat=5))
+        print(f'{nome:28} {segundos / REPETICOES * 1e6:8.2f} us/corpo')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""
+Suíte de benchmarks da biblioteca, executável sem acesso à rede.
+
+Mede o tempo de import do pacote, a construção da cadeia CriadorPlanoRecorrente -> UltimoPasso (tempo e memória),
+a geração de payloads a partir de modelos, o caminho completo de criar_no_pagseguro contra o simulador local do
+pagseguro (vazão e latências p50/p99) e o custo de obter as cobranças vencidas de cada dia na agenda de cobranças.
+
+Os resultados são comparados com benchmarks/baseline.json e o processo termina com código 1 se alguma métrica
+regredir além da tolerância. Métricas terminadas em `_por_s` são melhores quando maiores; as demais, quando menores.
+Como os números dependem da máquina, atualize a baseline sempre na mesma máquina usada para comparar.
+
+Execute a partir da raiz do projeto com:
+    python -m benchmarks.executar                      # compara com a baseline
+    python -m benchmarks.executar --atualizar-baseline  # grava os resultados como nova baseline
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Callable, Dict
+
+from pygseguro import (AgendaDeCobrancas, Assinatura, Cliente, ConfigConta, CriadorPlanoRecorrente, SANDBOX,
+                       criar_em_lote)
+from pygseguro.plano_recorrente_automatico import PlanoAutomaticoRecorrente
+from pygseguro.simulador import SimuladorPagseguro
+
+CAMINHO_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+TOLERANCIA_PADRAO = 0.3
+
+BENCHMARKS: Dict[str, Callable[[], Dict[str, float]]] = {}
+
+
+def benchmark(funcao: Callable[[], Dict[str, float]]) -> Callable[[], Dict[str, float]]:
+    BENCHMARKS[funcao.__name__] = funcao
+    return funcao
+
+
+def _cadeia_completa(config: ConfigConta, referencia: str = 'SEU_CODIGO_DE_REFERENCIA'):
+    return CriadorPlanoRecorrente(config).plano_automatico_idenficacao(
+        referencia, 'Plano Turma de Curso de Python', 'Plano de pagamento da turma Luciano Ramalho',
+        'renzo@python.pro.br').expiracao_em_meses(10).valores_automaticos(
+        Decimal('180.00'), Decimal('30.39')).frequencia_mensal().trial(2).limite_de_uso(100).urls_gancho(
+        'https://seusite.com.br/obrigado', 'https://seusite.com.br/revisar', 'https://seusite.com.br/cancelar')
+
+
+def _config(ambiente: str = SANDBOX, cliente: Cliente = None) -> ConfigConta:
+    return ConfigConta('renzo@python.pro.br', '396FC29DE4A54967BF6DCADE65100E88', ambiente, cliente=cliente)
+
+
+def _microsegundos(funcao: Callable, numero: int) -> float:
+    return min(timeit.repeat(funcao, number=numero, repeat=5)) / numero * 1e6
+
+
+@benchmark
+def importacao() -> Dict[str, float]:
+    tempos = []
+    for _ in range(5):
+        saida = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import pygseguro'], capture_output=True,
+                               text=True, check=True).stderr
+        linha_pacote = next(linha for linha in saida.splitlines() if linha.endswith('| pygseguro'))
+        tempos.append(int(linha_pacote.split('|')[1]))
+    return {'us_import_pacote': min(tempos)}
+
+
+@benchmark
+def construcao_cadeia() -> Dict[str, float]:
+    config = _config()
+    return {'us_por_cadeia': _microsegundos(lambda: _cadeia_completa(config), 5_000)}
+
+
+@benchmark
+def memoria_cadeia() -> Dict[str, float]:
+    config = _config()
+    quantidade = 2_000
+    tracemalloc.start()
+    try:
+        antes = tracemalloc.take_snapshot()
+        cadeias = [_cadeia_completa(config) for _ in range(quantidade)]
+        depois = tracemalloc.take_snapshot()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    retido = sum(estatistica.size_diff for estatistica in depois.compare_to(antes, 'filename'))
+    del cadeias
+    return {'bytes_retidos_por_cadeia': retido / quantidade, 'bytes_pico_por_cadeia': pico / quantidade}
+
+
+@benchmark
+def memoria_planos() -> Dict[str, float]:
+    quantidade = 20_000
+    criacao = datetime(2019, 4, 30, 0, 38, 4, tzinfo=timezone.utc)
+    tracemalloc.start()
+    try:
+        antes = tracemalloc.take_snapshot()
+        planos = [PlanoAutomaticoRecorrente(f'{i:032X}', criacao) for i in range(quantidade)]
+        depois = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    retido = sum(estatistica.size_diff for estatistica in depois.compare_to(antes, 'filename'))
+    del planos
+    return {'bytes_retidos_por_plano': retido / quantidade}
+
+
+@benchmark
+def payload_de_modelo() -> Dict[str, float]:
+    modelo = _cadeia_completa(_config()).compilar_modelo()
+    return {
+        'us_por_payload': _microsegundos(lambda: modelo.payload('REF-1', Decimal('99.90')), 20_000),
+        'us_por_corpo': _microsegundos(lambda: modelo.corpo('REF-1'), 20_000),
+    }
+
+
+def _latencias(funcao: Callable, quantidade: int) -> Dict[str, float]:
+    duracoes = []
+    inicio = time.perf_counter()
+    for _ in range(quantidade):
+        comeco = time.perf_counter()
+        funcao()
+        duracoes.append(time.perf_counter() - comeco)
+    total = time.perf_counter() - inicio
+    percentis = statistics.quantiles(duracoes, n=100)
+    return {'criacoes_por_s': quantidade / total, 'p50_ms': percentis[49] * 1e3, 'p99_ms': percentis[98] * 1e3}
+
+
+@benchmark
+def criacao_sequencial() -> Dict[str, float]:
+    with SimuladorPagseguro() as servidor:
+        cliente = Cliente()
+        passo = _cadeia_completa(_config(servidor.url, cliente))
+        passo.criar_no_pagseguro()
+        resultado = _latencias(passo.criar_no_pagseguro, 500)
+        cliente.fechar()
+    return resultado
+
+
+@benchmark
+def criacao_em_lote() -> Dict[str, float]:
+    quantidade = 1_000
+    with SimuladorPagseguro() as servidor:
+        cliente = Cliente(tamanho_pool=16)
+        config = _config(servidor.url, cliente)
+        modelo = _cadeia_completa(config).compilar_modelo()
+        inicio = time.perf_counter()
+        resultados = list(criar_em_lote((modelo.passo(f'REF-{i}') for i in range(quantidade)), concorrencia=16))
+        total = time.perf_counter() - inicio
+        cliente.fechar()
+    assert all(resultado.sucesso for resultado in resultados)
+    return {'criacoes_por_s': quantidade / total}
+
+
+@benchmark
+def agenda_de_cobrancas() -> Dict[str, float]:
+    quantidade = 200_000
+    inicio = date(2019, 1, 1)
+    agenda = AgendaDeCobrancas()
+    for i in range(quantidade):
+        agenda.adicionar(Assinatura(f'S{i}', 'MONTHLY', inicio + timedelta(days=i % 28), dias_trial=i % 3))
+    dias = [inicio + timedelta(days=i) for i in range(90)]
+    comeco = time.perf_counter()
+    cobrancas = sum(1 for dia in dias for _ in agenda.vencidas(dia))
+    total = time.perf_counter() - comeco
+    return {'us_por_cobranca': total / cobrancas * 1e6, 'ms_por_dia': total / len(dias) * 1e3}
+
+
+def comparar(resultados: Dict, baseline: Dict, tolerancia: float) -> list:
+    """
+    Compara resultados com a baseline
+    :return: lista de descrições das métricas que regrediram
+    """
+    regressoes = []
+    for nome, metricas in baseline.items():
+        for metrica, valor_base in metricas.items():
+            atual = resultados.get(nome, {}).get(metrica)
+            if atual is None:
+                continue
+            if metrica.endswith('_por_s'):
+                regrediu = atual < valor_base * (1 - tolerancia)
+            else:
+                regrediu = atual > valor_base * (1 + tolerancia)
+            if regrediu:
+                regressoes.append(f'{nome}.{metrica}: {atual:.2f} (baseline {valor_base:.2f})')
+    return regressoes
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--atualizar-baseline', action='store_true', help='grava os resultados como nova baseline')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_PADRAO,
+                        help='variação relativa aceita antes de considerar regressão (padrão: 0.3)')
+    parser.add_argument('benchmarks', nargs='*', choices=[[]] + list(BENCHMARKS), help='benchmarks a executar')
+    argumentos = parser.parse_args(argv)
+
+    resultados = {}
+    for nome in argumentos.benchmarks or BENCHMARKS:
+        resultados[nome] = BENCHMARKS[nome]()
+        metricas = ', '.join(f'{metrica}={valor:.2f}' for metrica, valor in resultados[nome].items())
+        print(f'{nome:22} {metricas}')
+
+    if argumentos.atualizar_baseline:
+        with open(CAMINHO_BASELINE, 'w') as arquivo:
+            json.dump(resultados, arquivo, indent=2, sort_keys=True)
+            arquivo.write('\n')
+        print(f'Baseline gravada em {CAMINHO_BASELINE}')
+        return 0
+
+    if not os.path.exists(CAMINHO_BASELINE):
+        print('Nenhuma baseline encontrada. Execute com --atualizar-baseline para criar uma.')
+        return 0
+    with open(CAMINHO_BASELINE) as arquivo:
+        regressoes = comparar(resultados, json.load(arquivo), argumentos.tolerancia)
+    for regressao in regressoes:
+        print(f'REGRESSÃO {regressao}')
+    return 1 if regressoes else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
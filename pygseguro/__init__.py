@@ -1,20 +1,74 @@
 """
 Esse módulo implementa o padrão de projeto Fachada de forma pytonica.
 
-Ele é interface para acessar todos elememntos da biblioteca
+Ele é interface para acessar todos elememntos da biblioteca. Apenas a configuração é importada junto com o pacote;
+os demais elementos são importados na primeira vez em que são acessados (PEP 562), de forma que `requests` e `pytz`
+só são carregados quando uma requisição é de fato feita.
 """
+from importlib import import_module
+from typing import TYPE_CHECKING
 
 from pygseguro import config as _config
-from pygseguro.plano_recorrente_automatico import CriadorPlanoRecorrente as _C
+
+if TYPE_CHECKING:
+    from pygseguro.cliente import CacheDeClientes, Cliente
 
 __version__ = '0.1'
 
 ConfigConta = _config.ConfigConta  # Dando visibilidade na fachada para a classe ConfigConta
 ConfigApp = _config.ConfigApp
 Config = _config.Config
-CriadorPlanoRecorrente = _C
 PRODUCAO = _config.PRODUCAO
 SANDBOX = _config.SANDBOX
+usar_config = _config.usar_config
+
+# Elementos da fachada carregados sob demanda: nome -> módulo onde estão definidos
+_ELEMENTOS_SOB_DEMANDA = {
+    'Cliente': 'pygseguro.cliente',
+    'get_cliente_padrao': 'pygseguro.cliente',
+    'CacheDeClientes': 'pygseguro.cliente',
+    'CacheDeConsultas': 'pygseguro.cache',
+    'Idempotencia': 'pygseguro.idempotencia',
+    'ArmazenamentoEmMemoria': 'pygseguro.idempotencia',
+    'ArmazenamentoSqlite': 'pygseguro.idempotencia',
+    'RegistroDePlanos': 'pygseguro.registro',
+    'CaixaDeSaida': 'pygseguro.caixa_de_saida',
+    'Assinatura': 'pygseguro.agendamento',
+    'AgendaDeCobrancas': 'pygseguro.agendamento',
+    'TabelaDePlanos': 'pygseguro.projecao',
+    'projetar': 'pygseguro.projecao',
+    'projetar_em_blocos': 'pygseguro.projecao',
+    'PoliticaRetentativa': 'pygseguro.resiliencia',
+    'Disjuntor': 'pygseguro.resiliencia',
+    'LimitadorPorCredencial': 'pygseguro.limitador',
+    'HistogramaEmMemoria': 'pygseguro.instrumentacao',
+    'registrar_coletor': 'pygseguro.instrumentacao',
+    'remover_coletor': 'pygseguro.instrumentacao',
+    'CriadorPlanoRecorrente': 'pygseguro.plano_recorrente_automatico',
+    'ModeloPlanoRecorrente': 'pygseguro.plano_recorrente_automatico',
+    'ResultadoLote': 'pygseguro.plano_recorrente_automatico',
+    'criar_em_lote': 'pygseguro.plano_recorrente_automatico',
+    'criar_em_lote_async': 'pygseguro.plano_recorrente_automatico',
+    'definir_backend_json': 'pygseguro.decodificacao',
+    'BuscaRecorrente': 'pygseguro.consulta',
+}
+
+
+def __getattr__(nome: str):
+    """
+    Importa o módulo do elemento na primeira vez em que ele é acessado e guarda o elemento na fachada
+    :param nome: nome do elemento
+    :return: elemento da fachada
+    """
+    modulo = _ELEMENTOS_SOB_DEMANDA.get(nome)
+    if modulo is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {nome!r}')
+    valor = globals()[nome] = getattr(import_module(modulo), nome)
+    return valor
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_ELEMENTOS_SOB_DEMANDA))
 
 
 def apagar_config_padrao() -> None:
@@ -33,3 +87,28 @@ def set_config_padrao(config: Config):
     :param config: ConfigConta
     """
     _config.config_padrao = config
+
+
+def set_cliente_padrao(cliente: 'Cliente'):
+    """
+    Função que altera o cliente HTTP padrão utilizado pelas configurações sem cliente próprio
+    :param cliente: Cliente
+    """
+    import_module('pygseguro.cliente').cliente_padrao = cliente
+
+
+def set_cache_de_clientes(cache: 'CacheDeClientes'):
+    """
+    Função que define o cache de clientes por credencial utilizado pelas configurações sem cliente próprio.
+    None volta a usar o cliente padrão para todas as credenciais
+    :param cache: CacheDeClientes
+    """
+    import_module('pygseguro.cliente').clientes_por_credencial = cache
+
+
+def set_validacao_ativa(ativa: bool):
+    """
+    Função que liga ou desliga a validação local feita antes de criar planos no pagseguro
+    :param ativa: False para enviar os planos sem validá-los
+    """
+    import_module('pygseguro.validacao').ativa = ativa
@@ -0,0 +1,236 @@
+"""
+Esse módulo contém a agenda de cobranças das assinaturas de planos automáticos.
+
+A agenda mantém as assinaturas em um heap ordenado pela data da próxima cobrança. Pedir as cobranças de um dia retira do
+topo do heap apenas as assinaturas vencidas, avança cada uma para a cobrança seguinte de acordo com a frequência do
+plano, o período de testes e a expiração, e as devolve ao heap. O custo de cada dia é proporcional à quantidade de
+cobranças vencidas, O(k log n), e não à quantidade total de assinaturas.
+
+As datas das cobranças são calculadas a partir da data de início das cobranças, e não da cobrança anterior, de forma
+que um plano mensal iniciado no dia 31 cobra no último dia dos meses mais curtos e volta ao dia 31 nos demais.
+"""
+import heapq
+from calendar import monthrange
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Frequência do plano -> (meses, dias) entre cobranças
+INTERVALOS = {
+    'WEEKLY': (0, 7),
+    'MONTHLY': (1, 0),
+    'BIMONTHLY': (2, 0),
+    'TRIMONTHLY': (3, 0),
+    'SEMIANNUALLY': (6, 0),
+    'YEARLY': (12, 0),
+}
+
+
+def somar_meses(data: date, meses: int) -> date:
+    """
+    Soma meses a uma data, usando o último dia do mês quando o dia não existe no mês de destino
+    :param data: data inicial
+    :param meses: quantidade de meses
+    :return: data resultante
+    """
+    ano, mes = divmod(data.month - 1 + meses, 12)
+    ano += data.year
+    return date(ano, mes + 1, min(data.day, monthrange(ano, mes + 1)[1]))
+
+
+def fim_da_expiracao(inicio: date, unidade: str, valor: int) -> date:
+    """
+    :param inicio: data da adesão
+    :param unidade: DAYS, MONTHS ou YEARS, como em Expiracao
+    :param valor: quantidade de unidades
+    :return: primeiro dia em que a assinatura não é mais cobrada
+    """
+    if unidade == 'DAYS':
+        return inicio + timedelta(days=valor)
+    if unidade == 'MONTHS':
+        return somar_meses(inicio, valor)
+    if unidade == 'YEARS':
+        return somar_meses(inicio, 12 * valor)
+    raise ValueError(f'Unidade de expiração inválida: {unidade!r}')
+
+
+class Assinatura:
+    """
+    Adesão de um cliente a um plano automático, com as regras que definem suas cobranças
+    """
+    __slots__ = ('codigo', 'periodo', 'adesao', 'valor', 'dias_trial', 'fim', '_meses', '_dias', '_primeira',
+                 'cobrancas')
+
+    def __init__(self, codigo: str, periodo: str, adesao: date, valor: Decimal = None, dias_trial: int = 0,
+                 expiracao: Tuple[str, int] = None):
+        """
+        :param codigo: código da adesão
+        :param periodo: frequência do plano, como em FrequenciaPlanoAutomatico
+        :param adesao: data da adesão
+        :param valor: valor de cada cobrança
+        :param dias_trial: dias do período de testes, durante o qual não há cobrança
+        :param expiracao: unidade e valor da expiração do plano, contada a partir da adesão. None se não expira
+        """
+        if periodo not in INTERVALOS:
+            raise ValueError(f'Frequência inválida: {periodo!r}')
+        self.codigo = codigo
+        self.periodo = periodo
+        self.adesao = adesao
+        self.valor = valor
+        self.dias_trial = dias_trial or 0
+        self.fim = None if expiracao is None else fim_da_expiracao(adesao, *expiracao)
+        self._meses, self._dias = INTERVALOS[periodo]
+        self._primeira = adesao + timedelta(days=self.dias_trial)
+        # Quantidade de cobranças já feitas pela agenda
+        self.cobrancas = 0
+
+    @classmethod
+    def do_payload(cls, codigo: str, main_data: Dict, adesao: date) -> 'Assinatura':
+        """
+        Cria a assinatura a partir do payload do plano, no mesmo formato enviado ao pagseguro
+        :param codigo: código da adesão
+        :param main_data: payload do plano
+        :param adesao: data da adesão
+        :return: Assinatura
+        """
+        pre_approval = main_data['preApproval']
+        expiracao = pre_approval.get('expiration')
+        valor = pre_approval.get('amountPerPayment')
+        return cls(codigo, pre_approval['period'], adesao, None if valor is None else Decimal(valor),
+                   pre_approval.get('trialPeriodDuration', 0),
+                   None if expiracao is None else (expiracao['unit'], expiracao['value']))
+
+    def __repr__(self) -> str:
+        return f'Assinatura(codigo={self.codigo!r}, periodo={self.periodo!r}, adesao={self.adesao!r})'
+
+    def data_da_cobranca(self, indice: int) -> Optional[date]:
+        """
+        :param indice: número da cobrança, começando em 0
+        :return: data da cobrança ou None se a assinatura já terá expirado
+        """
+        if self._meses:
+            data = somar_meses(self._primeira, self._meses * indice)
+        else:
+            data = self._primeira + timedelta(days=self._dias * indice)
+        if self.fim is not None and data >= self.fim:
+            return None
+        return data
+
+    def proxima_cobranca(self) -> Optional[date]:
+        """
+        :return: data da próxima cobrança ainda não feita ou None se não há mais cobranças
+        """
+        return self.data_da_cobranca(self.cobrancas)
+
+    def avancar_ate(self, dia: date) -> None:
+        """
+        Marca como feitas as cobranças com data anterior ao dia, sem percorrer o histórico cobrança a cobrança
+        :param dia: data da primeira cobrança ainda não feita, ou posterior a ela
+        """
+        if dia <= self._primeira:
+            return
+        if self._meses:
+            decorridos = (dia.year - self._primeira.year) * 12 + dia.month - self._primeira.month
+            indice = decorridos // self._meses
+        else:
+            indice = -(-(dia - self._primeira).days // self._dias)
+        # A estimativa pelos meses decorridos pode ficar uma cobrança antes do dia
+        while True:
+            data = self.data_da_cobranca(indice)
+            if data is None or data >= dia:
+                break
+            indice += 1
+        self.cobrancas = max(self.cobrancas, indice)
+
+
+class AgendaDeCobrancas:
+    """
+    Agenda das cobranças de muitas assinaturas, ordenada pela data da próxima cobrança:
+
+        agenda = AgendaDeCobrancas()
+        agenda.adicionar(Assinatura('ABC', 'MONTHLY', date(2019, 4, 29), Decimal('180.00'), dias_trial=7))
+        for assinatura, data in agenda.vencidas(date.today()):
+            ...
+    """
+
+    def __init__(self):
+        # (ordinal da próxima cobrança, ordem de inserção, código). Remoções e reagendamentos invalidam a entrada
+        # antiga, que é descartada quando chega ao topo
+        self._heap: List[Tuple[int, int, str]] = []
+        self._assinaturas: Dict[str, Assinatura] = {}
+        self._agendadas: Dict[str, int] = {}
+        self._sequencia = 0
+
+    def __repr__(self) -> str:
+        return f'AgendaDeCobrancas(assinaturas={len(self)!r})'
+
+    def __len__(self) -> int:
+        return len(self._assinaturas)
+
+    def __contains__(self, codigo: str) -> bool:
+        return codigo in self._assinaturas
+
+    def adicionar(self, assinatura: Assinatura, a_partir_de: date = None) -> None:
+        """
+        Adiciona ou substitui uma assinatura na agenda. Assinaturas sem cobranças futuras não são mantidas
+        :param assinatura: Assinatura
+        :param a_partir_de: data da primeira cobrança ainda não feita, usada ao carregar assinaturas existentes para
+        que as cobranças anteriores não sejam devolvidas por vencidas. Se omitida a agenda começa pela primeira
+        cobrança da assinatura
+        """
+        self.remover(assinatura.codigo)
+        if a_partir_de is not None:
+            assinatura.avancar_ate(a_partir_de)
+        self._agendar(assinatura)
+
+    def remover(self, codigo: str) -> Optional[Assinatura]:
+        """
+        Remove a assinatura da agenda, por exemplo quando ela é cancelada
+        :param codigo: código da assinatura
+        :return: assinatura removida ou None se ela não estava na agenda
+        """
+        self._agendadas.pop(codigo, None)
+        return self._assinaturas.pop(codigo, None)
+
+    def proxima_cobranca(self, codigo: str) -> Optional[date]:
+        """
+        :param codigo: código da assinatura
+        :return: data da próxima cobrança ou None se a assinatura não está na agenda
+        """
+        assinatura = self._assinaturas.get(codigo)
+        return None if assinatura is None else assinatura.proxima_cobranca()
+
+    def vencidas(self, dia: date) -> Iterator[Tuple[Assinatura, date]]:
+        """
+        Retira da agenda as cobranças com data até o dia, inclusive, avançando cada assinatura para a cobrança
+        seguinte. Cobranças atrasadas de dias em que a agenda não foi consultada também são devolvidas
+        :param dia: dia das cobranças
+        :return: gerador de pares (assinatura, data da cobrança), em ordem de data
+        """
+        limite = dia.toordinal()
+        while self._heap and self._heap[0][0] <= limite:
+            ordinal, sequencia, codigo = heapq.heappop(self._heap)
+            if self._agendadas.get(codigo) != sequencia:
+                continue
+            assinatura = self._assinaturas[codigo]
+            assinatura.cobrancas += 1
+            self._agendar(assinatura)
+            yield assinatura, date.fromordinal(ordinal)
+
+    def _agendar(self, assinatura: Assinatura) -> None:
+        proxima = assinatura.proxima_cobranca()
+        if proxima is None:
+            self._assinaturas.pop(assinatura.codigo, None)
+            self._agendadas.pop(assinatura.codigo, None)
+            return
+        self._sequencia += 1
+        self._assinaturas[assinatura.codigo] = assinatura
+        self._agendadas[assinatura.codigo] = self._sequencia
+        heapq.heappush(self._heap, (proxima.toordinal(), self._sequencia, assinatura.codigo))
+        # Entradas invalidadas só saem do heap quando chegam ao topo; compacta se elas forem a maioria
+        if len(self._heap) > 2 * len(self._agendadas) + 1024:
+            self._compactar()
+
+    def _compactar(self) -> None:
+        self._heap = [entrada for entrada in self._heap if self._agendadas.get(entrada[2]) == entrada[1]]
+        heapq.heapify(self._heap)
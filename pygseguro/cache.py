@@ -0,0 +1,154 @@
+"""
+Esse módulo contém o cache de leitura das consultas por código.
+
+CacheDeConsultas guarda o resultado das consultas por um tempo limitado (TTL), descartando as usadas há mais tempo
+quando atinge o tamanho máximo (LRU). Consultas por códigos inexistentes também ficam em cache, por um tempo menor, para
+que um código inválido repetido não gere uma chamada a cada vez. Quando várias threads consultam ao mesmo tempo uma
+chave que não está em cache, apenas uma faz a chamada e as demais esperam o mesmo resultado.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from pygseguro.exceptions import PagseguroException
+
+# Status com que o pagseguro responde a códigos inexistentes, cujas respostas entram no cache negativo
+STATUS_NAO_ENCONTRADO = frozenset({404})
+
+
+def _copiar_erro(erro: BaseException) -> BaseException:
+    """
+    Cria uma nova instância do erro, com os mesmos argumentos e atributos mas sem traceback. Levantar sempre a mesma
+    instância acumularia em __traceback__ os frames de cada chamada, mantendo vivas suas variáveis locais
+    :param erro: erro original
+    :return: cópia do erro
+    """
+    copia = type(erro).__new__(type(erro), *erro.args)
+    copia.args = erro.args
+    copia.__dict__.update(getattr(erro, '__dict__', {}))
+    copia.__cause__ = erro.__cause__
+    return copia
+
+
+class CacheDeConsultas:
+    """
+    Cache de leitura com TTL, LRU, cache negativo e coalescência de consultas simultâneas à mesma chave.
+    Os valores devolvidos são compartilhados entre quem consulta e não devem ser alterados
+    """
+
+    def __init__(self, max_itens: int = 1024, ttl: float = 300.0, ttl_negativo: float = 30.0,
+                 relogio: Callable[[], float] = time.monotonic):
+        """
+        :param max_itens: quantidade máxima de consultas mantidas
+        :param ttl: segundos durante os quais um resultado é reaproveitado
+        :param ttl_negativo: segundos durante os quais um código inexistente é reaproveitado. 0 desliga o cache
+        negativo
+        :param relogio: função que retorna o instante atual em segundos
+        """
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self.ttl_negativo = ttl_negativo
+        self._relogio = relogio
+        # chave -> (expiração, valor, erro)
+        self._itens: 'OrderedDict[Hashable, Tuple[float, Any, PagseguroException]]' = OrderedDict()
+        self._em_andamento: Dict[Hashable, Future] = {}
+        self._trava = threading.Lock()
+        self._acertos = 0
+        self._acertos_negativos = 0
+        self._falhas = 0
+        self._coalescidas = 0
+        self._descartes = 0
+
+    def __repr__(self) -> str:
+        return f'CacheDeConsultas(max_itens={self.max_itens!r}, ttl={self.ttl!r})'
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+    def obter(self, chave: Hashable, carregar: Callable[[], Any]) -> Any:
+        """
+        Retorna o valor da chave, chamando `carregar` apenas se ele não estiver em cache
+        :param chave: identificação da consulta
+        :param carregar: função que faz a consulta ao pagseguro
+        :return: valor em cache ou recém carregado
+        :raises PagseguroException: se a consulta falhar, inclusive quando a falha de código inexistente está em cache
+        """
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is not None:
+                expiracao, valor, erro = item
+                if expiracao > self._relogio():
+                    self._itens.move_to_end(chave)
+                    if erro is not None:
+                        self._acertos_negativos += 1
+                        raise _copiar_erro(erro)
+                    self._acertos += 1
+                    return valor
+                del self._itens[chave]
+            futuro = self._em_andamento.get(chave)
+            lider = futuro is None
+            if lider:
+                futuro = self._em_andamento[chave] = Future()
+                self._falhas += 1
+            else:
+                self._coalescidas += 1
+        if not lider:
+            # O futuro guarda (valor, erro) em vez da exceção, para que cada consulta coalescida levante uma cópia
+            valor, erro = futuro.result()
+            if erro is not None:
+                raise _copiar_erro(erro)
+            return valor
+        try:
+            valor = carregar()
+        except PagseguroException as erro:
+            negativo = erro.status_code in STATUS_NAO_ENCONTRADO and self.ttl_negativo > 0
+            self._concluir(chave, futuro, None, erro, self.ttl_negativo if negativo else None)
+            raise
+        except BaseException as erro:
+            self._concluir(chave, futuro, None, erro, None)
+            raise
+        self._concluir(chave, futuro, valor, None, self.ttl)
+        return valor
+
+    def _concluir(self, chave: Hashable, futuro: Future, valor: Any, erro: BaseException, ttl: float = None) -> None:
+        descartadas = 0
+        with self._trava:
+            # Uma invalidação durante a consulta remove a chave de _em_andamento, e o resultado antigo não é guardado
+            if self._em_andamento.get(chave) is futuro:
+                del self._em_andamento[chave]
+                if ttl is not None:
+                    self._itens[chave] = (self._relogio() + ttl, valor, None if erro is None else _copiar_erro(erro))
+                    self._itens.move_to_end(chave)
+                    while len(self._itens) > self.max_itens:
+                        self._itens.popitem(last=False)
+                        descartadas += 1
+            self._descartes += descartadas
+        futuro.set_result((valor, None if erro is None else _copiar_erro(erro)))
+
+    def invalidar(self, chave: Hashable) -> None:
+        """
+        Remove a chave do cache, por exemplo após uma alteração do registro consultado
+        :param chave: identificação da consulta
+        """
+        with self._trava:
+            self._itens.pop(chave, None)
+            self._em_andamento.pop(chave, None)
+
+    def limpar(self) -> None:
+        """
+        Remove todas as chaves do cache
+        """
+        with self._trava:
+            self._itens.clear()
+            self._em_andamento.clear()
+
+    def estatisticas(self) -> Dict:
+        """
+        Contadores de acertos, falhas, consultas coalescidas e descartes por tamanho para monitoramento
+        :return: dicionário com as estatísticas
+        """
+        with self._trava:
+            return {'acertos': self._acertos, 'acertos_negativos': self._acertos_negativos, 'falhas': self._falhas,
+                    'coalescidas': self._coalescidas, 'descartes': self._descartes, 'itens': len(self._itens)}
@@ -0,0 +1,363 @@
+"""
+Esse módulo contém a caixa de saída (outbox) de criação de planos.
+
+Em vez de chamar criar_no_pagseguro no caminho da requisição, o plano é gravado em uma fila SQLite em modo WAL e um
+Envio é devolvido imediatamente. Um despachante em segundo plano, em threads do mesmo processo ou em um processo
+separado que abre o mesmo arquivo, esvazia a fila reaproveitando as conexões do cliente e grava o resultado de cada
+envio, que pode ser consultado ou aguardado pelo Envio.
+
+A entrega é ao menos uma vez: um envio interrompido por uma queda do processo volta para a fila e é reenviado, assim
+como envios que falharam por erro de comunicação ou indisponibilidade do pagseguro, até `max_tentativas`. Cada envio
+reservado tem o despachante como dono e uma concessão com validade, renovada enquanto o processo está vivo; só envios
+com a concessão vencida são devolvidos à fila, então vários processos podem despachar o mesmo arquivo. Para que um
+reenvio não crie um plano duplicado use Idempotencia com ArmazenamentoSqlite no cliente. Envios com a mesma
+referência na mesma conta são feitos na ordem em que foram enfileirados, um de cada vez.
+
+As credenciais nunca são gravadas na fila, apenas a identificação pública da conta. O despachante usa as configurações
+dos passos enfileirados no próprio processo ou as passadas em `configs`.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, TYPE_CHECKING, Tuple
+
+from pygseguro import validacao
+from pygseguro.config import Config
+from pygseguro.decodificacao import decodificar_data
+from pygseguro.exceptions import PagseguroException, TempoEsgotadoException, TransporteException
+from pygseguro.resiliencia import STATUS_RETENTAVEIS
+
+if TYPE_CHECKING:
+    from pygseguro.plano_recorrente_automatico import PlanoAutomaticoRecorrente, UltimoPasso
+
+_log = logging.getLogger(__name__)
+
+PENDENTE = 'pendente'
+ENVIANDO = 'enviando'
+CRIADO = 'criado'
+ERRO = 'erro'
+
+_ESQUEMA = (
+    'CREATE TABLE IF NOT EXISTS envios (id INTEGER PRIMARY KEY AUTOINCREMENT, credencial TEXT NOT NULL, '
+    'referencia TEXT, corpo BLOB NOT NULL, estado TEXT NOT NULL, tentativas INTEGER NOT NULL DEFAULT 0, '
+    'proxima_tentativa REAL NOT NULL DEFAULT 0, codigo TEXT, criacao TEXT, erro TEXT, dono TEXT, concessao REAL)',
+    'CREATE INDEX IF NOT EXISTS envios_por_estado ON envios (estado, id)',
+    'CREATE INDEX IF NOT EXISTS envios_por_referencia ON envios (credencial, referencia, id)',
+)
+
+# Colunas acrescentadas depois da primeira versão da tabela, criadas em arquivos antigos ao abrir a caixa
+_COLUNAS_NOVAS = (('dono', 'TEXT'), ('concessao', 'REAL'))
+
+# Um envio só é despachado se nenhum envio anterior com a mesma referência na mesma conta ainda estiver na fila
+_RESERVAR = (
+    'SELECT id, credencial, corpo FROM envios AS e WHERE estado = ? AND proxima_tentativa <= ? AND ('
+    'referencia IS NULL OR NOT EXISTS (SELECT 1 FROM envios AS a WHERE a.credencial = e.credencial '
+    'AND a.referencia = e.referencia AND a.id < e.id AND a.estado IN (?, ?))) ORDER BY id LIMIT ?'
+)
+
+
+class Envio:
+    """
+    Identificação de um plano enfileirado, usada para consultar ou aguardar o resultado da criação
+    """
+    __slots__ = ('id', '_caixa')
+
+    def __init__(self, id: int, caixa: 'CaixaDeSaida'):
+        self.id = id
+        self._caixa = caixa
+
+    def __repr__(self) -> str:
+        return f'Envio(id={self.id!r})'
+
+    def estado(self) -> str:
+        """
+        :return: pendente, enviando, criado ou erro
+        """
+        return self._caixa._ler(self.id)[0]
+
+    def pronto(self) -> bool:
+        """
+        :return: True se o envio terminou, com sucesso ou erro
+        """
+        return self.estado() in (CRIADO, ERRO)
+
+    def resultado(self, timeout: float = None) -> 'PlanoAutomaticoRecorrente':
+        """
+        Aguarda o fim do envio
+        :param timeout: segundos de espera. None para esperar indefinidamente
+        :return: plano criado
+        :raises PagseguroException: se o pagseguro recusou o plano
+        :raises TempoEsgotadoException: se o envio não terminou dentro do timeout
+        """
+        return self._caixa._aguardar(self.id, timeout)
+
+
+class CaixaDeSaida:
+    """
+    Fila persistente de planos a criar no pagseguro, com despacho em segundo plano:
+
+        with CaixaDeSaida('saida.db', configs=[config]) as caixa:
+            envio = caixa.enfileirar(passo)
+            ...
+            plano = envio.resultado(timeout=30)
+    """
+
+    def __init__(self, caminho: str, configs: Iterable[Config] = (), concorrencia: int = 4, tamanho_lote: int = 50,
+                 prazo: float = None, espera_inicial: float = 1.0, espera_maxima: float = 300.0,
+                 intervalo_consulta: float = 0.2, max_tentativas: Optional[int] = 10,
+                 duracao_concessao: float = 300.0):
+        """
+        :param caminho: arquivo SQLite da fila, criado se não existir
+        :param configs: configurações das contas cujos envios este processo despacha, além das dos passos
+        enfileirados por ele. Necessárias para retomar envios gravados por outro processo
+        :param concorrencia: quantidade máxima de envios simultâneos
+        :param tamanho_lote: quantidade máxima de envios reservados de uma vez na fila
+        :param prazo: segundos disponíveis para cada envio, incluindo as retentativas do cliente
+        :param espera_inicial: segundos até reenviar após a primeira falha de comunicação, dobrando a cada falha
+        :param espera_maxima: limite da espera entre reenvios
+        :param intervalo_consulta: segundos entre consultas à fila quando não há envios novos deste processo
+        :param max_tentativas: quantidade de envios após a qual uma falha de comunicação ou indisponibilidade vira erro.
+        None para reenviar indefinidamente
+        :param duracao_concessao: segundos sem renovação após os quais um envio reservado por um despachante é
+        considerado interrompido e volta para a fila. Renovada a cada terço da duração enquanto o processo está vivo
+        """
+        self.caminho = caminho
+        self.concorrencia = concorrencia
+        self.tamanho_lote = tamanho_lote
+        self.prazo = prazo
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self.intervalo_consulta = intervalo_consulta
+        self.max_tentativas = max_tentativas
+        self.duracao_concessao = duracao_concessao
+        self._dono = uuid.uuid4().hex
+        self._renovacao = 0.0
+        self._configs: Dict[str, Config] = {config.credencial(): config for config in configs}
+        self._trava = threading.Lock()
+        self._mudanca = threading.Condition(self._trava)
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._despachante: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._em_andamento = 0
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conexao.execute('PRAGMA journal_mode=WAL')
+        self._conexao.execute('PRAGMA synchronous=FULL')
+        for comando in _ESQUEMA:
+            self._conexao.execute(comando)
+        existentes = {linha[1] for linha in self._conexao.execute('PRAGMA table_info(envios)')}
+        for coluna, tipo in _COLUNAS_NOVAS:
+            if coluna not in existentes:
+                self._conexao.execute(f'ALTER TABLE envios ADD COLUMN {coluna} {tipo}')
+
+    def __repr__(self) -> str:
+        return f'CaixaDeSaida(caminho={self.caminho!r}, concorrencia={self.concorrencia!r})'
+
+    def __enter__(self) -> 'CaixaDeSaida':
+        self.iniciar()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.parar()
+
+    def enfileirar(self, passo: 'UltimoPasso') -> Envio:
+        """
+        Grava o plano na fila. Quando o método retorna o envio já sobrevive a uma queda do processo
+        :param passo: passo final do plano
+        :return: Envio para consultar ou aguardar o resultado
+        :raises ValidacaoException: se a validação local encontrar violações
+        """
+        if validacao.ativa:
+            validacao.validador_plano.validar(passo._main_data)
+        credencial = passo._config.credencial()
+        with self._trava:
+            self._configs.setdefault(credencial, passo._config)
+            cursor = self._conexao.execute(
+                'INSERT INTO envios (credencial, referencia, corpo, estado) VALUES (?, ?, ?, ?)',
+                (credencial, passo._main_data.get('reference'), passo._corpo(), PENDENTE))
+        self._acordar.set()
+        return Envio(cursor.lastrowid, self)
+
+    def envio(self, id: int) -> Envio:
+        """
+        :param id: id de um envio, por exemplo guardado antes de um reinício
+        :return: Envio
+        """
+        return Envio(id, self)
+
+    def iniciar(self) -> None:
+        """
+        Inicia o despachante em uma thread. Envios cuja concessão venceu, como os que estavam sendo enviados quando o
+        processo anterior caiu, voltam para a fila
+        """
+        with self._trava:
+            if self._despachante is not None:
+                return
+            self._renovacao = 0.0
+            self._parar.clear()
+            self._executor = ThreadPoolExecutor(max_workers=self.concorrencia, thread_name_prefix='pygseguro-saida')
+            self._despachante = threading.Thread(target=self._despachar, name='pygseguro-despachante', daemon=True)
+        self._despachante.start()
+
+    def parar(self, esperar: bool = True) -> None:
+        """
+        Para o despachante. Envios ainda na fila são despachados na próxima vez em que a caixa for iniciada
+        :param esperar: aguarda os envios em andamento terminarem
+        """
+        despachante = self._despachante
+        if despachante is None:
+            return
+        self._parar.set()
+        self._acordar.set()
+        despachante.join()
+        self._executor.shutdown(wait=esperar)
+        self._despachante = self._executor = None
+
+    def fechar(self) -> None:
+        """
+        Para o despachante e fecha o arquivo da fila
+        """
+        self.parar()
+        with self._trava:
+            self._conexao.close()
+
+    def estatisticas(self) -> Dict[str, int]:
+        """
+        Quantidade de envios em cada estado
+        :return: dicionário estado -> quantidade
+        """
+        with self._trava:
+            linhas = self._conexao.execute('SELECT estado, COUNT(*) FROM envios GROUP BY estado').fetchall()
+        return {**dict.fromkeys((PENDENTE, ENVIANDO, CRIADO, ERRO), 0), **dict(linhas)}
+
+    def _manter_concessoes(self) -> None:
+        """
+        Renova as concessões dos envios deste despachante e devolve para a fila os envios de concessão vencida,
+        reservados por um despachante que caiu. Envios sem concessão são de uma versão anterior da caixa
+        """
+        agora = time.time()
+        if agora < self._renovacao:
+            return
+        with self._trava:
+            self._conexao.execute('UPDATE envios SET concessao = ? WHERE estado = ? AND dono = ?',
+                                  (agora + self.duracao_concessao, ENVIANDO, self._dono))
+            self._conexao.execute('UPDATE envios SET estado = ?, dono = NULL, concessao = NULL WHERE estado = ? '
+                                  'AND (concessao IS NULL OR concessao < ?)', (PENDENTE, ENVIANDO, agora))
+        self._renovacao = agora + self.duracao_concessao / 3
+
+    def _despachar(self) -> None:
+        while not self._parar.is_set():
+            with self._trava:
+                livres = self.concorrencia - self._em_andamento
+            try:
+                self._manter_concessoes()
+                reservados = self._reservar(min(livres, self.tamanho_lote)) if livres > 0 else []
+                for id, config, corpo in reservados:
+                    self._executor.submit(self._enviar, id, config, corpo)
+            except sqlite3.OperationalError:
+                # Fila bloqueada por outro processo além do timeout do sqlite: tenta de novo na próxima volta
+                reservados = []
+            except Exception:
+                # Uma falha inesperada não pode parar o despachante, ou a fila deixaria de ser esvaziada em silêncio
+                _log.exception('Falha no despachante da caixa de saída %s', self.caminho)
+                reservados = []
+            if not reservados:
+                self._acordar.wait(self.intervalo_consulta)
+                self._acordar.clear()
+
+    def _reservar(self, quantidade: int) -> List[Tuple[int, Config, bytes]]:
+        reservados = []
+        with self._trava:
+            self._conexao.execute('BEGIN IMMEDIATE')
+            try:
+                linhas = self._conexao.execute(_RESERVAR, (PENDENTE, time.time(), PENDENTE, ENVIANDO, quantidade))
+                for id, credencial, corpo in linhas.fetchall():
+                    # Envios de contas sem configuração conhecida ficam na fila para outro despachante
+                    config = self._configs.get(credencial)
+                    if config is not None:
+                        reservados.append((id, config, corpo))
+                concessao = time.time() + self.duracao_concessao
+                self._conexao.executemany('UPDATE envios SET estado = ?, dono = ?, concessao = ? WHERE id = ?',
+                                          [(ENVIANDO, self._dono, concessao, id) for id, _, _ in reservados])
+                self._conexao.execute('COMMIT')
+            except BaseException:
+                self._conexao.execute('ROLLBACK')
+                raise
+            self._em_andamento += len(reservados)
+        return reservados
+
+    def _enviar(self, id: int, config: Config, corpo: bytes) -> None:
+        from pygseguro.plano_recorrente_automatico import UltimoPasso
+
+        try:
+            plano = UltimoPasso.de_payload(json.loads(corpo), config).criar_no_pagseguro(self.prazo)
+        except PagseguroException as erro:
+            if erro.status_code in STATUS_RETENTAVEIS:
+                self._reenfileirar(id, erro)
+            else:
+                self._falhar(id, erro)
+        except (TransporteException, TempoEsgotadoException) as erro:
+            self._reenfileirar(id, erro)
+        except Exception as erro:
+            self._falhar(id, erro)
+        else:
+            self._concluir(id, 'UPDATE envios SET estado = ?, codigo = ?, criacao = ?, tentativas = tentativas + 1, '
+                               'dono = NULL, concessao = NULL WHERE id = ?',
+                           (CRIADO, plano.codigo, plano.criacao.isoformat(), id))
+
+    def _falhar(self, id: int, erro: Exception) -> None:
+        if isinstance(erro, PagseguroException):
+            dados = json.dumps({'errors': erro.erros, 'status_code': erro.status_code})
+        else:
+            dados = json.dumps({'errors': {type(erro).__name__: str(erro)}, 'status_code': None})
+        self._concluir(id, 'UPDATE envios SET estado = ?, erro = ?, tentativas = tentativas + 1, dono = NULL, '
+                           'concessao = NULL WHERE id = ?', (ERRO, dados, id))
+
+    def _reenfileirar(self, id: int, erro: Exception) -> None:
+        with self._trava:
+            tentativas, = self._conexao.execute('SELECT tentativas FROM envios WHERE id = ?', (id,)).fetchone()
+        if self.max_tentativas is not None and tentativas + 1 >= self.max_tentativas:
+            self._falhar(id, erro)
+            return
+        espera = min(self.espera_maxima, self.espera_inicial * 2 ** tentativas)
+        self._concluir(id, 'UPDATE envios SET estado = ?, proxima_tentativa = ?, tentativas = tentativas + 1, '
+                           'dono = NULL, concessao = NULL WHERE id = ?', (PENDENTE, time.time() + espera, id))
+
+    def _concluir(self, id: int, comando: str, parametros: Tuple) -> None:
+        with self._trava:
+            self._conexao.execute(comando, parametros)
+            self._em_andamento -= 1
+            self._mudanca.notify_all()
+        self._acordar.set()
+
+    def _ler(self, id: int) -> Tuple[str, Optional[str], Optional[str], Optional[str]]:
+        with self._trava:
+            linha = self._conexao.execute('SELECT estado, codigo, criacao, erro FROM envios WHERE id = ?',
+                                          (id,)).fetchone()
+        if linha is None:
+            raise KeyError(f'Envio {id} não existe na caixa de saída')
+        return linha
+
+    def _aguardar(self, id: int, timeout: float = None) -> 'PlanoAutomaticoRecorrente':
+        from pygseguro.plano_recorrente_automatico import PlanoAutomaticoRecorrente
+
+        limite = None if timeout is None else time.monotonic() + timeout
+        while True:
+            estado, codigo, criacao, erro = self._ler(id)
+            if estado == CRIADO:
+                return PlanoAutomaticoRecorrente(codigo, decodificar_data(criacao))
+            if estado == ERRO:
+                dados = json.loads(erro)
+                raise PagseguroException({'error': True, 'errors': dados['errors']}, dados['status_code'])
+            espera = self.intervalo_consulta
+            if limite is not None:
+                espera = min(espera, limite - time.monotonic())
+                if espera <= 0:
+                    raise TempoEsgotadoException(f'Envio {id} não terminou em {timeout} segundos')
+            # Acordado pelos envios deste processo; envios de outro processo são vistos na próxima consulta
+            with self._mudanca:
+                self._mudanca.wait(espera)
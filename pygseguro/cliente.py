@@ -0,0 +1,382 @@
+"""
+Esse módulo contém o cliente HTTP utilizado para conversar com a API do Pagseguro.
+
+O cliente mantém uma sessão com pool de conexões keep-alive, evitando um novo handshake TCP+TLS a cada chamada.
+Ele pode ser associado a uma configuração (ConfigConta/ConfigApp) ou definido como cliente padrão da aplicação.
+Em serviços com várias contas, CacheDeClientes mantém um cliente por credencial.
+Para uso com asyncio o cliente delega as chamadas a um TransporteAsync, que também reaproveita conexões.
+Opcionalmente o cliente aplica uma PoliticaRetentativa, um Disjuntor e um LimitadorPorCredencial em todas as chamadas,
+um CacheDeConsultas nas consultas por código e Idempotencia e RegistroDePlanos na criação de planos.
+"""
+import asyncio
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, TYPE_CHECKING
+from urllib.parse import urlencode
+
+from pygseguro.cache import CacheDeConsultas
+from pygseguro.exceptions import TempoEsgotadoException, TransporteException
+from pygseguro.idempotencia import Idempotencia
+from pygseguro.instrumentacao import EventoChamada
+from pygseguro.limitador import LimitadorPorCredencial
+from pygseguro.resiliencia import Disjuntor, PoliticaRetentativa, STATUS_RETENTAVEIS
+from pygseguro.transporte_async import Resposta, TransporteAsync, TransporteAsyncio
+
+if TYPE_CHECKING:
+    import requests
+
+    from pygseguro.config import Config
+    from pygseguro.registro import RegistroDePlanos
+
+# TransporteException cobre respostas que não são HTTP válido, levantada por TransporteAsyncio
+_ERROS_DE_REDE_ASYNC = (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, TransporteException)
+
+cliente_padrao = None
+_trava_cliente_padrao = threading.Lock()
+clientes_por_credencial: Optional['CacheDeClientes'] = None
+
+
+class Cliente:
+    """
+    Classe que representa um cliente HTTP com pool de conexões persistentes, seguro para uso entre threads
+    """
+
+    def __init__(self, tamanho_pool: int = 10, max_hosts: int = 10, transporte_async: TransporteAsync = None,
+                 politica_retentativa: PoliticaRetentativa = None, disjuntor: Disjuntor = None,
+                 limitador: LimitadorPorCredencial = None, timeout_conexao: Optional[float] = 5.0,
+                 timeout_leitura: Optional[float] = 30.0, cache_consultas: CacheDeConsultas = None,
+                 idempotencia: Idempotencia = None, registro_planos: 'RegistroDePlanos' = None):
+        """
+        :param tamanho_pool: quantidade máxima de conexões mantidas abertas por host
+        :param max_hosts: quantidade de hosts distintos cujos pools são mantidos em memória
+        :param transporte_async: transporte usado nas chamadas assíncronas. Se omitido usa TransporteAsyncio
+        :param politica_retentativa: política de retentativas. Se omitida cada chamada é feita uma única vez, já
+        que a criação de planos não é idempotente
+        :param disjuntor: circuit breaker compartilhado pelas chamadas desse cliente
+        :param limitador: limitador de taxa por credencial aplicado a toda requisição enviada, inclusive retentativas
+        :param timeout_conexao: segundos para estabelecer a conexão. None para esperar indefinidamente
+        :param timeout_leitura: segundos esperando a resposta do servidor. None para esperar indefinidamente
+        :param cache_consultas: cache de leitura usado nas consultas de planos e adesões por código
+        :param idempotencia: torna a criação de planos com referência idempotente, coalescendo chamadas simultâneas
+        e reaproveitando os planos já criados com a mesma referência
+        :param registro_planos: reaproveita planos já criados com conteúdo idêntico, a menos da referência
+        """
+        self.tamanho_pool = tamanho_pool
+        self.max_hosts = max_hosts
+        self.politica_retentativa = politica_retentativa
+        self.disjuntor = disjuntor
+        self.limitador = limitador
+        self.timeout_conexao = timeout_conexao
+        self.timeout_leitura = timeout_leitura
+        self.cache_consultas = cache_consultas
+        self.idempotencia = idempotencia
+        self.registro_planos = registro_planos
+        self._sessao = None
+        self._transporte_async = transporte_async
+        self._retentativas = 0
+        self._erros_de_rede = 0
+        self._trava = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f'Cliente(tamanho_pool={self.tamanho_pool!r}, max_hosts={self.max_hosts!r})'
+
+    @property
+    def sessao(self) -> 'requests.Session':
+        """
+        Sessão do requests criada de forma preguiçosa na primeira requisição. O requests também só é importado aqui
+        :return: sessão com adaptador de pool configurado
+        """
+        if self._sessao is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            with self._trava:
+                if self._sessao is None:
+                    sessao = requests.Session()
+                    adaptador = HTTPAdapter(pool_connections=self.max_hosts, pool_maxsize=self.tamanho_pool)
+                    sessao.mount('https://', adaptador)
+                    sessao.mount('http://', adaptador)
+                    self._sessao = sessao
+        return self._sessao
+
+    @property
+    def transporte_async(self) -> TransporteAsync:
+        """
+        Transporte assíncrono criado de forma preguiçosa na primeira chamada assíncrona
+        :return: TransporteAsync
+        """
+        if self._transporte_async is None:
+            with self._trava:
+                if self._transporte_async is None:
+                    # Com idempotência um POST perdido em uma conexão reaproveitada pode ser reenviado
+                    self._transporte_async = TransporteAsyncio(tamanho_pool=self.tamanho_pool,
+                                                               reenviar_apos_envio=self.idempotencia is not None)
+        return self._transporte_async
+
+    def post(self, config: 'Config', endpoint: str, corpo: bytes, headers: Dict, prazo: float = None,
+             evento: EventoChamada = None) -> 'requests.Response':
+        """
+        Envia uma requisição POST reaproveitando conexões do pool
+        :param config: configuração com ambiente e credenciais da chamada
+        :param endpoint: endpoint da API
+        :param corpo: corpo da requisição já serializado
+        :param headers: cabeçalhos da requisição
+        :param prazo: segundos disponíveis para a chamada inteira, incluindo esperas e retentativas
+        :param evento: evento de instrumentação preenchido com status, bytes recebidos e retentativas
+        :return: resposta do requests
+        :raises TempoEsgotadoException: se o timeout ou o prazo se esgotarem
+        """
+        return self._requisitar('POST', config, config.construir_url(endpoint), corpo, headers, prazo, evento)
+
+    def get(self, config: 'Config', endpoint: str, parametros: Dict, headers: Dict, prazo: float = None,
+            evento: EventoChamada = None) -> 'requests.Response':
+        """
+        Envia uma requisição GET reaproveitando conexões do pool, com a mesma política de retentativas do post
+        :param config: configuração com ambiente e credenciais da chamada
+        :param endpoint: endpoint da API
+        :param parametros: parâmetros enviados na query string junto das credenciais
+        :param headers: cabeçalhos da requisição
+        :param prazo: segundos disponíveis para a chamada inteira, incluindo esperas e retentativas
+        :param evento: evento de instrumentação preenchido com status, bytes recebidos e retentativas
+        :return: resposta do requests
+        :raises TempoEsgotadoException: se o timeout ou o prazo se esgotarem
+        """
+        url = config.construir_url(endpoint)
+        if parametros:
+            url = f'{url}&{urlencode(parametros)}'
+        return self._requisitar('GET', config, url, None, headers, prazo, evento)
+
+    def _requisitar(self, metodo: str, config: 'Config', url: str, corpo: Optional[bytes], headers: Dict,
+                    prazo: Optional[float], evento: Optional[EventoChamada]) -> 'requests.Response':
+        import requests
+
+        limite = None if prazo is None else time.monotonic() + prazo
+        tentativa = 0
+        while True:
+            teste = self._verificar_disjuntor()
+            try:
+                if self.limitador is not None:
+                    self.limitador.adquirir(config.credencial(), _tempo_restante(limite))
+                restante = _tempo_restante(limite)
+                timeout = (_menor(self.timeout_conexao, restante), _menor(self.timeout_leitura, restante))
+                resposta = falha = None
+                try:
+                    resposta = self.sessao.request(metodo, url, data=corpo, headers=headers, timeout=timeout)
+                except requests.RequestException as erro:
+                    falha = erro
+                if evento is not None:
+                    _preencher_evento(evento, tentativa, resposta)
+            except BaseException:
+                self._abandonar_disjuntor(teste)
+                raise
+            espera = self._proxima_espera(tentativa, resposta, falha, limite)
+            if espera is None:
+                return resposta
+            time.sleep(espera)
+            tentativa += 1
+
+    async def post_async(self, config: 'Config', endpoint: str, corpo: bytes, headers: Dict, prazo: float = None,
+                         evento: EventoChamada = None) -> Resposta:
+        """
+        Versão assíncrona de post, que não bloqueia o event loop
+        :param config: configuração com ambiente e credenciais da chamada
+        :param endpoint: endpoint da API
+        :param corpo: corpo da requisição já serializado
+        :param headers: cabeçalhos da requisição
+        :param prazo: segundos disponíveis para a chamada inteira, incluindo esperas e retentativas
+        :param evento: evento de instrumentação preenchido com status, bytes recebidos e retentativas
+        :return: Resposta
+        :raises TempoEsgotadoException: se o timeout ou o prazo se esgotarem
+        """
+        url = config.construir_url(endpoint)
+        limite = None if prazo is None else time.monotonic() + prazo
+        # O transporte assíncrono não separa conexão e leitura: cada tentativa é limitada pela soma dos timeouts
+        # definidos, e só fica sem limite se os dois forem None
+        timeouts = [timeout for timeout in (self.timeout_conexao, self.timeout_leitura) if timeout is not None]
+        timeout_tentativa = sum(timeouts) if timeouts else None
+        tentativa = 0
+        while True:
+            teste = self._verificar_disjuntor()
+            try:
+                if self.limitador is not None:
+                    await self.limitador.adquirir_async(config.credencial(), _tempo_restante(limite))
+                restante = _tempo_restante(limite)
+                resposta = falha = None
+                try:
+                    resposta = await asyncio.wait_for(self.transporte_async.post(url, corpo, headers),
+                                                      _menor(timeout_tentativa, restante))
+                except _ERROS_DE_REDE_ASYNC as erro:
+                    falha = erro
+                if evento is not None:
+                    _preencher_evento(evento, tentativa, resposta)
+            except BaseException:
+                # Prazo esgotado no limitador ou tarefa cancelada: a chamada não chegou a registrar resultado
+                self._abandonar_disjuntor(teste)
+                raise
+            espera = self._proxima_espera(tentativa, resposta, falha, limite)
+            if espera is None:
+                return resposta
+            await asyncio.sleep(espera)
+            tentativa += 1
+
+    def _verificar_disjuntor(self) -> bool:
+        return self.disjuntor is not None and self.disjuntor.permitir()
+
+    def _abandonar_disjuntor(self, teste: bool) -> None:
+        if self.disjuntor is not None:
+            self.disjuntor.abandonar(teste)
+
+    def _proxima_espera(self, tentativa: int, resposta, falha: Exception, limite: float = None) -> Optional[float]:
+        """
+        Registra o resultado de uma tentativa e decide se ela deve ser repetida
+        :return: segundos de espera antes da próxima tentativa ou None se a resposta deve ser devolvida
+        :raises TransporteException: se houve erro de rede e não há mais tentativas
+        :raises TempoEsgotadoException: se a última falha foi por timeout
+        """
+        politica = self.politica_retentativa
+        if falha is None:
+            status_retentaveis = STATUS_RETENTAVEIS if politica is None else politica.status_retentaveis
+            sucesso = resposta.status_code not in status_retentaveis
+        else:
+            sucesso = False
+            with self._trava:
+                self._erros_de_rede += 1
+        if self.disjuntor is not None:
+            self.disjuntor.registrar(sucesso)
+        if not sucesso and politica is not None and tentativa + 1 < politica.max_tentativas:
+            espera = politica.espera(tentativa)
+            if limite is None or time.monotonic() + espera < limite:
+                with self._trava:
+                    self._retentativas += 1
+                return espera
+        if _foi_timeout(falha):
+            raise TempoEsgotadoException(f'Pagseguro não respondeu a tempo: {falha}') from falha
+        if falha is not None:
+            raise TransporteException(f'Erro de comunicação com o pagseguro: {falha}') from falha
+        return None
+
+    def estatisticas(self) -> Dict:
+        """
+        Contadores de retentativas, erros de rede e estado do disjuntor para monitoramento
+        :return: dicionário com as estatísticas
+        """
+        with self._trava:
+            estatisticas = {'retentativas': self._retentativas, 'erros_de_rede': self._erros_de_rede}
+        if self.disjuntor is not None:
+            estatisticas['disjuntor'] = self.disjuntor.estatisticas()
+        return estatisticas
+
+    async def fechar_async(self) -> None:
+        """
+        Fecha as conexões mantidas pelo transporte assíncrono
+        """
+        if self._transporte_async is not None:
+            await self._transporte_async.fechar()
+
+    def fechar(self) -> None:
+        """
+        Fecha todas conexões abertas do pool
+        """
+        with self._trava:
+            if self._sessao is not None:
+                self._sessao.close()
+                self._sessao = None
+
+
+def get_cliente_padrao() -> Cliente:
+    """
+    Função que retorna o cliente padrão da aplicação, criando um caso nenhum tenha sido definido
+    :return: Cliente padrão
+    """
+    global cliente_padrao
+    if cliente_padrao is None:
+        with _trava_cliente_padrao:
+            if cliente_padrao is None:
+                cliente_padrao = Cliente()
+    return cliente_padrao
+
+
+class CacheDeClientes:
+    """
+    Cache LRU de clientes por credencial, para que cada conta de um serviço multi-inquilino tenha seu próprio pool
+    de conexões, reaproveitado sempre que a mesma conta volta a ser usada. Ao ultrapassar `max_clientes` o cliente
+    usado há mais tempo é descartado e suas conexões fechadas
+    """
+
+    def __init__(self, max_clientes: int = 32, fabrica: Callable[[], Cliente] = Cliente):
+        """
+        :param max_clientes: quantidade máxima de clientes mantidos
+        :param fabrica: função que cria o cliente de uma nova credencial
+        """
+        self.max_clientes = max_clientes
+        self.fabrica = fabrica
+        self._clientes: 'OrderedDict[str, Cliente]' = OrderedDict()
+        self._trava = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f'CacheDeClientes(max_clientes={self.max_clientes!r})'
+
+    def __len__(self) -> int:
+        return len(self._clientes)
+
+    def obter(self, credencial: str) -> Cliente:
+        """
+        Retorna o cliente da credencial, criando-o se necessário
+        :param credencial: identificação da conta, como retornada por Config.credencial
+        :return: Cliente
+        """
+        descartado = None
+        with self._trava:
+            cliente = self._clientes.get(credencial)
+            if cliente is not None:
+                self._clientes.move_to_end(credencial)
+                return cliente
+            cliente = self._clientes[credencial] = self.fabrica()
+            if len(self._clientes) > self.max_clientes:
+                _, descartado = self._clientes.popitem(last=False)
+        if descartado is not None:
+            descartado.fechar()
+        return cliente
+
+    def fechar(self) -> None:
+        """
+        Fecha as conexões de todos os clientes e esvazia o cache
+        """
+        with self._trava:
+            clientes, self._clientes = list(self._clientes.values()), OrderedDict()
+        for cliente in clientes:
+            cliente.fechar()
+
+
+def _preencher_evento(evento: EventoChamada, tentativa: int, resposta) -> None:
+    evento.retentativas = tentativa
+    if resposta is not None:
+        evento.status_code = resposta.status_code
+        evento.bytes_recebidos = len(resposta.content)
+
+
+def _foi_timeout(falha: Optional[Exception]) -> bool:
+    if isinstance(falha, asyncio.TimeoutError):
+        return True
+    # Falhas do caminho síncrono só existem se o requests já foi importado
+    requests = sys.modules.get('requests')
+    return requests is not None and isinstance(falha, requests.Timeout)
+
+
+def _menor(valor: Optional[float], restante: Optional[float]) -> Optional[float]:
+    if restante is None:
+        return valor
+    if valor is None:
+        return restante
+    return min(valor, restante)
+
+
+def _tempo_restante(limite: Optional[float]) -> Optional[float]:
+    if limite is None:
+        return None
+    restante = limite - time.monotonic()
+    if restante <= 0:
+        raise TempoEsgotadoException('Prazo da chamada ao pagseguro esgotado')
+    return restante
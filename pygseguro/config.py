@@ -2,19 +2,62 @@
 Esse módulo contém a configuração padrão das chamadas e fornece uma classe de ConfigConta que representa essa
 configuração
 
+A configuração padrão pode ser global, definida com set_config_padrao, ou local ao contexto de execução, definida com
+usar_config. A configuração do contexto tem precedência e fica isolada por thread e por tarefa do asyncio, o que
+permite atender várias contas ao mesmo tempo em um serviço multi-inquilino.
+
 Doc da API: https://dev.pagseguro.uol.com.br/reference#autenticacao
 
 """
+from contextvars import ContextVar, Token
+from functools import wraps
+from typing import Callable, List, Optional, TYPE_CHECKING, Tuple
+from urllib.parse import urlencode
+
+if TYPE_CHECKING:
+    from pygseguro.cliente import Cliente
 
 config_padrao = None
+_config_do_contexto: 'ContextVar[Optional[Config]]' = ContextVar('pygseguro_config', default=None)
+# Tokens dos blocos with de usar_config abertos no contexto atual, do mais externo ao mais interno. Ficam no contexto,
+# e não na instância, para que a mesma instância possa ser usada ao mesmo tempo por várias threads ou tarefas
+_tokens_do_contexto: 'ContextVar[Tuple[Token, ...]]' = ContextVar('pygseguro_usar_config_tokens', default=())
 
 PRODUCAO = 'https://ws.pagseguro.uol.com.br'
 SANDBOX = 'https://ws.sandbox.pagseguro.uol.com.br'
 
 
 class Config():
-    def __init__(self, ambiente: str):
+    # Atributos que, ao serem alterados, invalidam a query string e as urls em cache
+    _atributos_url = frozenset({'ambiente'})
+    _max_urls_em_cache = 64
+
+    def __init__(self, ambiente: str, cliente: 'Cliente' = None):
+        self._query_string = None
+        self._urls = {}
         self.ambiente = ambiente
+        self.cliente = cliente
+
+    def __setattr__(self, nome, valor):
+        super().__setattr__(nome, valor)
+        if nome in self._atributos_url:
+            super().__setattr__('_query_string', None)
+            super().__setattr__('_urls', {})
+
+    def obter_cliente(self) -> 'Cliente':
+        """
+        Retorna o cliente HTTP associado a essa configuração. Caso nenhum tenha sido associado retorna o cliente da
+        credencial, se houver um cache de clientes por credencial definido, ou o cliente padrão
+        :return: Cliente
+        """
+        if self.cliente is not None:
+            return self.cliente
+        # Importado aqui para que o requests só seja carregado quando uma requisição for feita
+        from pygseguro import cliente
+
+        if cliente.clientes_por_credencial is not None:
+            return cliente.clientes_por_credencial.obter(self.credencial())
+        return cliente.get_cliente_padrao()
 
     def ambiente_endpoint(self, endpoint: str) -> str:
         """
@@ -24,30 +67,55 @@ class Config():
         """
         return f'{self.ambiente}{endpoint}'
 
-    def query_string(self) -> str:
+    def credencial(self) -> str:
         """
         Metodo abstrato que deve ser implementado em cada subclasse.
-        Deve retornar a query string que deve ser enviada para autenticao no endpoint
-        :return: query string
+        Deve retornar a identificação pública da conta, sem segredos, usada como chave de limites e caches
+        :return: identificação da conta
         """
         raise NotImplementedError()
 
+    def _credenciais(self) -> List[Tuple[str, str]]:
+        """
+        Metodo abstrato que deve ser implementado em cada subclasse.
+        Deve retornar os pares de nome e valor enviados para autenticação no endpoint
+        :return: lista de pares (nome, valor)
+        """
+        raise NotImplementedError()
+
+    def query_string(self) -> str:
+        """
+        Query string de autenticação, com os valores codificados para url. É calculada uma única vez e recalculada
+        apenas se as credenciais mudarem
+        :return: query string
+        """
+        if self._query_string is None:
+            self._query_string = urlencode(self._credenciais(), safe='@')
+        return self._query_string
+
     def construir_url(self, endpoint: str) -> str:
         """
-        Método que constroi a url para completa para envio de requisição para a API
+        Método que constroi a url para completa para envio de requisição para a API.
+        As urls construídas ficam em cache por endpoint
         :param endpoint:
         :return:
         """
-        return f'{self.ambiente_endpoint(endpoint)}?{self.query_string()}'
+        url = self._urls.get(endpoint)
+        if url is None:
+            url = f'{self.ambiente_endpoint(endpoint)}?{self.query_string()}'
+            if len(self._urls) < self._max_urls_em_cache:
+                self._urls[endpoint] = url
+        return url
 
 
 class ConfigConta(Config):
     """
     Classe que representa uma configuração por email e token
     """
+    _atributos_url = frozenset({'ambiente', 'email', 'token'})
 
-    def __init__(self, email: str, token: str, ambiente: str = PRODUCAO):
-        super().__init__(ambiente=ambiente)
+    def __init__(self, email: str, token: str, ambiente: str = PRODUCAO, cliente: 'Cliente' = None):
+        super().__init__(ambiente=ambiente, cliente=cliente)
         self.token = token
         self.email = email
 
@@ -55,21 +123,29 @@ class ConfigConta(Config):
         token_omitido = '*' * len(self.token)
         return f'ConfigConta(email={self.email!r}, token={token_omitido!r})'
 
-    def query_string(self) -> str:
+    def credencial(self) -> str:
+        """
+        Identificação da conta pelo email
+        :return:
+        """
+        return f'email:{self.email}'
+
+    def _credenciais(self) -> List[Tuple[str, str]]:
         """
-        Constroi query string contendo email e token
+        Credenciais contendo email e token
         :return:
         """
-        return f'email={self.email}&token={self.token}'
+        return [('email', self.email), ('token', self.token)]
 
 
 class ConfigApp(Config):
     """
     Classe que representa uma configuração por app_id e app_key
     """
+    _atributos_url = frozenset({'ambiente', 'app_id', 'app_key'})
 
-    def __init__(self, app_id: str, app_key: str, ambiente: str = PRODUCAO):
-        super().__init__(ambiente)
+    def __init__(self, app_id: str, app_key: str, ambiente: str = PRODUCAO, cliente: 'Cliente' = None):
+        super().__init__(ambiente, cliente)
         self.app_key = app_key
         self.app_id = app_id
 
@@ -77,17 +153,79 @@ class ConfigApp(Config):
         app_key_omitida = '*' * len(self.app_key)
         return f'ConfigApp(app_id={self.app_id!r}, app_key={app_key_omitida!r})'
 
-    def query_string(self) -> str:
+    def credencial(self) -> str:
+        """
+        Identificação da aplicação pelo app_id
+        :return:
+        """
+        return f'app:{self.app_id}'
+
+    def _credenciais(self) -> List[Tuple[str, str]]:
         """
-        Constroi query string contendo app_key e app_id
+        Credenciais contendo app_key e app_id
         :return:
         """
-        return f'appID={self.app_id}&appKey={self.app_key}'
+        return [('appID', self.app_id), ('appKey', self.app_key)]
 
 
 def get_config_padrao() -> Config:
     """
-    Função que retorna configuração padrão atual da aplicação
+    Função que retorna configuração padrão atual: a do contexto, se definida com usar_config, ou a global da aplicação
     :return: Configuração atual
     """
-    return config_padrao
+    config = _config_do_contexto.get()
+    return config_padrao if config is None else config
+
+
+class usar_config:
+    """
+    Define a configuração padrão apenas dentro de um bloco with ou durante a execução de uma função decorada,
+    sem afetar outras threads ou tarefas do asyncio:
+
+        with usar_config(ConfigConta(email, token)):
+            CriadorPlanoRecorrente().plano_automatico_idenficacao(...)
+
+        @usar_config(config_da_loja)
+        async def criar_planos_da_loja(): ...
+    """
+
+    def __init__(self, config: Config):
+        """
+        :param config: configuração usada como padrão no contexto
+        """
+        self.config = config
+
+    def __enter__(self) -> Config:
+        token = _config_do_contexto.set(self.config)
+        _tokens_do_contexto.set(_tokens_do_contexto.get() + (token,))
+        return self.config
+
+    def __exit__(self, *args) -> None:
+        tokens = _tokens_do_contexto.get()
+        _tokens_do_contexto.set(tokens[:-1])
+        _config_do_contexto.reset(tokens[-1])
+
+    def __call__(self, funcao: Callable) -> Callable:
+        from inspect import iscoroutinefunction
+
+        config = self.config
+        if iscoroutinefunction(funcao):
+            @wraps(funcao)
+            async def envoltorio_async(*args, **kwargs):
+                token = _config_do_contexto.set(config)
+                try:
+                    return await funcao(*args, **kwargs)
+                finally:
+                    _config_do_contexto.reset(token)
+
+            return envoltorio_async
+
+        @wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            token = _config_do_contexto.set(config)
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                _config_do_contexto.reset(token)
+
+        return envoltorio
@@ -0,0 +1,177 @@
+"""
+Esse módulo contém a consulta paginada de planos e adesões de pagamento recorrente.
+
+As buscas são geradores: os registros são entregues página a página e, enquanto uma página é processada, a próxima
+já está sendo buscada em uma thread. Assim no máximo duas páginas ficam em memória e a espera pela rede se sobrepõe ao
+processamento de quem consome os registros.
+
+As consultas de um plano ou adesão pelo código passam pelo cache de consultas do cliente, se houver um.
+
+Doc da API: https://dev.pagseguro.uol.com.br/reference#api-pagamento-recorrente-listar-adesoes
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterator, List, Tuple
+
+from pygseguro import instrumentacao
+from pygseguro.config import Config, get_config_padrao
+from pygseguro.decodificacao import decodificar_json
+from pygseguro.exceptions import PagseguroException
+
+
+def _formatar_data(data: datetime) -> str:
+    return data.isoformat(timespec='minutes')
+
+
+class BuscaRecorrente:
+    """
+    Classe que representa a busca de planos e adesões de pagamento recorrente em uma conta:
+
+        busca = BuscaRecorrente(config)
+        for adesao in busca.adesoes(datetime(2019, 4, 1), datetime(2019, 4, 30), status='ACTIVE'):
+            ...
+    """
+    _endpoint_planos = '/pre-approvals/request/'
+    _endpoint_adesoes = '/pre-approvals/'
+    _headers = {'Accept': 'application/vnd.pagseguro.com.br.v3+json;charset=ISO-8859-1'}
+
+    def __init__(self, config: Config = None, por_pagina: int = 100, prazo: float = None):
+        """
+        :param config: configuração da conta consultada. Se omitida usa a configuração padrão
+        :param por_pagina: quantidade de registros pedidos em cada página
+        :param prazo: segundos disponíveis para a busca de cada página, incluindo retentativas
+        """
+        self._config = get_config_padrao() if config is None else config
+        self.por_pagina = por_pagina
+        self.prazo = prazo
+
+    def __repr__(self) -> str:
+        return f'BuscaRecorrente(config={self._config!r}, por_pagina={self.por_pagina!r})'
+
+    def planos(self, data_inicial: datetime, data_final: datetime, status: str = None) -> Iterator[Dict]:
+        """
+        Busca os planos criados no intervalo
+        :param data_inicial: início do intervalo de criação
+        :param data_final: fim do intervalo de criação
+        :param status: filtra os planos pelo status, por exemplo ACTIVE
+        :return: gerador dos planos, na ordem devolvida pelo pagseguro
+        """
+        return self._paginar(self._endpoint_planos, 'preApprovalRequestList', data_inicial, data_final, status)
+
+    def adesoes(self, data_inicial: datetime, data_final: datetime, status: str = None) -> Iterator[Dict]:
+        """
+        Busca as adesões feitas no intervalo
+        :param data_inicial: início do intervalo de adesão
+        :param data_final: fim do intervalo de adesão
+        :param status: filtra as adesões pelo status, por exemplo ACTIVE ou CANCELLED
+        :return: gerador das adesões, na ordem devolvida pelo pagseguro
+        """
+        return self._paginar(self._endpoint_adesoes, 'preApprovalList', data_inicial, data_final, status)
+
+    def plano(self, codigo: str) -> Dict:
+        """
+        Consulta um plano pelo código. Se o cliente tiver um cache de consultas a resposta é reaproveitada
+        :param codigo: código do plano, como em PlanoAutomaticoRecorrente.codigo
+        :return: dados do plano
+        :raises PagseguroException: se o plano não existir
+        """
+        return self._consultar(self._endpoint_planos, codigo)
+
+    def adesao(self, codigo: str) -> Dict:
+        """
+        Consulta uma adesão pelo código. Se o cliente tiver um cache de consultas a resposta é reaproveitada
+        :param codigo: código da adesão
+        :return: dados da adesão
+        :raises PagseguroException: se a adesão não existir
+        """
+        return self._consultar(self._endpoint_adesoes, codigo)
+
+    def invalidar(self, codigo: str) -> None:
+        """
+        Remove do cache de consultas o plano e a adesão com o código, para ser usado após alterá-los
+        :param codigo: código do plano ou da adesão
+        """
+        cache = self._config.obter_cliente().cache_consultas
+        if cache is not None:
+            credencial = self._config.credencial()
+            cache.invalidar((credencial, f'{self._endpoint_planos}{codigo}'))
+            cache.invalidar((credencial, f'{self._endpoint_adesoes}{codigo}'))
+
+    def _consultar(self, endpoint_base: str, codigo: str) -> Dict:
+        cliente = self._config.obter_cliente()
+        endpoint = f'{endpoint_base}{codigo}'
+        # Os eventos são agrupados pelo endpoint sem o código, para não criar uma série de métricas por registro
+        rotulo = f'{endpoint_base}{{codigo}}'
+        if cliente.cache_consultas is None:
+            return self._buscar(cliente, endpoint, {}, rotulo)
+        chave = (self._config.credencial(), endpoint)
+        return cliente.cache_consultas.obter(chave, lambda: self._buscar(cliente, endpoint, {}, rotulo))
+
+    def _paginar(self, endpoint: str, chave: str, data_inicial: datetime, data_final: datetime,
+                 status: str = None) -> Iterator[Dict]:
+        parametros = {'initialDate': _formatar_data(data_inicial), 'finalDate': _formatar_data(data_final),
+                      'maxPageResults': self.por_pagina}
+        if status is not None:
+            parametros['status'] = status
+        # Uma única thread busca a próxima página enquanto a atual é consumida
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pygseguro-busca')
+        proxima = None
+        try:
+            registros, total_paginas = self._buscar_pagina(endpoint, chave, parametros, 1)
+            for pagina in range(2, total_paginas + 1):
+                proxima = executor.submit(self._buscar_pagina, endpoint, chave, parametros, pagina)
+                yield from registros
+                registros, _ = proxima.result()
+            proxima = None
+            yield from registros
+        finally:
+            if proxima is not None:
+                proxima.cancel()
+            executor.shutdown(wait=False)
+
+    def _buscar_pagina(self, endpoint: str, chave: str, parametros: Dict, pagina: int) -> Tuple[List[Dict], int]:
+        """
+        Busca uma página
+        :return: registros da página e quantidade total de páginas
+        """
+        dados = self._buscar(self._config.obter_cliente(), endpoint, dict(parametros, page=pagina))
+        return dados.get(chave, []), dados.get('totalPages', 1)
+
+    def _buscar(self, cliente, endpoint: str, parametros: Dict, rotulo: str = None) -> Dict:
+        """
+        Faz a consulta e decodifica a resposta, emitindo um evento de instrumentação se houver coletores
+        :param rotulo: endpoint usado no evento. Se omitido usa o próprio endpoint
+        """
+        if instrumentacao.coletores:
+            return self._buscar_instrumentado(cliente, endpoint, parametros, endpoint if rotulo is None else rotulo)
+        return self._decodificar(cliente.get(self._config, endpoint, parametros, self._headers, self.prazo))
+
+    def _buscar_instrumentado(self, cliente, endpoint: str, parametros: Dict, rotulo: str) -> Dict:
+        # Consultas não têm corpo, então a fase de serialização fica zerada
+        evento = instrumentacao.EventoChamada(rotulo, self._config.ambiente)
+        inicio = time.perf_counter()
+        try:
+            response = cliente.get(self._config, endpoint, parametros, self._headers, self.prazo, evento)
+            recebido = time.perf_counter()
+            evento.duracao_rede = recebido - inicio
+            dados = self._decodificar(response)
+            evento.duracao_decodificacao = time.perf_counter() - recebido
+            return dados
+        except Exception as erro:
+            evento.erro = type(erro).__name__
+            raise
+        finally:
+            instrumentacao.emitir(evento)
+
+    @staticmethod
+    def _decodificar(response) -> Dict:
+        try:
+            dados = decodificar_json(response.content, response.headers)
+        except ValueError:
+            # Em instabilidades o pagseguro pode responder com uma página html de erro
+            erro = {'error': True, 'errors': {str(response.status_code): 'invalid response from pagseguro.'}}
+            raise PagseguroException(erro, response.status_code)
+        if dados.get('error', False):
+            raise PagseguroException(dados, response.status_code)
+        return dados
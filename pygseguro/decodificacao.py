@@ -0,0 +1,75 @@
+"""
+Esse módulo contém a decodificação das respostas da API do pagseguro.
+
+As respostas são decodificadas direto dos bytes recebidos com o charset informado no Content-Type ou, na falta dele,
+com o charset pedido no cabeçalho Accept (ISO-8859-1), sem tentar adivinhar a codificação pelo conteúdo.
+O backend de json é plugável: por padrão é o json da biblioteca padrão, mas definir_backend_json permite usar orjson,
+ujson ou qualquer função que receba bytes ou str e retorne os dados.
+"""
+import json
+from datetime import datetime, timezone
+from importlib import import_module
+from typing import Any, Callable, Dict, Mapping, Union
+
+CHARSET_PADRAO = 'iso-8859-1'
+_CHARSETS_COMPATIVEIS_COM_UTF8 = frozenset({'utf-8', 'utf8'})
+
+# Nome do backend -> módulo que fornece a função loads. São importados apenas quando escolhidos
+BACKENDS_JSON = {'json': 'json', 'orjson': 'orjson', 'ujson': 'ujson'}
+
+_carregar_json: Callable[[Union[bytes, str]], Any] = json.loads
+_aceita_bytes_utf8 = True
+
+
+def definir_backend_json(backend: Union[str, Callable[[Union[bytes, str]], Any]], aceita_bytes: bool = True) -> None:
+    """
+    Define o backend usado para decodificar o json das respostas
+    :param backend: nome de um backend de BACKENDS_JSON ou função com a mesma assinatura de json.loads
+    :param aceita_bytes: se a função aceita bytes em UTF-8 diretamente. Só é considerado para funções
+    :raises ImportError: se o backend escolhido não estiver instalado
+    """
+    global _carregar_json, _aceita_bytes_utf8
+    if isinstance(backend, str):
+        _carregar_json = import_module(BACKENDS_JSON[backend]).loads
+        _aceita_bytes_utf8 = True
+    else:
+        _carregar_json = backend
+        _aceita_bytes_utf8 = aceita_bytes
+
+
+def obter_charset(headers: Mapping[str, str]) -> str:
+    """
+    Extrai o charset do Content-Type
+    :param headers: cabeçalhos da resposta. Tanto os do requests quanto os de Resposta, com nomes em minúsculas
+    :return: charset em minúsculas ou CHARSET_PADRAO se não informado
+    """
+    tipo = headers.get('content-type') or headers.get('Content-Type') or ''
+    for parametro in tipo.split(';')[1:]:
+        nome, _, valor = parametro.partition('=')
+        if nome.strip().lower() == 'charset':
+            return valor.strip().strip('"').lower()
+    return CHARSET_PADRAO
+
+
+def decodificar_json(conteudo: bytes, headers: Mapping[str, str] = None) -> Dict:
+    """
+    Decodifica o json de uma resposta a partir dos bytes brutos
+    :param conteudo: corpo da resposta
+    :param headers: cabeçalhos da resposta, de onde vem o charset
+    :return: dados da resposta
+    :raises ValueError: se o conteúdo não for um json válido no charset informado
+    """
+    charset = CHARSET_PADRAO if headers is None else obter_charset(headers)
+    # Conteúdo ascii é idêntico em UTF-8 e ISO-8859-1, então pode ser entregue ao backend sem decodificar
+    if _aceita_bytes_utf8 and (charset in _CHARSETS_COMPATIVEIS_COM_UTF8 or conteudo.isascii()):
+        return _carregar_json(conteudo)
+    return _carregar_json(conteudo.decode(charset))
+
+
+def decodificar_data(data: str) -> datetime:
+    """
+    Converte a data ISO 8601 com fuso enviada pelo pagseguro para UTC
+    :param data: data como '2019-04-29T21:38:04-03:00'
+    :return: datetime em UTC
+    """
+    return datetime.fromisoformat(data).astimezone(timezone.utc)
@@ -1,8 +1,43 @@
 from typing import Dict
 
 
-class PagseguroException(Exception):
+class PygseguroException(Exception):
+    """
+    Exceção base de todos os erros levantados pela biblioteca
+    """
+
+
+class PagseguroException(PygseguroException):
     def __init__(self, payload: Dict, status_code: int) -> None:
         super().__init__(payload)
         self.status_code = status_code
         self.erros = payload['errors']
+
+
+class ValidacaoException(PagseguroException):
+    """
+    Levantada antes de qualquer chamada quando a validação local encontra violações. Os erros têm a mesma estrutura
+    dos devolvidos pelo pagseguro, indexados pelo caminho do campo, e status_code é None
+    """
+
+    def __init__(self, payload: Dict) -> None:
+        super().__init__(payload, None)
+
+
+class TransporteException(PygseguroException):
+    """
+    Erro de comunicação com o pagseguro, como falha de conexão, que persistiu após as retentativas configuradas
+    """
+
+
+class CircuitoAbertoException(TransporteException):
+    """
+    Levantada sem tentar a requisição quando o disjuntor está aberto devido a uma taxa alta de erros
+    """
+
+
+class TempoEsgotadoException(PygseguroException):
+    """
+    Levantada quando o pagseguro não responde dentro do timeout ou quando o prazo total da chamada, incluindo
+    retentativas, se esgota
+    """
@@ -0,0 +1,278 @@
+"""
+Esse módulo contém a criação idempotente de planos, usando a referência do plano como chave.
+
+Chamadas simultâneas com a mesma referência são coalescidas em uma única requisição, cujo resultado é entregue a todas.
+Os planos criados ficam guardados em um armazenamento limitado, em memória ou em um arquivo SQLite local, de forma que
+repetir a criação de uma referência, por exemplo após um timeout do lado de quem chamou ou quando dois workers pegam a
+mesma tarefa, devolve o plano já criado sem nova chamada ao pagseguro.
+"""
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FuturoEsgotado
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple, TYPE_CHECKING
+
+from pygseguro.cache import _copiar_erro
+from pygseguro.exceptions import TempoEsgotadoException
+
+if TYPE_CHECKING:
+    from pygseguro.plano_recorrente_automatico import PlanoAutomaticoRecorrente
+
+# (credencial da conta, referência do plano ou outra chave que identifique o plano na conta)
+Chave = Tuple[str, str]
+
+
+class Armazenamento:
+    """
+    Classe base dos armazenamentos de planos já criados
+    """
+
+    def obter(self, chave: Chave) -> Optional['PlanoAutomaticoRecorrente']:
+        """
+        Metodo abstrato que deve ser implementado em cada subclasse.
+        :param chave: credencial e referência do plano
+        :return: plano criado com essa chave ou None
+        """
+        raise NotImplementedError()
+
+    def guardar(self, chave: Chave, plano: 'PlanoAutomaticoRecorrente') -> None:
+        """
+        Metodo abstrato que deve ser implementado em cada subclasse.
+        :param chave: credencial e referência do plano
+        :param plano: plano criado
+        """
+        raise NotImplementedError()
+
+    def remover(self, chave: Chave) -> None:
+        """
+        Metodo abstrato que deve ser implementado em cada subclasse.
+        :param chave: credencial e referência do plano
+        """
+        raise NotImplementedError()
+
+    def fechar(self) -> None:
+        """
+        Libera os recursos do armazenamento
+        """
+
+
+class ArmazenamentoEmMemoria(Armazenamento):
+    """
+    Guarda os planos em memória, descartando os usados há mais tempo ao atingir `max_itens`
+    """
+
+    def __init__(self, max_itens: int = 10_000):
+        """
+        :param max_itens: quantidade máxima de planos guardados
+        """
+        self.max_itens = max_itens
+        self._planos: 'OrderedDict[Chave, PlanoAutomaticoRecorrente]' = OrderedDict()
+        self._trava = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f'ArmazenamentoEmMemoria(max_itens={self.max_itens!r})'
+
+    def __len__(self) -> int:
+        return len(self._planos)
+
+    def obter(self, chave: Chave) -> Optional['PlanoAutomaticoRecorrente']:
+        with self._trava:
+            plano = self._planos.get(chave)
+            if plano is not None:
+                self._planos.move_to_end(chave)
+            return plano
+
+    def guardar(self, chave: Chave, plano: 'PlanoAutomaticoRecorrente') -> None:
+        with self._trava:
+            self._planos[chave] = plano
+            self._planos.move_to_end(chave)
+            while len(self._planos) > self.max_itens:
+                self._planos.popitem(last=False)
+
+    def remover(self, chave: Chave) -> None:
+        with self._trava:
+            self._planos.pop(chave, None)
+
+
+class ArmazenamentoSqlite(Armazenamento):
+    """
+    Guarda os planos em um arquivo SQLite local, que sobrevive a reinícios do processo e pode ser compartilhado entre
+    processos da mesma máquina. Ao atingir `max_itens` os planos gravados há mais tempo são descartados
+    """
+
+    def __init__(self, caminho: str, max_itens: int = 1_000_000, tabela: str = 'planos_idempotentes'):
+        """
+        :param caminho: caminho do arquivo do banco, criado se não existir
+        :param max_itens: quantidade máxima de planos guardados
+        :param tabela: tabela onde os planos são guardados, permitindo usar o mesmo arquivo para vários fins
+        """
+        if not tabela.isidentifier():
+            raise ValueError(f'Nome de tabela inválido: {tabela!r}')
+        self.caminho = caminho
+        self.max_itens = max_itens
+        self.tabela = tabela
+        self._trava = threading.Lock()
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self._conexao.execute('PRAGMA journal_mode=WAL')
+        self._conexao.execute(f'CREATE TABLE IF NOT EXISTS {tabela} (credencial TEXT NOT NULL, chave TEXT NOT NULL, '
+                              'codigo TEXT NOT NULL, criacao TEXT NOT NULL, PRIMARY KEY (credencial, chave))')
+
+    def __repr__(self) -> str:
+        return f'ArmazenamentoSqlite(caminho={self.caminho!r}, max_itens={self.max_itens!r}, tabela={self.tabela!r})'
+
+    def __len__(self) -> int:
+        with self._trava:
+            return self._conexao.execute(f'SELECT COUNT(*) FROM {self.tabela}').fetchone()[0]
+
+    def obter(self, chave: Chave) -> Optional['PlanoAutomaticoRecorrente']:
+        from pygseguro.plano_recorrente_automatico import PlanoAutomaticoRecorrente
+
+        with self._trava:
+            linha = self._conexao.execute(
+                f'SELECT codigo, criacao FROM {self.tabela} WHERE credencial = ? AND chave = ?', chave
+            ).fetchone()
+        if linha is None:
+            return None
+        codigo, criacao = linha
+        return PlanoAutomaticoRecorrente(codigo, datetime.fromisoformat(criacao))
+
+    def guardar(self, chave: Chave, plano: 'PlanoAutomaticoRecorrente') -> None:
+        with self._trava:
+            self._conexao.execute(f'INSERT OR REPLACE INTO {self.tabela} VALUES (?, ?, ?, ?)',
+                                  (*chave, plano.codigo, plano.criacao.isoformat()))
+            # O rowid cresce a cada gravação, então os menores são os gravados há mais tempo
+            self._conexao.execute(f'DELETE FROM {self.tabela} WHERE rowid <= '
+                                  f'(SELECT MAX(rowid) FROM {self.tabela}) - ?', (self.max_itens,))
+
+    def remover(self, chave: Chave) -> None:
+        with self._trava:
+            self._conexao.execute(f'DELETE FROM {self.tabela} WHERE credencial = ? AND chave = ?', chave)
+
+    def fechar(self) -> None:
+        with self._trava:
+            self._conexao.close()
+
+
+class Idempotencia:
+    """
+    Torna a criação de planos idempotente pela referência: chamadas simultâneas com a mesma chave fazem uma única
+    requisição e chamadas repetidas devolvem o plano guardado no armazenamento
+    """
+
+    def __init__(self, armazenamento: Armazenamento = None):
+        """
+        :param armazenamento: onde os planos criados são guardados. Se omitido usa ArmazenamentoEmMemoria
+        """
+        self.armazenamento = ArmazenamentoEmMemoria() if armazenamento is None else armazenamento
+        self._em_andamento: Dict[Hashable, Future] = {}
+        self._trava = threading.Lock()
+        self._reaproveitados = 0
+        self._coalescidos = 0
+        self._criados = 0
+
+    def __repr__(self) -> str:
+        return f'Idempotencia(armazenamento={self.armazenamento!r})'
+
+    def _iniciar(self, chave: Chave) -> Tuple[Optional['PlanoAutomaticoRecorrente'], Future, bool]:
+        """
+        :return: plano já guardado, futuro da criação em andamento e se quem chamou deve fazer a criação
+        """
+        with self._trava:
+            futuro = self._em_andamento.get(chave)
+            if futuro is not None:
+                self._coalescidos += 1
+                return None, futuro, False
+            plano = self.armazenamento.obter(chave)
+            if plano is not None:
+                self._reaproveitados += 1
+                return plano, None, False
+            futuro = self._em_andamento[chave] = Future()
+            return None, futuro, True
+
+    def _concluir(self, chave: Chave, futuro: Future, plano: 'PlanoAutomaticoRecorrente' = None,
+                  erro: BaseException = None) -> None:
+        # Guardar antes de liberar a chave evita que uma nova chamada não encontre nem a criação nem o plano
+        try:
+            if erro is None:
+                self.armazenamento.guardar(chave, plano)
+        finally:
+            with self._trava:
+                del self._em_andamento[chave]
+                if erro is None:
+                    self._criados += 1
+            # O futuro guarda (plano, erro) em vez da exceção, para que cada chamada coalescida levante uma cópia
+            if not futuro.cancelled():
+                futuro.set_result((plano, erro))
+
+    @staticmethod
+    def _resultado(resultado: Tuple[Optional['PlanoAutomaticoRecorrente'], Optional[BaseException]]
+                   ) -> 'PlanoAutomaticoRecorrente':
+        plano, erro = resultado
+        if erro is not None:
+            raise _copiar_erro(erro)
+        return plano
+
+    def executar(self, chave: Chave, criar: Callable[[], 'PlanoAutomaticoRecorrente'],
+                 prazo: float = None) -> 'PlanoAutomaticoRecorrente':
+        """
+        Executa a criação apenas se nenhuma criação com a mesma chave foi concluída ou está em andamento
+        :param chave: credencial e referência do plano
+        :param criar: função que cria o plano no pagseguro
+        :param prazo: segundos que uma chamada coalescida espera pela criação em andamento
+        :return: plano criado agora, por uma chamada simultânea ou anteriormente
+        :raises TempoEsgotadoException: se a criação em andamento não terminar dentro do prazo
+        """
+        plano, futuro, lider = self._iniciar(chave)
+        if plano is not None:
+            return plano
+        if not lider:
+            try:
+                return self._resultado(futuro.result(prazo))
+            except FuturoEsgotado:
+                raise TempoEsgotadoException('Prazo esgotado aguardando a criação simultânea do plano') from None
+        try:
+            plano = criar()
+        except BaseException as erro:
+            self._concluir(chave, futuro, erro=erro)
+            raise
+        self._concluir(chave, futuro, plano)
+        return plano
+
+    async def executar_async(self, chave: Chave, criar: Callable[[], Awaitable['PlanoAutomaticoRecorrente']],
+                             prazo: float = None) -> 'PlanoAutomaticoRecorrente':
+        """
+        Versão assíncrona de executar, que coalesce chamadas de tarefas e de threads diferentes
+        :param chave: credencial e referência do plano
+        :param criar: função assíncrona que cria o plano no pagseguro
+        :param prazo: segundos que uma chamada coalescida espera pela criação em andamento
+        :return: plano criado agora, por uma chamada simultânea ou anteriormente
+        :raises TempoEsgotadoException: se a criação em andamento não terminar dentro do prazo
+        """
+        plano, futuro, lider = self._iniciar(chave)
+        if plano is not None:
+            return plano
+        if not lider:
+            # shield impede que o cancelamento ou o prazo de uma chamada coalescida cancele o futuro compartilhado
+            try:
+                resultado = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(futuro)), prazo)
+            except asyncio.TimeoutError:
+                raise TempoEsgotadoException('Prazo esgotado aguardando a criação simultânea do plano') from None
+            return self._resultado(resultado)
+        try:
+            plano = await criar()
+        except BaseException as erro:
+            self._concluir(chave, futuro, erro=erro)
+            raise
+        self._concluir(chave, futuro, plano)
+        return plano
+
+    def estatisticas(self) -> Dict:
+        """
+        Contadores de planos criados, reaproveitados do armazenamento e de chamadas coalescidas
+        :return: dicionário com as estatísticas
+        """
+        with self._trava:
+            return {'criados': self._criados, 'reaproveitados': self._reaproveitados,
+                    'coalescidos': self._coalescidos}
@@ -0,0 +1,203 @@
+"""
+Esse módulo contém os ganchos de instrumentação das chamadas à API do pagseguro.
+
+Coletores registrados com registrar_coletor recebem um EventoChamada por chamada, com tamanho do payload, status,
+retentativas e a duração de cada fase: serialização do corpo, rede (incluindo esperas e retentativas) e decodificação
+da resposta. Quando nenhum coletor está registrado as chamadas não medem nada nem criam eventos.
+
+HistogramaEmMemoria é um coletor pronto que agrega os eventos em histogramas, para ser exposto em um endpoint de
+métricas.
+"""
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, Tuple
+
+coletores: Tuple['ColetorMetricas', ...] = ()
+_trava_coletores = threading.Lock()
+
+
+class EventoChamada:
+    """
+    Dados de uma chamada à API do pagseguro. Durações em segundos
+    """
+    __slots__ = ('endpoint', 'ambiente', 'bytes_enviados', 'bytes_recebidos', 'duracao_serializacao',
+                 'duracao_rede', 'duracao_decodificacao', 'status_code', 'retentativas', 'erro')
+
+    def __init__(self, endpoint: str, ambiente: str):
+        self.endpoint = endpoint
+        self.ambiente = ambiente
+        self.bytes_enviados = 0
+        self.bytes_recebidos = 0
+        self.duracao_serializacao = 0.0
+        self.duracao_rede = 0.0
+        self.duracao_decodificacao = 0.0
+        self.status_code = None
+        self.retentativas = 0
+        self.erro = None
+
+    def __repr__(self) -> str:
+        campos = ', '.join(f'{nome}={getattr(self, nome)!r}' for nome in self.__slots__)
+        return f'EventoChamada({campos})'
+
+
+class ColetorMetricas:
+    """
+    Classe base para coletores de métricas. Subclasses devem implementar registrar, que é chamado na thread
+    (ou event loop) que fez a chamada, então deve ser rápido e seguro para uso concorrente
+    """
+
+    def registrar(self, evento: EventoChamada) -> None:
+        raise NotImplementedError()
+
+
+def registrar_coletor(coletor: ColetorMetricas) -> None:
+    """
+    Registra um coletor que passará a receber os eventos de todas as chamadas
+    :param coletor: ColetorMetricas
+    """
+    global coletores
+    with _trava_coletores:
+        coletores = coletores + (coletor,)
+
+
+def remover_coletor(coletor: ColetorMetricas) -> None:
+    """
+    Remove um coletor registrado anteriormente
+    :param coletor: ColetorMetricas
+    """
+    global coletores
+    with _trava_coletores:
+        coletores = tuple(c for c in coletores if c is not coletor)
+
+
+def emitir(evento: EventoChamada) -> None:
+    """
+    Envia o evento para todos os coletores registrados
+    :param evento: EventoChamada
+    """
+    for coletor in coletores:
+        coletor.registrar(evento)
+
+
+LIMITES_DURACAO = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_BYTES = (128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+
+class Histograma:
+    """
+    Histograma de baldes fixos, no formato usado pelo Prometheus: contagem por limite superior, soma e total
+    """
+    __slots__ = ('limites', 'contagens', 'soma', 'total')
+
+    def __init__(self, limites: Iterable[float]):
+        self.limites = tuple(limites)
+        self.contagens = [0] * (len(self.limites) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float) -> None:
+        self.contagens[bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def percentil(self, fracao: float) -> float:
+        """
+        Estimativa do percentil pelo limite superior do balde que o contém
+        :param fracao: percentil entre 0 e 1, por exemplo 0.99
+        :return: limite superior do balde, ou infinito se estiver acima do último limite
+        """
+        alvo = fracao * self.total
+        acumulado = 0
+        for limite, contagem in zip(self.limites + (float('inf'),), self.contagens):
+            acumulado += contagem
+            if acumulado >= alvo and acumulado > 0:
+                return limite
+        return 0.0
+
+    def exportar(self) -> Dict:
+        acumulado = 0
+        baldes = {}
+        for limite, contagem in zip(self.limites + (float('inf'),), self.contagens):
+            acumulado += contagem
+            baldes[limite] = acumulado
+        return {'baldes': baldes, 'soma': self.soma, 'total': self.total}
+
+
+class HistogramaEmMemoria(ColetorMetricas):
+    """
+    Coletor que agrega os eventos em histogramas por endpoint e ambiente, além de contar status e erros
+    """
+    _fases = ('serializacao', 'rede', 'decodificacao')
+
+    def __init__(self, limites_duracao: Iterable[float] = LIMITES_DURACAO,
+                 limites_bytes: Iterable[float] = LIMITES_BYTES):
+        self.limites_duracao = tuple(limites_duracao)
+        self.limites_bytes = tuple(limites_bytes)
+        self._series = {}
+        self._trava = threading.Lock()
+
+    def _serie(self, chave: Tuple[str, str]) -> Dict:
+        serie = self._series.get(chave)
+        if serie is None:
+            serie = self._series[chave] = {
+                'duracao': {fase: Histograma(self.limites_duracao) for fase in self._fases},
+                'bytes_enviados': Histograma(self.limites_bytes),
+                'bytes_recebidos': Histograma(self.limites_bytes),
+                'status': {},
+                'erros': {},
+                'retentativas': 0,
+            }
+        return serie
+
+    def registrar(self, evento: EventoChamada) -> None:
+        with self._trava:
+            serie = self._serie((evento.endpoint, evento.ambiente))
+            duracao = serie['duracao']
+            duracao['serializacao'].observar(evento.duracao_serializacao)
+            duracao['rede'].observar(evento.duracao_rede)
+            duracao['decodificacao'].observar(evento.duracao_decodificacao)
+            serie['bytes_enviados'].observar(evento.bytes_enviados)
+            serie['bytes_recebidos'].observar(evento.bytes_recebidos)
+            if evento.status_code is not None:
+                serie['status'][evento.status_code] = serie['status'].get(evento.status_code, 0) + 1
+            if evento.erro is not None:
+                serie['erros'][evento.erro] = serie['erros'].get(evento.erro, 0) + 1
+            serie['retentativas'] += evento.retentativas
+
+    def percentil(self, endpoint: str, ambiente: str, fase: str, fracao: float) -> float:
+        """
+        Estimativa de percentil da duração de uma fase
+        :param endpoint: endpoint da API
+        :param ambiente: ambiente (PRODUCAO ou SANDBOX)
+        :param fase: serializacao, rede ou decodificacao
+        :param fracao: percentil entre 0 e 1
+        :return: duração em segundos, ou nan se nenhum evento do endpoint e ambiente foi registrado
+        """
+        with self._trava:
+            # Consultar não cria a série, para não exportar séries vazias de endpoints que nunca foram chamados
+            serie = self._series.get((endpoint, ambiente))
+            if serie is None:
+                return float('nan')
+            return serie['duracao'][fase].percentil(fracao)
+
+    def exportar(self) -> Dict:
+        """
+        Cópia dos dados agregados, para ser exposta em um endpoint de métricas
+        :return: dicionário indexado por (endpoint, ambiente)
+        """
+        with self._trava:
+            return {
+                chave: {
+                    'duracao': {fase: h.exportar() for fase, h in serie['duracao'].items()},
+                    'bytes_enviados': serie['bytes_enviados'].exportar(),
+                    'bytes_recebidos': serie['bytes_recebidos'].exportar(),
+                    'status': dict(serie['status']),
+                    'erros': dict(serie['erros']),
+                    'retentativas': serie['retentativas'],
+                }
+                for chave, serie in self._series.items()
+            }
+
+    def limpar(self) -> None:
+        with self._trava:
+            self._series = {}
@@ -0,0 +1,197 @@
+"""
+Esse módulo contém limitadores de taxa do tipo balde de tokens (token bucket), usados pelo Cliente para não
+ultrapassar o limite de requisições que o pagseguro aplica por conta.
+
+BaldeDeTokens é compartilhado entre threads de um mesmo processo. BaldeDeTokensArquivo guarda seu estado em um
+arquivo local protegido por trava, de forma que vários processos de uma mesma máquina dividam o mesmo orçamento.
+LimitadorPorCredencial mantém um balde para cada credencial (email ou app_id) das configurações.
+"""
+import asyncio
+import hashlib
+import os
+import struct
+import threading
+import time
+from typing import Callable, Dict
+
+from pygseguro.exceptions import TempoEsgotadoException
+
+_FORMATO_ESTADO = struct.Struct('dd')
+
+
+class BaldeDeTokens:
+    """
+    Balde de tokens seguro para uso entre threads.
+
+    Cada requisição consome um token; os tokens são repostos continuamente a `taxa` por segundo até a `capacidade`.
+    Quando não há tokens disponíveis a requisição reserva o próximo token e espera até ele ser reposto, então as
+    chamadas são atendidas em ordem de chegada e o ritmo se mantém constante em vez de alternar rajadas e pausas.
+    """
+
+    def __init__(self, taxa: float, capacidade: float = None, relogio: Callable[[], float] = time.monotonic):
+        """
+        :param taxa: quantidade de requisições por segundo sustentada
+        :param capacidade: tamanho máximo de rajada. Se omitida é igual à taxa
+        :param relogio: função que retorna o tempo atual em segundos
+        """
+        self.taxa = taxa
+        self.capacidade = taxa if capacidade is None else capacidade
+        self._relogio = relogio
+        self._tokens = self.capacidade
+        self._atualizado_em = relogio()
+        self._trava = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}(taxa={self.taxa!r}, capacidade={self.capacidade!r})'
+
+    @staticmethod
+    def _calcular_reserva(tokens: float, atualizado_em: float, agora: float, taxa: float, capacidade: float,
+                          quantidade: float):
+        tokens = min(capacidade, tokens + (agora - atualizado_em) * taxa) - quantidade
+        espera = 0.0 if tokens >= 0 else -tokens / taxa
+        return tokens, espera
+
+    def reservar(self, quantidade: float = 1) -> float:
+        """
+        Reserva tokens sem esperar
+        :param quantidade: quantidade de tokens consumidos
+        :return: segundos que devem ser aguardados antes de fazer a requisição
+        """
+        with self._trava:
+            agora = self._relogio()
+            self._tokens, espera = self._calcular_reserva(self._tokens, self._atualizado_em, agora, self.taxa,
+                                                          self.capacidade, quantidade)
+            self._atualizado_em = agora
+        return espera
+
+    def _reservar_ate(self, quantidade: float, espera_maxima: float = None) -> float:
+        espera = self.reservar(quantidade)
+        if espera_maxima is not None and espera > espera_maxima:
+            self.reservar(-quantidade)
+            raise TempoEsgotadoException(f'Limite de requisições exigiria esperar {espera:.3f}s')
+        return espera
+
+    def adquirir(self, quantidade: float = 1, espera_maxima: float = None) -> float:
+        """
+        Reserva tokens e bloqueia a thread até que eles estejam disponíveis
+        :param quantidade: quantidade de tokens consumidos
+        :param espera_maxima: segundos máximos de espera. Se a espera for maior os tokens são devolvidos
+        :return: segundos aguardados
+        :raises TempoEsgotadoException: se a espera necessária for maior que espera_maxima
+        """
+        espera = self._reservar_ate(quantidade, espera_maxima)
+        if espera > 0:
+            time.sleep(espera)
+        return espera
+
+    async def adquirir_async(self, quantidade: float = 1, espera_maxima: float = None) -> float:
+        """
+        Versão assíncrona de adquirir, que não bloqueia o event loop
+        :param quantidade: quantidade de tokens consumidos
+        :param espera_maxima: segundos máximos de espera. Se a espera for maior os tokens são devolvidos
+        :return: segundos aguardados
+        :raises TempoEsgotadoException: se a espera necessária for maior que espera_maxima
+        """
+        espera = self._reservar_ate(quantidade, espera_maxima)
+        if espera > 0:
+            await asyncio.sleep(espera)
+        return espera
+
+
+class BaldeDeTokensArquivo(BaldeDeTokens):
+    """
+    Balde de tokens cujo estado fica em um arquivo local, compartilhado por todos os processos da máquina.
+    A exclusão mútua entre processos é feita com fcntl.flock, portanto essa classe só funciona em sistemas Unix.
+    """
+
+    def __init__(self, caminho: str, taxa: float, capacidade: float = None, relogio: Callable[[], float] = time.time):
+        """
+        :param caminho: arquivo onde o estado do balde é guardado. É criado se não existir
+        :param taxa: quantidade de requisições por segundo sustentada por todos os processos juntos
+        :param capacidade: tamanho máximo de rajada. Se omitida é igual à taxa
+        :param relogio: função que retorna o tempo atual em segundos, comum a todos os processos
+        """
+        super().__init__(taxa, capacidade, relogio)
+        self.caminho = caminho
+
+    def reservar(self, quantidade: float = 1) -> float:
+        import fcntl
+
+        with self._trava:
+            descritor = os.open(self.caminho, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(descritor, fcntl.LOCK_EX)
+                agora = self._relogio()
+                dados = os.pread(descritor, _FORMATO_ESTADO.size, 0)
+                if len(dados) == _FORMATO_ESTADO.size:
+                    tokens, atualizado_em = _FORMATO_ESTADO.unpack(dados)
+                else:
+                    tokens, atualizado_em = self.capacidade, agora
+                tokens, espera = self._calcular_reserva(tokens, atualizado_em, agora, self.taxa, self.capacidade,
+                                                        quantidade)
+                os.pwrite(descritor, _FORMATO_ESTADO.pack(tokens, agora), 0)
+            finally:
+                os.close(descritor)
+        return espera
+
+
+class LimitadorPorCredencial:
+    """
+    Mantém um balde de tokens por credencial, de forma que cada conta do pagseguro tenha seu próprio orçamento.
+    Se um diretório for informado, os baldes são BaldeDeTokensArquivo guardados nele e compartilhados entre processos.
+    """
+
+    def __init__(self, taxa: float, capacidade: float = None, diretorio: str = None):
+        """
+        :param taxa: quantidade de requisições por segundo sustentada por credencial
+        :param capacidade: tamanho máximo de rajada. Se omitida é igual à taxa
+        :param diretorio: diretório dos arquivos de estado para compartilhar o limite entre processos
+        """
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.diretorio = diretorio
+        self._baldes: Dict[str, BaldeDeTokens] = {}
+        self._trava = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f'LimitadorPorCredencial(taxa={self.taxa!r}, capacidade={self.capacidade!r})'
+
+    def balde(self, credencial: str) -> BaldeDeTokens:
+        """
+        Retorna o balde da credencial, criando-o na primeira chamada
+        :param credencial: identificação da conta, como retornada por Config.credencial
+        :return: BaldeDeTokens
+        """
+        balde = self._baldes.get(credencial)
+        if balde is None:
+            with self._trava:
+                balde = self._baldes.get(credencial)
+                if balde is None:
+                    balde = self._baldes[credencial] = self._criar_balde(credencial)
+        return balde
+
+    def _criar_balde(self, credencial: str) -> BaldeDeTokens:
+        if self.diretorio is None:
+            return BaldeDeTokens(self.taxa, self.capacidade)
+        nome = hashlib.sha1(credencial.encode('utf-8')).hexdigest()
+        return BaldeDeTokensArquivo(os.path.join(self.diretorio, f'{nome}.balde'), self.taxa, self.capacidade)
+
+    def adquirir(self, credencial: str, espera_maxima: float = None) -> float:
+        """
+        Bloqueia até que a credencial possa fazer mais uma requisição
+        :param credencial: identificação da conta
+        :param espera_maxima: segundos máximos de espera
+        :return: segundos aguardados
+        :raises TempoEsgotadoException: se a espera necessária for maior que espera_maxima
+        """
+        return self.balde(credencial).adquirir(espera_maxima=espera_maxima)
+
+    async def adquirir_async(self, credencial: str, espera_maxima: float = None) -> float:
+        """
+        Versão assíncrona de adquirir
+        :param credencial: identificação da conta
+        :param espera_maxima: segundos máximos de espera
+        :return: segundos aguardados
+        :raises TempoEsgotadoException: se a espera necessária for maior que espera_maxima
+        """
+        return await self.balde(credencial).adquirir_async(espera_maxima=espera_maxima)
@@ -0,0 +1,319 @@
+"""
+Esse módulo contém o executor de lotes pela linha de comando, que cria planos a partir de um arquivo CSV ou JSONL.
+
+Cada linha da entrada é a especificação de um plano, com os campos:
+    referencia, nome, detalhes, email_recebedor, expiracao_unidade (DAYS, MONTHS ou YEARS), expiracao_valor, valor,
+    taxa_adesao, frequencia (WEEKLY, MONTHLY, BIMONTHLY, SEMIANNUALLY ou YEARLY), trial, limite_de_uso,
+    url_redirecionamento, url_revisao e url_cancelamento
+Apenas referencia, nome, expiracao_unidade, expiracao_valor, valor e frequencia são obrigatórios.
+
+Os resultados são gravados em JSONL à medida que terminam, e o mesmo arquivo serve de checkpoint: antes de enviar uma
+linha é gravado um registro `iniciado` e, ao terminar, um registro `criado` ou `erro`. Ao executar novamente com a
+mesma saída, as linhas já concluídas são puladas e as que foram iniciadas sem resultado (o processo caiu durante a
+requisição) são registradas como `indeterminado` em vez de enviadas de novo, pois o plano pode ter sido criado.
+
+A memória usada não depende do tamanho da entrada: ela é lida sob demanda e só são mantidas as linhas concluídas
+acima da marca d'água (a maior linha até a qual tudo foi concluído), cuja distância para a marca é limitada.
+
+Uso:
+    pygseguro-lote planos.csv resultados.jsonl --email foo@bar.com --token TOKEN --concorrencia 20
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from decimal import Decimal, InvalidOperation
+from typing import Dict, IO, Iterator, Optional, Set, Tuple
+
+from pygseguro.config import Config, ConfigApp, ConfigConta, PRODUCAO, SANDBOX
+from pygseguro.exceptions import PagseguroException
+from pygseguro.plano_recorrente_automatico import CriadorPlanoRecorrente, UltimoPasso
+
+INICIADO = 'iniciado'
+CRIADO = 'criado'
+ERRO = 'erro'
+INDETERMINADO = 'indeterminado'
+
+_EXPIRACOES = {'DAYS': 'expiracao_em_dias', 'MONTHS': 'expiracao_em_meses', 'YEARS': 'expiracao_em_anos'}
+_FREQUENCIAS = {'WEEKLY': 'frequencia_semanal', 'MONTHLY': 'frequencia_mensal', 'BIMONTHLY': 'frequencia_bimestral',
+                'SEMIANNUALLY': 'frequencia_semestral', 'YEARLY': 'frequencia_anual'}
+_AMBIENTES = {'producao': PRODUCAO, 'sandbox': SANDBOX}
+
+
+class EspecificacaoInvalida(ValueError):
+    """
+    Linha da entrada com campo obrigatório ausente ou valor inválido
+    """
+
+
+def _campo(especificacao: Dict, nome: str, obrigatorio: bool = False) -> Optional[str]:
+    valor = especificacao.get(nome)
+    if valor is None or valor == '':
+        if obrigatorio:
+            raise EspecificacaoInvalida(f'campo obrigatório ausente: {nome}')
+        return None
+    return str(valor).strip()
+
+
+def _decimal(especificacao: Dict, nome: str, obrigatorio: bool = False) -> Optional[Decimal]:
+    valor = _campo(especificacao, nome, obrigatorio)
+    if valor is None:
+        return None
+    try:
+        numero = Decimal(valor)
+    except InvalidOperation:
+        raise EspecificacaoInvalida(f'{nome} não é um número: {valor!r}')
+    if not numero.is_finite():
+        raise EspecificacaoInvalida(f'{nome} não é um número finito: {valor!r}')
+    return numero
+
+
+def _inteiro(especificacao: Dict, nome: str, obrigatorio: bool = False) -> Optional[int]:
+    valor = _campo(especificacao, nome, obrigatorio)
+    if valor is None:
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise EspecificacaoInvalida(f'{nome} não é um inteiro: {valor!r}')
+
+
+def _escolher(especificacao: Dict, nome: str, opcoes: Dict[str, str]) -> str:
+    valor = _campo(especificacao, nome, obrigatorio=True).upper()
+    if valor not in opcoes:
+        raise EspecificacaoInvalida(f'{nome} deve ser um de {", ".join(opcoes)}: {valor!r}')
+    return opcoes[valor]
+
+
+def construir_passo(especificacao: Dict, config: Config = None) -> UltimoPasso:
+    """
+    Constroi a cadeia de passos de um plano a partir de uma linha da entrada
+    :param especificacao: dicionário com os campos descritos no módulo
+    :param config: configuração usada na criação. Se omitida usa a configuração padrão
+    :return: UltimoPasso pronto para criar_no_pagseguro
+    :raises EspecificacaoInvalida: se faltar campo obrigatório ou algum valor for inválido
+    """
+    passo = CriadorPlanoRecorrente(config).plano_automatico_idenficacao(
+        _campo(especificacao, 'referencia', True), _campo(especificacao, 'nome', True),
+        _campo(especificacao, 'detalhes'), _campo(especificacao, 'email_recebedor'))
+    expiracao = _escolher(especificacao, 'expiracao_unidade', _EXPIRACOES)
+    passo = getattr(passo, expiracao)(_inteiro(especificacao, 'expiracao_valor', True))
+    passo = passo.valores_automaticos(_decimal(especificacao, 'valor', True), _decimal(especificacao, 'taxa_adesao'))
+    passo = getattr(passo, _escolher(especificacao, 'frequencia', _FREQUENCIAS))()
+    trial = _inteiro(especificacao, 'trial')
+    if trial is not None:
+        passo = passo.trial(trial)
+    limite_de_uso = _inteiro(especificacao, 'limite_de_uso')
+    if limite_de_uso is not None:
+        passo = passo.limite_de_uso(limite_de_uso)
+    urls = (_campo(especificacao, 'url_redirecionamento'), _campo(especificacao, 'url_revisao'),
+            _campo(especificacao, 'url_cancelamento'))
+    if any(urls):
+        passo = passo.urls_gancho(*urls)
+    return passo
+
+
+def _descrever_erro(erro: Exception) -> Dict:
+    descricao = {'tipo': type(erro).__name__, 'mensagem': str(erro)}
+    if isinstance(erro, PagseguroException):
+        descricao['status_code'] = erro.status_code
+        descricao['erros'] = erro.erros
+    return descricao
+
+
+def criar_linha(linha: int, especificacao: Dict, config: Config, prazo: float = None) -> Dict:
+    """
+    Cria o plano de uma linha. Executada nas threads ou processos do pool, por isso recebe e retorna apenas
+    objetos serializáveis com pickle
+    :return: registro de resultado, com estado criado ou erro
+    """
+    registro = {'linha': linha, 'referencia': especificacao.get('referencia')}
+    try:
+        plano = construir_passo(especificacao, config).criar_no_pagseguro(prazo)
+    except Exception as erro:
+        # Qualquer falha de uma linha vira um registro de erro, sem interromper o lote
+        registro.update(estado=ERRO, erro=_descrever_erro(erro))
+    else:
+        registro.update(estado=CRIADO, codigo=plano.codigo, criacao=plano.criacao.isoformat())
+    return registro
+
+
+class Progresso:
+    """
+    Acompanha as linhas concluídas com memória limitada: guarda a marca d'água, maior linha até a qual todas foram
+    concluídas, e o conjunto de linhas concluídas ou iniciadas acima dela
+    """
+
+    def __init__(self):
+        self.marca = 0
+        self.concluidas: Set[int] = set()
+        self.iniciadas: Set[int] = set()
+
+    def iniciar(self, linha: int) -> None:
+        self.iniciadas.add(linha)
+
+    def concluir(self, linha: int) -> None:
+        self.iniciadas.discard(linha)
+        if linha <= self.marca:
+            return
+        self.concluidas.add(linha)
+        while self.marca + 1 in self.concluidas:
+            self.marca += 1
+            self.concluidas.remove(self.marca)
+
+    def concluida(self, linha: int) -> bool:
+        return linha <= self.marca or linha in self.concluidas
+
+
+def carregar_progresso(caminho: str) -> Progresso:
+    """
+    Lê um arquivo de resultados de uma execução anterior. Uma última linha incompleta, gravada pela metade quando o
+    processo caiu, é removida do arquivo
+    :param caminho: arquivo de resultados em JSONL
+    :return: Progresso com as linhas concluídas e as iniciadas sem resultado
+    """
+    progresso = Progresso()
+    if not os.path.exists(caminho):
+        return progresso
+    with open(caminho, 'rb+') as arquivo:
+        posicao_valida = 0
+        sem_quebra_final = False
+        for linha_arquivo in arquivo:
+            try:
+                registro = json.loads(linha_arquivo)
+            except ValueError:
+                break
+            posicao_valida += len(linha_arquivo)
+            sem_quebra_final = not linha_arquivo.endswith(b'\n')
+            if registro['estado'] == INICIADO:
+                progresso.iniciar(registro['linha'])
+            else:
+                progresso.concluir(registro['linha'])
+        arquivo.truncate(posicao_valida)
+        if sem_quebra_final:
+            arquivo.seek(posicao_valida)
+            arquivo.write(b'\n')
+    return progresso
+
+
+def ler_especificacoes(caminho: str, formato: str = None) -> Iterator[Tuple[int, Dict]]:
+    """
+    Lê a entrada sob demanda
+    :param caminho: arquivo CSV (com cabeçalho) ou JSONL
+    :param formato: csv ou jsonl. Se omitido é deduzido pela extensão
+    :return: gerador de (número da linha, especificação), com linhas numeradas a partir de 1
+    """
+    if formato is None:
+        formato = 'csv' if caminho.lower().endswith('.csv') else 'jsonl'
+    with open(caminho, newline='' if formato == 'csv' else None, encoding='utf-8') as arquivo:
+        if formato == 'csv':
+            yield from enumerate(csv.DictReader(arquivo), start=1)
+        else:
+            numero = 0
+            for linha_arquivo in arquivo:
+                if linha_arquivo.strip():
+                    numero += 1
+                    yield numero, json.loads(linha_arquivo)
+
+
+class _Saida:
+    def __init__(self, arquivo: IO[str], progresso: Progresso):
+        self.arquivo = arquivo
+        self.progresso = progresso
+        self.contagem = {CRIADO: 0, ERRO: 0, INDETERMINADO: 0}
+
+    def gravar(self, registro: Dict) -> None:
+        self.arquivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        self.arquivo.flush()
+        if registro['estado'] == INICIADO:
+            self.progresso.iniciar(registro['linha'])
+        else:
+            self.contagem[registro['estado']] += 1
+            self.progresso.concluir(registro['linha'])
+
+
+def executar_lote(especificacoes: Iterator[Tuple[int, Dict]], caminho_saida: str, config: Config,
+                  concorrencia: int = 10, processos: bool = False, prazo: float = None,
+                  janela: int = None) -> Dict[str, int]:
+    """
+    Cria os planos das especificações em paralelo, gravando os resultados e retomando uma execução anterior
+    :param especificacoes: pares (número da linha, especificação), em ordem crescente de linha
+    :param caminho_saida: arquivo de resultados em JSONL, que também é o checkpoint
+    :param config: configuração usada na criação
+    :param concorrencia: quantidade de threads ou processos
+    :param processos: usa um pool de processos em vez de threads
+    :param prazo: segundos disponíveis para a criação de cada plano, incluindo retentativas
+    :param janela: distância máxima entre a linha enviada e a marca d'água. Limita a memória quando uma requisição
+    demora muito. Se omitida é 100 vezes a concorrência
+    :return: contagem de linhas criadas, com erro, indeterminadas e puladas nessa execução
+    """
+    janela = 100 * concorrencia if janela is None else janela
+    progresso = carregar_progresso(caminho_saida)
+    pool: Executor = (ProcessPoolExecutor if processos else ThreadPoolExecutor)(max_workers=concorrencia)
+    with open(caminho_saida, 'a', encoding='utf-8') as arquivo, pool:
+        saida = _Saida(arquivo, progresso)
+        for linha in sorted(progresso.iniciadas):
+            saida.gravar({'linha': linha, 'estado': INDETERMINADO,
+                          'erro': {'tipo': 'Indeterminado', 'mensagem': 'execução interrompida durante a requisição'}})
+        puladas = 0
+        pendentes: Set[Future] = set()
+
+        def aguardar():
+            nonlocal pendentes
+            prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                saida.gravar(futuro.result())
+
+        for linha, especificacao in especificacoes:
+            if progresso.concluida(linha):
+                puladas += 1
+                continue
+            while pendentes and (len(pendentes) >= concorrencia or linha - progresso.marca > janela):
+                aguardar()
+            saida.gravar({'linha': linha, 'estado': INICIADO})
+            pendentes.add(pool.submit(criar_linha, linha, especificacao, config, prazo))
+        while pendentes:
+            aguardar()
+    return dict(saida.contagem, puladas=puladas)
+
+
+def _configuracao(argumentos: argparse.Namespace) -> Config:
+    ambiente = _AMBIENTES.get(argumentos.ambiente, argumentos.ambiente)
+    if argumentos.app_id:
+        return ConfigApp(argumentos.app_id, argumentos.app_key, ambiente)
+    if argumentos.email:
+        return ConfigConta(argumentos.email, argumentos.token, ambiente)
+    raise SystemExit('Informe --email e --token ou --app-id e --app-key')
+
+
+def main(argv=None) -> int:
+    """
+    Ponto de entrada do comando pygseguro-lote
+    :return: 0 se todos os planos foram criados, 1 se houve algum erro
+    """
+    parser = argparse.ArgumentParser(description='Cria planos de pagamento recorrente a partir de um arquivo CSV ou '
+                                                 'JSONL, com checkpoint para retomar execuções interrompidas')
+    parser.add_argument('entrada', help='arquivo CSV com cabeçalho ou JSONL com as especificações dos planos')
+    parser.add_argument('saida', help='arquivo JSONL de resultados. Se já existir, a execução é retomada')
+    parser.add_argument('--formato', choices=['csv', 'jsonl'], help='formato da entrada. Padrão: pela extensão')
+    parser.add_argument('--email', default=os.environ.get('PAGSEGURO_EMAIL'))
+    parser.add_argument('--token', default=os.environ.get('PAGSEGURO_TOKEN'))
+    parser.add_argument('--app-id', default=os.environ.get('PAGSEGURO_APP_ID'))
+    parser.add_argument('--app-key', default=os.environ.get('PAGSEGURO_APP_KEY'))
+    parser.add_argument('--ambiente', default='producao', help='producao, sandbox ou url base (ex.: de um simulador)')
+    parser.add_argument('--concorrencia', type=int, default=10, help='quantidade de threads ou processos')
+    parser.add_argument('--processos', action='store_true', help='usa processos em vez de threads')
+    parser.add_argument('--prazo', type=float, help='segundos disponíveis para criar cada plano')
+    argumentos = parser.parse_args(argv)
+
+    contagem = executar_lote(ler_especificacoes(argumentos.entrada, argumentos.formato), argumentos.saida,
+                             _configuracao(argumentos), argumentos.concorrencia, argumentos.processos,
+                             argumentos.prazo)
+    print(', '.join(f'{estado}: {quantidade}' for estado, quantidade in contagem.items()), file=sys.stderr)
+    return 1 if contagem[ERRO] or contagem[INDETERMINADO] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,15 @@
+import asyncio
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import copy_context
 from datetime import datetime
 from decimal import Decimal
-from typing import Dict
-
-import pytz
-import requests
+from typing import AsyncIterator, Dict, Iterable, Iterator, Tuple, Union
 
+from pygseguro import instrumentacao, validacao
 from pygseguro.config import Config, get_config_padrao
+from pygseguro.decodificacao import decodificar_data, decodificar_json
 from pygseguro.exceptions import PagseguroException
 
 
@@ -13,7 +17,52 @@ def _to_decimal_string(decimal: Decimal):
     return f'{decimal:.2f}'
 
 
+def _serializar(dados) -> bytes:
+    return json.dumps(dados, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _serializar_invariante(main_data: Dict) -> bytes:
+    """
+    Serializa o payload sem a referência, que é o único campo que costuma variar entre planos de mesmo formato
+    :param main_data: payload do plano
+    :return: json do payload sem referência
+    """
+    return _serializar({chave: valor for chave, valor in main_data.items() if chave != 'reference'})
+
+
+def _inserir_referencia(corpo_invariante: bytes, referencia: str = None) -> bytes:
+    """
+    Insere a referência como primeiro campo de um json já serializado, sem serializar novamente o restante
+    :param corpo_invariante: json gerado por _serializar_invariante
+    :param referencia: referência do plano
+    :return: json completo do payload
+    """
+    if referencia is None:
+        return corpo_invariante
+    separador = b',' if len(corpo_invariante) > 2 else b''
+    return b''.join((b'{"reference":', _serializar(referencia), separador, corpo_invariante[1:]))
+
+
+def _copiar_payload(main_data: Dict) -> Tuple[Dict, Dict, Dict, Dict]:
+    """
+    Copia o payload e seus dicionários aninhados, mantendo as ligações entre eles
+    :param main_data: payload a ser copiado
+    :return: tupla com as cópias de main_data, pre_approval, receiver e expiration
+    """
+    main_data = dict(main_data)
+    pre_approval = main_data['preApproval'] = dict(main_data.get('preApproval', {}))
+    receiver = dict(main_data.get('receiver', {}))
+    if 'receiver' in main_data:
+        main_data['receiver'] = receiver
+    expiration = dict(pre_approval.get('expiration', {}))
+    if 'expiration' in pre_approval:
+        pre_approval['expiration'] = expiration
+    return main_data, pre_approval, receiver, expiration
+
+
 class PassoDePlanoRecorrente:
+    # Cadeias são construídas aos milhares, então os passos não carregam um __dict__ por instância
+    __slots__ = ('_main_data', '_pre_approval', '_receiver', '_expiration', '_config', '_corpo_invariante')
 
     def __init__(self, config: Config = None, main_data: Dict = None, pre_approval: Dict = None, receiver: Dict = None,
                  expiration: Dict = None):
@@ -26,27 +75,47 @@ class PassoDePlanoRecorrente:
             config = get_config_padrao()
 
         self._config = config
+        self._corpo_invariante = None
+
+    def _alterar_payload(self, *args, **kwargs) -> None:
+        """
+        Altera o payload invalidando o corpo serializado em cache
+        """
+        self._manipular_payload(*args, **kwargs)
+        self._corpo_invariante = None
+
+    def _corpo(self) -> bytes:
+        """
+        Corpo da requisição já serializado. A parte invariante é serializada uma única vez e reaproveitada
+        :return: json do payload em bytes
+        """
+        if self._corpo_invariante is None:
+            self._corpo_invariante = _serializar_invariante(self._main_data)
+        return _inserir_referencia(self._corpo_invariante, self._main_data.get('reference'))
 
     def _construir_proximo_passo(self, proximo_passo_cls) -> 'PassoDePlanoRecorrente':
-        return proximo_passo_cls(self._config, self._main_data, self._pre_approval, self._receiver, self._expiration)
+        # Cada passo recebe sua própria cópia, então ramificações a partir de um mesmo passo não interferem entre si
+        return proximo_passo_cls(self._config, *_copiar_payload(self._main_data))
 
     def _manipular_payload(self, *args, **kwargs):
         raise NotImplementedError()
 
 
 class CriadorPlanoRecorrente(PassoDePlanoRecorrente):
+    __slots__ = ()
 
     def __init__(self, config: Config = None):
         super().__init__(config)
 
     def plano_automatico_idenficacao(self, referencia, nome, detalhes=None, receiver_email=None):
         plano = self._construir_proximo_passo(PlanoAutomaticoIdentificacao)
-        plano._manipular_payload(referencia=referencia, nome=nome, detalhes=detalhes,
-                                 receiver_email=receiver_email)
+        plano._alterar_payload(referencia=referencia, nome=nome, detalhes=detalhes,
+                               receiver_email=receiver_email)
         return plano
 
 
 class PlanoAutomaticoIdentificacao(PassoDePlanoRecorrente):
+    __slots__ = ()
 
     def _manipular_payload(self, referencia, nome, detalhes=None, receiver_email=None):
         self._main_data['reference'] = referencia
@@ -69,11 +138,12 @@ class PlanoAutomaticoIdentificacao(PassoDePlanoRecorrente):
 
     def _setar_expiracao(self, tipo_expiracao, valor) -> 'Expiracao':
         expiracao = self._construir_proximo_passo(Expiracao)
-        expiracao._manipular_payload(tipo_expiracao, valor)
+        expiracao._alterar_payload(tipo_expiracao, valor)
         return expiracao
 
 
 class Expiracao(PassoDePlanoRecorrente):
+    __slots__ = ()
     DAYS = 'DAYS'
     MONTHS = 'MONTHS'
     YEARS = 'YEARS'
@@ -85,11 +155,13 @@ class Expiracao(PassoDePlanoRecorrente):
 
     def valores_automaticos(self, valor_periodico: Decimal, taxa_adesao: Decimal = None) -> 'ValoresAutomaticos':
         valores = self._construir_proximo_passo(ValoresAutomaticos)
-        valores._manipular_payload(valor_periodico, taxa_adesao)
+        valores._alterar_payload(valor_periodico, taxa_adesao)
         return valores
 
 
 class ValoresAutomaticos(PassoDePlanoRecorrente):
+    __slots__ = ()
+
     def _manipular_payload(self, valor_periodico: Decimal, taxa_adesao: Decimal = None):
         self._pre_approval['amountPerPayment'] = _to_decimal_string(valor_periodico)
         if taxa_adesao is not None:
@@ -112,27 +184,146 @@ class ValoresAutomaticos(PassoDePlanoRecorrente):
 
     def _setar_frequencia(self, tipo_frequencia: str) -> 'FrequenciaPlanoAutomatico':
         frequencia = self._construir_proximo_passo(FrequenciaPlanoAutomatico)
-        frequencia._manipular_payload(tipo_frequencia)
+        frequencia._alterar_payload(tipo_frequencia)
         return frequencia
 
 
 class UltimoPasso(PassoDePlanoRecorrente):
-    def criar_no_pagseguro(self) -> 'PlanoAutomaticoRecorrente':
+    __slots__ = ()
+    _endpoint = '/pre-approvals/request'
+    _headers = {
+        'Content-Type': 'application/json;charset=UTF-8',
+        'Accept': 'application/vnd.pagseguro.com.br.v3+json;charset=ISO-8859-1'
+    }
+
+    @classmethod
+    def de_payload(cls, payload: Dict, config: Config = None) -> 'UltimoPasso':
+        """
+        Constroi um passo final a partir de um payload pronto, no mesmo formato enviado ao pagseguro
+        :param payload: dicionário com os dados do plano
+        :param config: configuração usada na criação. Se omitida usa a configuração padrão
+        :return: UltimoPasso
+        """
+        return cls(config, *_copiar_payload(payload))
+
+    def compilar_modelo(self) -> 'ModeloPlanoRecorrente':
+        """
+        Congela o plano construído até aqui em um modelo imutável, do qual podem ser geradas variantes
+        sem executar novamente a cadeia de passos
+        :return: ModeloPlanoRecorrente
+        """
+        return ModeloPlanoRecorrente(self._main_data, self._config)
+
+    def criar_no_pagseguro(self, prazo: float = None) -> 'PlanoAutomaticoRecorrente':
         """
         Cria um plano automático na conta do pagseguro
+        :param prazo: segundos disponíveis para a chamada inteira, incluindo retentativas
         :return: código do plano criado
+        :raises ValidacaoException: se a validação local encontrar violações, sem fazer a chamada
         """
-        headers = {
-            'Content-Type': 'application/json;charset=UTF-8',
-            'Accept': 'application/vnd.pagseguro.com.br.v3+json;charset=ISO-8859-1'
-        }
-        response = requests.post(self._config.construir_url('/pre-approvals/request'), json=self._main_data,
-                                 headers=headers)
-        codigo_data = response.json()
-        if codigo_data.get('error', False):
-            raise PagseguroException(codigo_data, response.status_code)
-        dt = datetime.fromisoformat(codigo_data['date']).astimezone(pytz.UTC)
-        return PlanoAutomaticoRecorrente(codigo_data['code'], dt)
+        if validacao.ativa:
+            validacao.validador_plano.validar(self._main_data)
+        cliente = self._config.obter_cliente()
+        referencia = self._main_data.get('reference')
+        if cliente.idempotencia is not None and referencia is not None:
+            chave = (self._config.credencial(), referencia)
+            return cliente.idempotencia.executar(chave, lambda: self._criar(cliente, prazo), prazo)
+        return self._criar(cliente, prazo)
+
+    def _criar(self, cliente, prazo: float) -> 'PlanoAutomaticoRecorrente':
+        registro = cliente.registro_planos
+        if registro is not None:
+            return registro.executar(self, lambda: self._enviar(cliente, prazo), prazo)
+        return self._enviar(cliente, prazo)
+
+    def _enviar(self, cliente, prazo: float) -> 'PlanoAutomaticoRecorrente':
+        if instrumentacao.coletores:
+            return self._criar_instrumentado(cliente, prazo)
+        response = cliente.post(self._config, self._endpoint, self._corpo(), self._headers, prazo)
+        return self._construir_plano(response)
+
+    def _criar_instrumentado(self, cliente, prazo: float) -> 'PlanoAutomaticoRecorrente':
+        evento = instrumentacao.EventoChamada(self._endpoint, self._config.ambiente)
+        inicio = time.perf_counter()
+        try:
+            corpo = self._corpo()
+            evento.bytes_enviados = len(corpo)
+            serializado = time.perf_counter()
+            evento.duracao_serializacao = serializado - inicio
+            response = cliente.post(self._config, self._endpoint, corpo, self._headers, prazo, evento)
+            recebido = time.perf_counter()
+            evento.duracao_rede = recebido - serializado
+            plano = self._construir_plano(response)
+            evento.duracao_decodificacao = time.perf_counter() - recebido
+            return plano
+        except Exception as erro:
+            evento.erro = type(erro).__name__
+            raise
+        finally:
+            instrumentacao.emitir(evento)
+
+    async def criar_no_pagseguro_async(self, prazo: float = None) -> 'PlanoAutomaticoRecorrente':
+        """
+        Cria um plano automático na conta do pagseguro sem bloquear o event loop
+        :param prazo: segundos disponíveis para a chamada inteira, incluindo retentativas
+        :return: código do plano criado
+        :raises ValidacaoException: se a validação local encontrar violações, sem fazer a chamada
+        """
+        if validacao.ativa:
+            validacao.validador_plano.validar(self._main_data)
+        cliente = self._config.obter_cliente()
+        referencia = self._main_data.get('reference')
+        if cliente.idempotencia is not None and referencia is not None:
+            chave = (self._config.credencial(), referencia)
+            return await cliente.idempotencia.executar_async(chave, lambda: self._criar_async(cliente, prazo),
+                                                             prazo)
+        return await self._criar_async(cliente, prazo)
+
+    async def _criar_async(self, cliente, prazo: float) -> 'PlanoAutomaticoRecorrente':
+        registro = cliente.registro_planos
+        if registro is not None:
+            return await registro.executar_async(self, lambda: self._enviar_async(cliente, prazo), prazo)
+        return await self._enviar_async(cliente, prazo)
+
+    async def _enviar_async(self, cliente, prazo: float) -> 'PlanoAutomaticoRecorrente':
+        if instrumentacao.coletores:
+            return await self._criar_instrumentado_async(cliente, prazo)
+        response = await cliente.post_async(self._config, self._endpoint, self._corpo(), self._headers, prazo)
+        return self._construir_plano(response)
+
+    async def _criar_instrumentado_async(self, cliente, prazo: float) -> 'PlanoAutomaticoRecorrente':
+        evento = instrumentacao.EventoChamada(self._endpoint, self._config.ambiente)
+        inicio = time.perf_counter()
+        try:
+            corpo = self._corpo()
+            evento.bytes_enviados = len(corpo)
+            serializado = time.perf_counter()
+            evento.duracao_serializacao = serializado - inicio
+            response = await cliente.post_async(self._config, self._endpoint, corpo, self._headers, prazo, evento)
+            recebido = time.perf_counter()
+            evento.duracao_rede = recebido - serializado
+            plano = self._construir_plano(response)
+            evento.duracao_decodificacao = time.perf_counter() - recebido
+            return plano
+        except Exception as erro:
+            evento.erro = type(erro).__name__
+            raise
+        finally:
+            instrumentacao.emitir(evento)
+
+    @staticmethod
+    def _construir_plano(response) -> 'PlanoAutomaticoRecorrente':
+        try:
+            codigo_data = decodificar_json(response.content, response.headers)
+            if not isinstance(codigo_data, dict):
+                raise ValueError(f'resposta não é um objeto JSON: {codigo_data!r}')
+            if not codigo_data.get('error', False):
+                return PlanoAutomaticoRecorrente(codigo_data['code'], decodificar_data(codigo_data['date']))
+        except (ValueError, LookupError, TypeError):
+            # Em instabilidades o pagseguro pode responder com uma página html de erro ou com um JSON incompleto
+            erro = {'error': True, 'errors': {str(response.status_code): 'invalid response from pagseguro.'}}
+            raise PagseguroException(erro, response.status_code)
+        raise PagseguroException(codigo_data, response.status_code)
 
     def limite_de_uso(self, quantidade: int) -> 'LimiteDeUso':
         """
@@ -141,24 +332,25 @@ class UltimoPasso(PassoDePlanoRecorrente):
         :return: LimiteDeUso
         """
         limite = self._construir_proximo_passo(LimiteDeUso)
-        limite._manipular_payload(quantidade)
+        limite._alterar_payload(quantidade)
         return limite
 
     def trial(self, dias: int) -> 'Trial':
         """Defina um período de testes, em dias (Opcional)"""
         trial = self._construir_proximo_passo(Trial)
-        trial._manipular_payload(dias)
+        trial._alterar_payload(dias)
         return trial
 
     def urls_gancho(self, redirecionamento_url: str = None, revisao_url: str = None,
                     cancelamento_url: str = None) -> 'UrlsGancho':
         """Defina URLs de redirecionamento (Opcional)"""
         urls = self._construir_proximo_passo(UrlsGancho)
-        urls._manipular_payload(redirecionamento_url, revisao_url, cancelamento_url)
+        urls._alterar_payload(redirecionamento_url, revisao_url, cancelamento_url)
         return urls
 
 
 class FrequenciaPlanoAutomatico(UltimoPasso):
+    __slots__ = ()
     WEEKLY = 'WEEKLY'
     MONTHLY = 'MONTHLY'
     BIMONTHLY = 'BIMONTHLY'
@@ -170,16 +362,22 @@ class FrequenciaPlanoAutomatico(UltimoPasso):
 
 
 class LimiteDeUso(UltimoPasso):
+    __slots__ = ()
+
     def _manipular_payload(self, quantidade: int):
         self._main_data['maxUses'] = quantidade
 
 
 class Trial(UltimoPasso):
+    __slots__ = ()
+
     def _manipular_payload(self, dias: int):
         self._pre_approval['trialPeriodDuration'] = dias
 
 
 class UrlsGancho(UltimoPasso):
+    __slots__ = ()
+
     def _manipular_payload(self, redirecionamento_url: str = None, revisao_url: str = None,
                            cancelamento_url: str = None):
         if cancelamento_url:
@@ -191,6 +389,210 @@ class UrlsGancho(UltimoPasso):
 
 
 class PlanoAutomaticoRecorrente:
+    """
+    Plano criado no pagseguro. É imutável, comparável, hashable e serializável com pickle de forma compacta,
+    para ser mantido em grandes quantidades em caches e conciliações
+    """
+    __slots__ = ('codigo', 'criacao')
+
     def __init__(self, codigo: str, criacao: datetime):
-        self.codigo = codigo
-        self.criacao = criacao
+        object.__setattr__(self, 'codigo', codigo)
+        object.__setattr__(self, 'criacao', criacao)
+
+    def __setattr__(self, nome, valor):
+        raise AttributeError(f'{type(self).__name__} é imutável')
+
+    def __repr__(self) -> str:
+        return f'PlanoAutomaticoRecorrente(codigo={self.codigo!r}, criacao={self.criacao!r})'
+
+    def __eq__(self, outro) -> bool:
+        if not isinstance(outro, PlanoAutomaticoRecorrente):
+            return NotImplemented
+        return self.codigo == outro.codigo and self.criacao == outro.criacao
+
+    def __hash__(self) -> int:
+        return hash((self.codigo, self.criacao))
+
+    def __reduce__(self):
+        return PlanoAutomaticoRecorrente, (self.codigo, self.criacao)
+
+
+class ModeloPlanoRecorrente:
+    """
+    Modelo imutável de plano recorrente. Gera payloads de variantes alterando apenas referência, valor ou trial.
+
+    Os dicionários aninhados que não mudam entre variantes são compartilhados com o modelo, por isso os payloads
+    gerados não devem ser alterados.
+    """
+    __slots__ = ('_main_data', '_config', '_corpos_invariantes')
+    _max_corpos_invariantes = 256
+
+    def __init__(self, main_data: Dict, config: Config = None):
+        main_data = _copiar_payload(main_data)[0]
+        object.__setattr__(self, '_main_data', main_data)
+        object.__setattr__(self, '_config', get_config_padrao() if config is None else config)
+        object.__setattr__(self, '_corpos_invariantes', {(None, None): _serializar_invariante(main_data)})
+
+    def __setattr__(self, nome, valor):
+        raise AttributeError(f'{type(self).__name__} é imutável')
+
+    def __repr__(self) -> str:
+        return f'ModeloPlanoRecorrente(nome={self._main_data["preApproval"].get("name")!r})'
+
+    def payload(self, referencia: str = None, valor_periodico: Decimal = None, dias_trial: int = None) -> Dict:
+        """
+        Gera o payload de uma variante do modelo
+        :param referencia: referência da variante. Se omitida usa a do modelo
+        :param valor_periodico: valor de cada cobrança. Se omitido usa o do modelo
+        :param dias_trial: período de testes em dias. Se omitido usa o do modelo
+        :return: payload pronto para envio
+        """
+        main_data = dict(self._main_data)
+        if referencia is not None:
+            main_data['reference'] = referencia
+        if valor_periodico is not None or dias_trial is not None:
+            pre_approval = main_data['preApproval'] = dict(main_data['preApproval'])
+            if valor_periodico is not None:
+                pre_approval['amountPerPayment'] = _to_decimal_string(valor_periodico)
+            if dias_trial is not None:
+                pre_approval['trialPeriodDuration'] = dias_trial
+        return main_data
+
+    def passo(self, referencia: str = None, valor_periodico: Decimal = None, dias_trial: int = None) -> UltimoPasso:
+        """
+        Gera um passo final de uma variante do modelo, pronto para criar_no_pagseguro
+        :param referencia: referência da variante. Se omitida usa a do modelo
+        :param valor_periodico: valor de cada cobrança. Se omitido usa o do modelo
+        :param dias_trial: período de testes em dias. Se omitido usa o do modelo
+        :return: UltimoPasso
+        """
+        main_data = self.payload(referencia, valor_periodico, dias_trial)
+        passo = UltimoPasso(self._config, main_data, main_data['preApproval'])
+        passo._corpo_invariante = self._obter_corpo_invariante(main_data, valor_periodico, dias_trial)
+        return passo
+
+    def corpo(self, referencia: str = None, valor_periodico: Decimal = None, dias_trial: int = None) -> bytes:
+        """
+        Gera o corpo já serializado de uma variante do modelo. A parte invariante é serializada uma única vez
+        por combinação de valor e trial
+        :param referencia: referência da variante. Se omitida usa a do modelo
+        :param valor_periodico: valor de cada cobrança. Se omitido usa o do modelo
+        :param dias_trial: período de testes em dias. Se omitido usa o do modelo
+        :return: json do payload em bytes
+        """
+        if valor_periodico is None and dias_trial is None:
+            main_data = self._main_data
+        else:
+            main_data = self.payload(referencia, valor_periodico, dias_trial)
+        if referencia is None:
+            referencia = self._main_data.get('reference')
+        return _inserir_referencia(self._obter_corpo_invariante(main_data, valor_periodico, dias_trial), referencia)
+
+    def _obter_corpo_invariante(self, main_data: Dict, valor_periodico: Decimal, dias_trial: int) -> bytes:
+        chave = (valor_periodico, dias_trial)
+        corpo = self._corpos_invariantes.get(chave)
+        if corpo is None:
+            corpo = _serializar_invariante(main_data)
+            if len(self._corpos_invariantes) < self._max_corpos_invariantes:
+                self._corpos_invariantes[chave] = corpo
+        return corpo
+
+
+class ResultadoLote:
+    """
+    Resultado da criação de um item em lote: contém o plano criado ou o erro que impediu sua criação. Qualquer erro
+    do item fica em `erro`, inclusive os que não são PygseguroException, para que uma falha não interrompa o lote
+    """
+    __slots__ = ('item', 'plano', 'erro')
+
+    def __init__(self, item: Union[UltimoPasso, Dict], plano: PlanoAutomaticoRecorrente = None,
+                 erro: Exception = None):
+        self.item = item
+        self.plano = plano
+        self.erro = erro
+
+    def __repr__(self) -> str:
+        return f'ResultadoLote(plano={self.plano!r}, erro={self.erro!r})'
+
+    @property
+    def sucesso(self) -> bool:
+        return self.erro is None
+
+
+def _como_passo(item: Union[UltimoPasso, Dict], config: Config) -> UltimoPasso:
+    if isinstance(item, UltimoPasso):
+        return item
+    return UltimoPasso.de_payload(item, config)
+
+
+def _criar_item(item: Union[UltimoPasso, Dict], config: Config, prazo: float) -> ResultadoLote:
+    try:
+        return ResultadoLote(item, plano=_como_passo(item, config).criar_no_pagseguro(prazo))
+    except Exception as erro:
+        return ResultadoLote(item, erro=erro)
+
+
+async def _criar_item_async(item: Union[UltimoPasso, Dict], config: Config, prazo: float) -> ResultadoLote:
+    try:
+        return ResultadoLote(item, plano=await _como_passo(item, config).criar_no_pagseguro_async(prazo))
+    except Exception as erro:
+        return ResultadoLote(item, erro=erro)
+
+
+def criar_em_lote(itens: Iterable[Union[UltimoPasso, Dict]], concorrencia: int = 10,
+                  config: Config = None, prazo: float = None) -> Iterator[ResultadoLote]:
+    """
+    Cria vários planos no pagseguro usando um pool de threads, com no máximo `concorrencia` chamadas simultâneas.
+    Os itens são consumidos sob demanda, então iteráveis grandes não são carregados inteiros em memória.
+    :param itens: passos finais (UltimoPasso) ou payloads prontos
+    :param concorrencia: quantidade máxima de requisições simultâneas
+    :param config: configuração usada para payloads prontos. Se omitida usa a configuração padrão
+    :param prazo: segundos disponíveis para a criação de cada item, incluindo retentativas
+    :return: gerador de ResultadoLote na ordem em que as criações terminam
+    """
+    itens = iter(itens)
+    # As threads do pool não herdam o contexto, então cada item roda em uma cópia do contexto de quem chamou,
+    # preservando a configuração definida com usar_config
+    contexto = copy_context()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        pendentes = set()
+        for item in itens:
+            pendentes.add(executor.submit(contexto.copy().run, _criar_item, item, config, prazo))
+            if len(pendentes) >= concorrencia:
+                break
+        while pendentes:
+            prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                yield futuro.result()
+                for item in itens:
+                    pendentes.add(executor.submit(contexto.copy().run, _criar_item, item, config, prazo))
+                    break
+
+
+async def criar_em_lote_async(itens: Iterable[Union[UltimoPasso, Dict]], concorrencia: int = 100,
+                              config: Config = None, prazo: float = None) -> AsyncIterator[ResultadoLote]:
+    """
+    Versão assíncrona de criar_em_lote, que executa todas as chamadas no event loop corrente
+    :param itens: passos finais (UltimoPasso) ou payloads prontos
+    :param concorrencia: quantidade máxima de requisições simultâneas
+    :param config: configuração usada para payloads prontos. Se omitida usa a configuração padrão
+    :param prazo: segundos disponíveis para a criação de cada item, incluindo retentativas
+    :return: gerador assíncrono de ResultadoLote na ordem em que as criações terminam
+    """
+    itens = iter(itens)
+    pendentes = set()
+    for item in itens:
+        pendentes.add(asyncio.ensure_future(_criar_item_async(item, config, prazo)))
+        if len(pendentes) >= concorrencia:
+            break
+    try:
+        while pendentes:
+            prontos, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+            for tarefa in prontos:
+                yield tarefa.result()
+                for item in itens:
+                    pendentes.add(asyncio.ensure_future(_criar_item_async(item, config, prazo)))
+                    break
+    finally:
+        for tarefa in pendentes:
+            tarefa.cancel()
@@ -0,0 +1,254 @@
+"""
+Esse módulo contém a projeção vetorizada do calendário de cobranças e da receita dos planos automáticos.
+
+Os planos e as assinaturas são convertidos em arrays colunares do numpy: datas em datetime64[D] e valores em centavos
+inteiros (int64), de forma que os totais são exatos ao centavo. As datas das cobranças seguem as mesmas regras da
+AgendaDeCobrancas (frequência, período de testes e expiração contada a partir da adesão), mas são calculadas para
+todas as assinaturas de uma vez, cobrança a cobrança, em vez de assinatura a assinatura.
+
+Para bases maiores que a memória, projetar_em_blocos recebe as assinaturas em blocos e acumula as projeções.
+
+Requer numpy, instalado com: pip install pygseguro[projecao]
+"""
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError as erro:  # pragma: no cover
+    raise ImportError('A projeção requer numpy. Instale com: pip install pygseguro[projecao]') from erro
+
+from pygseguro.agendamento import INTERVALOS
+
+_UNIDADES_DE_EXPIRACAO = {'DAYS': 0, 'MONTHS': 1, 'YEARS': 12}
+_SEM_EXPIRACAO = np.datetime64('9999-12-31', 'D')
+_UM_DIA = np.timedelta64(1, 'D')
+
+
+def _centavos(valor) -> int:
+    if valor is None:
+        return 0
+    centavos = Decimal(valor).scaleb(2)
+    # Arredondar frações de centavo faria a projeção divergir do valor cobrado
+    if not centavos.is_finite() or centavos != centavos.to_integral_value():
+        raise ValueError(f'Valor não é uma quantia exata em centavos: {valor!r}')
+    return int(centavos)
+
+
+def somar_meses(datas: 'np.ndarray', meses: 'np.ndarray') -> 'np.ndarray':
+    """
+    Versão vetorizada de agendamento.somar_meses: usa o último dia do mês quando o dia não existe no mês de destino
+    :param datas: array datetime64[D]
+    :param meses: array de inteiros com a quantidade de meses somada a cada data
+    :return: array datetime64[D]
+    """
+    mes_inicial = datas.astype('datetime64[M]')
+    dia = datas - mes_inicial.astype('datetime64[D]')
+    mes_final = mes_inicial + meses.astype('timedelta64[M]')
+    ultimo_dia = (mes_final + 1).astype('datetime64[D]') - _UM_DIA
+    return np.minimum(mes_final.astype('datetime64[D]') + dia, ultimo_dia)
+
+
+class TabelaDePlanos:
+    """
+    Planos em formato colunar, uma posição por plano
+    """
+    __slots__ = ('codigos', 'valor_centavos', 'taxa_adesao_centavos', 'meses', 'dias', 'dias_trial',
+                 'expiracao_meses', 'expiracao_dias')
+
+    def __init__(self, codigos: Sequence[str], payloads: Sequence[Dict]):
+        """
+        :param codigos: código de cada plano
+        :param payloads: payload de cada plano, no mesmo formato enviado ao pagseguro
+        :raises ValueError: se algum valor ou taxa de adesão tiver frações de centavo
+        """
+        quantidade = len(payloads)
+        self.codigos = list(codigos)
+        self.valor_centavos = np.zeros(quantidade, np.int64)
+        self.taxa_adesao_centavos = np.zeros(quantidade, np.int64)
+        self.meses = np.zeros(quantidade, np.int64)
+        self.dias = np.zeros(quantidade, np.int64)
+        self.dias_trial = np.zeros(quantidade, np.int64)
+        # Expiração em meses ou em dias a partir da adesão; -1 para planos que não expiram
+        self.expiracao_meses = np.full(quantidade, -1, np.int64)
+        self.expiracao_dias = np.full(quantidade, -1, np.int64)
+        for i, payload in enumerate(payloads):
+            pre_approval = payload['preApproval']
+            self.valor_centavos[i] = _centavos(pre_approval.get('amountPerPayment'))
+            self.taxa_adesao_centavos[i] = _centavos(pre_approval.get('membershipFee'))
+            self.meses[i], self.dias[i] = INTERVALOS[pre_approval['period']]
+            self.dias_trial[i] = pre_approval.get('trialPeriodDuration') or 0
+            expiracao = pre_approval.get('expiration')
+            if expiracao is not None:
+                fator = _UNIDADES_DE_EXPIRACAO[expiracao['unit']]
+                if fator:
+                    self.expiracao_meses[i] = fator * expiracao['value']
+                else:
+                    self.expiracao_dias[i] = expiracao['value']
+
+    def __repr__(self) -> str:
+        return f'TabelaDePlanos(planos={len(self)!r})'
+
+    def __len__(self) -> int:
+        return len(self.codigos)
+
+    def indices(self, codigos: Iterable[str]) -> 'np.ndarray':
+        """
+        Converte códigos de planos nas posições usadas por projetar
+        :param codigos: código do plano de cada assinatura
+        :return: array de posições
+        """
+        posicoes = {codigo: i for i, codigo in enumerate(self.codigos)}
+        return np.fromiter((posicoes[codigo] for codigo in codigos), np.int64)
+
+
+class Projecao:
+    """
+    Projeção mensal: quantidade de cobranças, receita recorrente e taxas de adesão de cada mês, em centavos
+    """
+    __slots__ = ('meses', 'cobrancas', 'receita_centavos', 'taxas_centavos')
+
+    def __init__(self, meses: 'np.ndarray', cobrancas: 'np.ndarray', receita_centavos: 'np.ndarray',
+                 taxas_centavos: 'np.ndarray'):
+        self.meses = meses
+        self.cobrancas = cobrancas
+        self.receita_centavos = receita_centavos
+        self.taxas_centavos = taxas_centavos
+
+    def __repr__(self) -> str:
+        return f'Projecao(de={self.meses[0]!s}, ate={self.meses[-1]!s}, total_centavos={self.total_centavos()!r})'
+
+    def __add__(self, outra: 'Projecao') -> 'Projecao':
+        if not np.array_equal(self.meses, outra.meses):
+            raise ValueError('Projeções de meses diferentes não podem ser somadas')
+        return Projecao(self.meses, self.cobrancas + outra.cobrancas, self.receita_centavos + outra.receita_centavos,
+                        self.taxas_centavos + outra.taxas_centavos)
+
+    def total_centavos(self) -> int:
+        """
+        :return: receita recorrente mais taxas de adesão de todo o período, em centavos
+        """
+        return int(self.receita_centavos.sum() + self.taxas_centavos.sum())
+
+    def por_mes(self) -> Dict[str, Decimal]:
+        """
+        :return: mês no formato AAAA-MM -> total do mês em reais
+        """
+        totais = self.receita_centavos + self.taxas_centavos
+        return {str(mes): Decimal(int(total)).scaleb(-2) for mes, total in zip(self.meses, totais)}
+
+
+def _projecao_vazia(inicio: 'np.datetime64', meses: int) -> Projecao:
+    mes_inicial = inicio.astype('datetime64[M]')
+    zeros = np.zeros(meses, np.int64)
+    return Projecao(mes_inicial + np.arange(meses), zeros, zeros.copy(), zeros.copy())
+
+
+def projetar(planos: TabelaDePlanos, indices_planos: 'np.ndarray', adesoes: 'np.ndarray', inicio: date,
+             meses: int = 24, cancelamentos: Optional['np.ndarray'] = None) -> Projecao:
+    """
+    Projeta as cobranças das assinaturas a partir do início do mês de `inicio`, por `meses` meses
+    :param planos: TabelaDePlanos
+    :param indices_planos: posição do plano de cada assinatura em `planos`
+    :param adesoes: data da adesão de cada assinatura, convertível para datetime64[D]
+    :param inicio: data de referência; a projeção começa no primeiro dia do seu mês
+    :param meses: quantidade de meses projetados
+    :param cancelamentos: data de cancelamento de cada assinatura, NaT para as ativas. Não há cobranças a partir dela
+    :return: Projecao
+    """
+    projecao = _projecao_vazia(np.datetime64(inicio, 'D'), meses)
+    indices_planos = np.asarray(indices_planos, np.int64)
+    adesoes = np.asarray(adesoes, 'datetime64[D]')
+    if not len(adesoes):
+        return projecao
+    janela_inicio = projecao.meses[0].astype('datetime64[D]')
+    janela_fim = (projecao.meses[-1] + 1).astype('datetime64[D]')
+    mes_inicial = projecao.meses[0]
+
+    # Taxa de adesão, cobrada no dia da adesão
+    taxas = planos.taxa_adesao_centavos[indices_planos]
+    na_janela = (adesoes >= janela_inicio) & (adesoes < janela_fim) & (taxas > 0)
+    np.add.at(projecao.taxas_centavos, (adesoes[na_janela].astype('datetime64[M]') - mes_inicial).astype(np.int64),
+              taxas[na_janela])
+
+    # Fim das cobranças: a menor data entre expiração, cancelamento e fim da janela
+    expiracao_meses = planos.expiracao_meses[indices_planos]
+    expiracao_dias = planos.expiracao_dias[indices_planos]
+    fim = np.full(len(adesoes), _SEM_EXPIRACAO)
+    por_meses = expiracao_meses >= 0
+    fim[por_meses] = somar_meses(adesoes[por_meses], expiracao_meses[por_meses])
+    por_dias = expiracao_dias >= 0
+    fim[por_dias] = adesoes[por_dias] + expiracao_dias[por_dias].astype('timedelta64[D]')
+    if cancelamentos is not None:
+        cancelamentos = np.asarray(cancelamentos, 'datetime64[D]')
+        cancelada = ~np.isnat(cancelamentos)
+        fim[cancelada] = np.minimum(fim[cancelada], cancelamentos[cancelada])
+    fim = np.minimum(fim, janela_fim)
+
+    primeiras = adesoes + planos.dias_trial[indices_planos].astype('timedelta64[D]')
+    valores = planos.valor_centavos[indices_planos]
+    intervalo_meses = planos.meses[indices_planos]
+    ativas = primeiras < fim
+    mensais = ativas & (intervalo_meses > 0)
+    semanais = ativas & (intervalo_meses == 0)
+
+    _acumular_mensais(projecao, mes_inicial, janela_inicio, primeiras[mensais], fim[mensais],
+                      intervalo_meses[mensais], valores[mensais])
+    _acumular_por_dias(projecao, mes_inicial, janela_inicio, primeiras[semanais], fim[semanais],
+                       planos.dias[indices_planos][semanais], valores[semanais])
+    return projecao
+
+
+def _acumular(projecao: Projecao, mes_inicial: 'np.datetime64', datas: 'np.ndarray', valores: 'np.ndarray') -> None:
+    posicoes = (datas.astype('datetime64[M]') - mes_inicial).astype(np.int64)
+    projecao.cobrancas += np.bincount(posicoes, minlength=len(projecao.meses))
+    np.add.at(projecao.receita_centavos, posicoes, valores)
+
+
+def _acumular_mensais(projecao: Projecao, mes_inicial: 'np.datetime64', janela_inicio: 'np.datetime64',
+                      primeiras: 'np.ndarray', fim: 'np.ndarray', intervalo: 'np.ndarray',
+                      valores: 'np.ndarray') -> None:
+    # Índice da primeira cobrança dentro da janela; como a janela começa no dia 1, basta contar os meses decorridos
+    decorridos = (janela_inicio.astype('datetime64[M]') - primeiras.astype('datetime64[M]')).astype(np.int64)
+    indices = np.maximum(0, -(-decorridos // intervalo))
+    while len(primeiras):
+        datas = somar_meses(primeiras, indices * intervalo)
+        pendentes = datas < fim
+        if not pendentes.all():
+            primeiras, fim, intervalo, valores, indices, datas = (
+                array[pendentes] for array in (primeiras, fim, intervalo, valores, indices, datas))
+        _acumular(projecao, mes_inicial, datas, valores)
+        indices += 1
+
+
+def _acumular_por_dias(projecao: Projecao, mes_inicial: 'np.datetime64', janela_inicio: 'np.datetime64',
+                       primeiras: 'np.ndarray', fim: 'np.ndarray', intervalo: 'np.ndarray',
+                       valores: 'np.ndarray') -> None:
+    decorridos = (janela_inicio - primeiras).astype(np.int64)
+    indices = np.maximum(0, -(-decorridos // intervalo))
+    datas = primeiras + (indices * intervalo).astype('timedelta64[D]')
+    passo = intervalo.astype('timedelta64[D]')
+    while len(datas):
+        pendentes = datas < fim
+        if not pendentes.all():
+            datas, fim, passo, valores = (array[pendentes] for array in (datas, fim, passo, valores))
+        _acumular(projecao, mes_inicial, datas, valores)
+        datas = datas + passo
+
+
+def projetar_em_blocos(planos: TabelaDePlanos, blocos: Iterable[Tuple['np.ndarray', ...]], inicio: date,
+                       meses: int = 24) -> Projecao:
+    """
+    Projeta assinaturas lidas em blocos, mantendo em memória apenas um bloco por vez
+    :param planos: TabelaDePlanos
+    :param blocos: iterável de tuplas (indices_planos, adesoes) ou (indices_planos, adesoes, cancelamentos)
+    :param inicio: data de referência; a projeção começa no primeiro dia do seu mês
+    :param meses: quantidade de meses projetados
+    :return: soma das projeções de todos os blocos
+    """
+    total = _projecao_vazia(np.datetime64(inicio, 'D'), meses)
+    for bloco in blocos:
+        total = total + projetar(planos, *bloco[:2], inicio=inicio, meses=meses,
+                                 cancelamentos=bloco[2] if len(bloco) > 2 else None)
+    return total
@@ -0,0 +1,117 @@
+"""
+Esse módulo contém o registro de planos endereçado pelo conteúdo.
+
+Planos cujos payloads são iguais a menos da referência são o mesmo plano para o pagseguro. O registro canonicaliza o
+payload montado pela cadeia de passos, sem a referência e com as chaves ordenadas, e guarda o código do plano criado
+sob o hash desse payload. Uma nova criação de um plano idêntico na mesma conta devolve o plano registrado sem chamar
+o pagseguro, e criações simultâneas de planos idênticos fazem uma única chamada, cujo resultado é entregue a todas.
+"""
+import hashlib
+import json
+import threading
+from typing import Awaitable, Callable, Dict, Optional, TYPE_CHECKING
+
+from pygseguro.idempotencia import Armazenamento, ArmazenamentoEmMemoria, Chave, Idempotencia
+
+if TYPE_CHECKING:
+    from pygseguro.plano_recorrente_automatico import PlanoAutomaticoRecorrente, UltimoPasso
+
+
+def hash_do_plano(main_data: Dict) -> str:
+    """
+    Hash do conteúdo do plano, que ignora a referência e a ordem dos campos
+    :param main_data: payload do plano
+    :return: hash sha256 em hexadecimal
+    """
+    canonico = json.dumps({chave: valor for chave, valor in main_data.items() if chave != 'reference'},
+                          ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonico.encode('utf-8')).hexdigest()
+
+
+class RegistroDePlanos:
+    """
+    Registro que associa o hash do conteúdo de cada plano criado ao seu código, por conta
+    """
+
+    def __init__(self, armazenamento: Armazenamento = None):
+        """
+        :param armazenamento: onde os planos são registrados. Se omitido usa ArmazenamentoEmMemoria, que descarta
+        os usados há mais tempo. Use ArmazenamentoSqlite com outra tabela para um registro persistente
+        """
+        self.armazenamento = ArmazenamentoEmMemoria() if armazenamento is None else armazenamento
+        # Coalesce as criações simultâneas do mesmo hash, guardando o plano criado no mesmo armazenamento
+        self._coalescencia = Idempotencia(self.armazenamento)
+        self._reaproveitados = 0
+        self._registrados = 0
+        self._trava = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f'RegistroDePlanos(armazenamento={self.armazenamento!r})'
+
+    @staticmethod
+    def chave(passo: 'UltimoPasso') -> Chave:
+        """
+        :param passo: passo final do plano
+        :return: credencial da conta e hash do conteúdo do plano
+        """
+        return passo._config.credencial(), hash_do_plano(passo._main_data)
+
+    def obter(self, passo: 'UltimoPasso') -> Optional['PlanoAutomaticoRecorrente']:
+        """
+        :param passo: passo final do plano
+        :return: plano idêntico já registrado na mesma conta ou None
+        """
+        plano = self.armazenamento.obter(self.chave(passo))
+        if plano is not None:
+            with self._trava:
+                self._reaproveitados += 1
+        return plano
+
+    def registrar(self, passo: 'UltimoPasso', plano: 'PlanoAutomaticoRecorrente') -> None:
+        """
+        :param passo: passo final do plano
+        :param plano: plano criado a partir do passo
+        """
+        self.armazenamento.guardar(self.chave(passo), plano)
+        with self._trava:
+            self._registrados += 1
+
+    def executar(self, passo: 'UltimoPasso', criar: Callable[[], 'PlanoAutomaticoRecorrente'],
+                 prazo: float = None) -> 'PlanoAutomaticoRecorrente':
+        """
+        Executa a criação apenas se nenhum plano idêntico foi registrado ou está sendo criado na mesma conta
+        :param passo: passo final do plano
+        :param criar: função que cria o plano no pagseguro
+        :param prazo: segundos que uma criação coalescida espera pela criação idêntica em andamento
+        :return: plano criado agora, por uma chamada simultânea ou anteriormente
+        """
+        return self._coalescencia.executar(self.chave(passo), criar, prazo)
+
+    async def executar_async(self, passo: 'UltimoPasso', criar: Callable[[], Awaitable['PlanoAutomaticoRecorrente']],
+                             prazo: float = None) -> 'PlanoAutomaticoRecorrente':
+        """
+        Versão assíncrona de executar
+        :param passo: passo final do plano
+        :param criar: função assíncrona que cria o plano no pagseguro
+        :param prazo: segundos que uma criação coalescida espera pela criação idêntica em andamento
+        :return: plano criado agora, por uma chamada simultânea ou anteriormente
+        """
+        return await self._coalescencia.executar_async(self.chave(passo), criar, prazo)
+
+    def invalidar(self, passo: 'UltimoPasso') -> None:
+        """
+        Remove o plano idêntico ao do passo, por exemplo após desativá-lo no pagseguro, para que o próximo seja criado
+        :param passo: passo final do plano
+        """
+        self.armazenamento.remover(self.chave(passo))
+
+    def estatisticas(self) -> Dict:
+        """
+        Contadores de planos registrados, reaproveitados e de criações coalescidas
+        :return: dicionário com as estatísticas
+        """
+        coalescencia = self._coalescencia.estatisticas()
+        with self._trava:
+            return {'registrados': self._registrados + coalescencia['criados'],
+                    'reaproveitados': self._reaproveitados + coalescencia['reaproveitados'],
+                    'coalescidos': coalescencia['coalescidos']}
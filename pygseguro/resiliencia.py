@@ -0,0 +1,167 @@
+"""
+Esse módulo contém as políticas de resiliência aplicadas pelo Cliente nas chamadas ao pagseguro.
+
+PoliticaRetentativa define quando e quanto esperar antes de repetir uma chamada que falhou por erro de rede ou status
+temporário (429/5xx). Disjuntor implementa um circuit breaker: quando a taxa de erros recentes passa do limiar as
+chamadas falham imediatamente, sem acessar a rede, até que um período de espera termine.
+"""
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable
+
+from pygseguro.exceptions import CircuitoAbertoException
+
+STATUS_RETENTAVEIS = frozenset({429, 500, 502, 503, 504})
+
+
+class PoliticaRetentativa:
+    """
+    Classe que representa uma política de retentativas com espera exponencial limitada e jitter
+    """
+
+    def __init__(self, max_tentativas: int = 3, espera_base: float = 0.2, espera_maxima: float = 5.0,
+                 status_retentaveis: Iterable[int] = STATUS_RETENTAVEIS,
+                 aleatorio: Callable[[], float] = random.random):
+        """
+        :param max_tentativas: quantidade máxima de tentativas, incluindo a primeira
+        :param espera_base: espera, em segundos, usada como base do crescimento exponencial
+        :param espera_maxima: teto, em segundos, da espera entre tentativas
+        :param status_retentaveis: status http que indicam erro temporário
+        :param aleatorio: função que retorna um número entre 0 e 1, usada no jitter
+        """
+        self.max_tentativas = max_tentativas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.status_retentaveis = frozenset(status_retentaveis)
+        self._aleatorio = aleatorio
+
+    def __repr__(self) -> str:
+        return (f'PoliticaRetentativa(max_tentativas={self.max_tentativas!r}, espera_base={self.espera_base!r}, '
+                f'espera_maxima={self.espera_maxima!r})')
+
+    def espera(self, tentativa: int) -> float:
+        """
+        Calcula a espera antes da próxima tentativa usando "full jitter": um valor aleatório entre zero e o teto
+        exponencial, o que evita que vários clientes voltem a chamar a API ao mesmo tempo
+        :param tentativa: número da tentativa que acabou de falhar, começando em 0
+        :return: espera em segundos
+        """
+        teto = min(self.espera_maxima, self.espera_base * 2 ** tentativa)
+        return teto * self._aleatorio()
+
+
+class Disjuntor:
+    """
+    Circuit breaker que abre quando a taxa de erros em uma janela de chamadas recentes passa do limiar.
+
+    Estados: FECHADO (chamadas normais), ABERTO (chamadas falham imediatamente) e MEIO_ABERTO (uma chamada de teste
+    é permitida; se tiver sucesso o disjuntor fecha, caso contrário volta a abrir).
+    """
+    FECHADO = 'FECHADO'
+    ABERTO = 'ABERTO'
+    MEIO_ABERTO = 'MEIO_ABERTO'
+
+    def __init__(self, limiar_erros: float = 0.5, janela: int = 20, minimo_chamadas: int = 10,
+                 tempo_aberto: float = 30.0, relogio: Callable[[], float] = time.monotonic):
+        """
+        :param limiar_erros: fração de erros na janela, entre 0 e 1, a partir da qual o disjuntor abre
+        :param janela: quantidade de chamadas recentes consideradas no cálculo da taxa de erros
+        :param minimo_chamadas: quantidade mínima de chamadas na janela antes de o disjuntor poder abrir
+        :param tempo_aberto: segundos que o disjuntor permanece aberto antes de permitir uma chamada de teste
+        :param relogio: função que retorna o tempo atual em segundos
+        """
+        self.limiar_erros = limiar_erros
+        self.minimo_chamadas = minimo_chamadas
+        self.tempo_aberto = tempo_aberto
+        self._relogio = relogio
+        self._resultados = deque(maxlen=janela)
+        self._estado = self.FECHADO
+        self._aberto_em = 0.0
+        self._teste_em_andamento = False
+        self._aberturas = 0
+        self._rejeitadas = 0
+        self._trava = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f'Disjuntor(estado={self.estado!r}, limiar_erros={self.limiar_erros!r})'
+
+    @property
+    def estado(self) -> str:
+        with self._trava:
+            return self._atualizar_estado()
+
+    def _atualizar_estado(self) -> str:
+        if self._estado == self.ABERTO and self._relogio() - self._aberto_em >= self.tempo_aberto:
+            self._estado = self.MEIO_ABERTO
+            self._teste_em_andamento = False
+        return self._estado
+
+    def permitir(self) -> bool:
+        """
+        Verifica se uma chamada pode ser feita. Toda chamada permitida deve terminar em registrar ou abandonar
+        :return: True se a chamada é a chamada de teste do estado MEIO_ABERTO
+        :raises CircuitoAbertoException: se o disjuntor estiver aberto
+        """
+        with self._trava:
+            estado = self._atualizar_estado()
+            if estado == self.FECHADO:
+                return False
+            if estado == self.MEIO_ABERTO and not self._teste_em_andamento:
+                self._teste_em_andamento = True
+                return True
+            self._rejeitadas += 1
+        raise CircuitoAbertoException('Disjuntor aberto: taxa de erros do pagseguro acima do limiar')
+
+    def registrar(self, sucesso: bool) -> None:
+        """
+        Registra o resultado de uma chamada permitida
+        :param sucesso: False se a chamada falhou por erro de rede ou status temporário
+        """
+        with self._trava:
+            if self._estado == self.MEIO_ABERTO:
+                self._teste_em_andamento = False
+                self._resultados.clear()
+                if sucesso:
+                    self._estado = self.FECHADO
+                else:
+                    self._abrir()
+                return
+            self._resultados.append(sucesso)
+            if len(self._resultados) >= self.minimo_chamadas and self._taxa_erros() >= self.limiar_erros:
+                self._abrir()
+
+    def abandonar(self, teste: bool) -> None:
+        """
+        Libera uma chamada permitida que terminou sem resultado, por exemplo por prazo esgotado no limitador ou por
+        cancelamento. A chamada de teste abandonada conta como falha, para que o disjuntor não fique preso em
+        MEIO_ABERTO; as demais não entram na taxa de erros
+        :param teste: valor devolvido por permitir
+        """
+        if teste:
+            self.registrar(False)
+
+    def _abrir(self) -> None:
+        self._estado = self.ABERTO
+        self._aberto_em = self._relogio()
+        self._aberturas += 1
+
+    def _taxa_erros(self) -> float:
+        if not self._resultados:
+            return 0.0
+        return self._resultados.count(False) / len(self._resultados)
+
+    def estatisticas(self) -> Dict:
+        """
+        Estado atual do disjuntor para monitoramento
+        :return: dicionário com estado, taxa de erros, aberturas e chamadas rejeitadas
+        """
+        with self._trava:
+            return {
+                'estado': self._atualizar_estado(),
+                'taxa_erros': self._taxa_erros(),
+                'chamadas_na_janela': len(self._resultados),
+                'aberturas': self._aberturas,
+                'rejeitadas': self._rejeitadas,
+            }
@@ -0,0 +1,233 @@
+"""
+Esse módulo contém um simulador local da API de pagamento recorrente do pagseguro, para testes de carga sem acessar
+o sandbox.
+
+O simulador responde em /pre-approvals/request como criar_no_pagseguro espera: `code` e `date` em caso de sucesso e
+`error`/`errors` em caso de falha. Latência, taxa de erros de dados, taxa de falhas do servidor e limite de requisições
+por segundo são configuráveis. Ele é implementado sobre asyncio com conexões keep-alive, suportando milhares de
+requisições por segundo em um único processo.
+
+Uso pela linha de comando:
+    python -m pygseguro.simulador --porta 8080 --latencia 0.05 --taxa-erro 0.01 --limite-rps 100
+
+Depois aponte uma configuração para ele:
+    ConfigConta('foo@bar.com', 'token', ambiente='http://127.0.0.1:8080')
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+ENDPOINT_CRIACAO = '/pre-approvals/request'
+_FUSO_BRASILIA = timezone(timedelta(hours=-3))
+_RAZOES = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found', 429: 'Too Many Requests',
+           503: 'Service Unavailable'}
+
+
+class SimuladorPagseguro:
+    """
+    Servidor que simula a API do pagseguro.
+
+    Pode ser usado dentro de um event loop com `await iniciar_async()` ou em uma thread própria com `iniciar()`, ou
+    ainda como context manager, que sobe o servidor em uma thread e expõe sua url base em `url`.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', porta: int = 0, latencia: float = 0.0, variacao_latencia: float = 0.0,
+                 taxa_erro: float = 0.0, taxa_falha: float = 0.0, limite_rps: float = None, semente: int = None):
+        """
+        :param host: endereço onde o servidor escuta
+        :param porta: porta onde o servidor escuta. 0 escolhe uma porta livre
+        :param latencia: segundos de espera antes de cada resposta
+        :param variacao_latencia: variação aleatória, em segundos, somada à latência
+        :param taxa_erro: fração das requisições respondidas com erro de dado (400, no formato do pagseguro)
+        :param taxa_falha: fração das requisições respondidas com falha do servidor (503, página html)
+        :param limite_rps: requisições por segundo aceitas antes de responder 429. None para não limitar
+        :param semente: semente do gerador aleatório, para testes reproduzíveis
+        """
+        self.host = host
+        self.porta = porta
+        self.latencia = latencia
+        self.variacao_latencia = variacao_latencia
+        self.taxa_erro = taxa_erro
+        self.taxa_falha = taxa_falha
+        self.limite_rps = limite_rps
+        self.estatisticas = {'requisicoes': 0, 'status': {}}
+        self._aleatorio = random.Random(semente)
+        self._tokens = limite_rps
+        self._atualizado_em = time.monotonic()
+        self._servidor = None
+        self._loop = None
+        self._thread = None
+        self._conexoes = set()
+
+    @property
+    def url(self) -> str:
+        """
+        Url base do simulador, para ser usada como ambiente de uma Config
+        """
+        return f'http://{self.host}:{self.porta}'
+
+    async def iniciar_async(self) -> None:
+        """
+        Começa a aceitar conexões no event loop corrente
+        """
+        self._servidor = await asyncio.start_server(self._atender_conexao, self.host, self.porta)
+        self.porta = self._servidor.sockets[0].getsockname()[1]
+
+    async def servir_para_sempre(self) -> None:
+        """
+        Inicia o servidor no event loop corrente e atende conexões até ser cancelado
+        """
+        await self.iniciar_async()
+        async with self._servidor:
+            await self._servidor.serve_forever()
+
+    def iniciar(self) -> None:
+        """
+        Sobe o servidor em uma thread própria e retorna quando ele estiver pronto para receber conexões
+        """
+        pronto = threading.Event()
+
+        def executar():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.iniciar_async())
+            pronto.set()
+            self._loop.run_forever()
+            self._servidor.close()
+            for escritor in list(self._conexoes):
+                escritor.close()
+            self._loop.run_until_complete(asyncio.gather(*asyncio.all_tasks(self._loop), return_exceptions=True))
+            self._loop.run_until_complete(self._servidor.wait_closed())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=executar, name='simulador-pagseguro', daemon=True)
+        self._thread.start()
+        pronto.wait()
+
+    def parar(self) -> None:
+        """
+        Para o servidor iniciado com iniciar
+        """
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+    def __enter__(self) -> 'SimuladorPagseguro':
+        self.iniciar()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.parar()
+
+    async def _atender_conexao(self, leitor: asyncio.StreamReader, escritor: asyncio.StreamWriter) -> None:
+        self._conexoes.add(escritor)
+        try:
+            while True:
+                cabecalho = await leitor.readuntil(b'\r\n\r\n')
+                linha, *linhas_header = cabecalho.decode('latin-1').split('\r\n')[:-2]
+                metodo, alvo, _ = linha.split(' ', 2)
+                headers = {}
+                for linha_header in linhas_header:
+                    nome, _, valor = linha_header.partition(':')
+                    headers[nome.strip().lower()] = valor.strip()
+                corpo = await leitor.readexactly(int(headers.get('content-length', 0)))
+                status, tipo, conteudo = await self._responder(metodo, alvo, corpo)
+                fechar = headers.get('connection', '').lower() == 'close'
+                escritor.write(self._montar_resposta(status, tipo, conteudo, fechar))
+                await escritor.drain()
+                if fechar:
+                    break
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._conexoes.discard(escritor)
+            escritor.close()
+
+    @staticmethod
+    def _montar_resposta(status: int, tipo: str, conteudo: bytes, fechar: bool) -> bytes:
+        cabecalho = (f'HTTP/1.1 {status} {_RAZOES.get(status, "")}\r\nContent-Type: {tipo}\r\n'
+                     f'Content-Length: {len(conteudo)}\r\nConnection: {"close" if fechar else "keep-alive"}\r\n\r\n')
+        return cabecalho.encode('latin-1') + conteudo
+
+    def _permitir_pelo_limite(self) -> bool:
+        if self.limite_rps is None:
+            return True
+        agora = time.monotonic()
+        self._tokens = min(self.limite_rps, self._tokens + (agora - self._atualizado_em) * self.limite_rps)
+        self._atualizado_em = agora
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    async def _responder(self, metodo: str, alvo: str, corpo: bytes) -> Tuple[int, str, bytes]:
+        status, tipo, conteudo = self._processar(metodo, alvo, corpo)
+        self.estatisticas['requisicoes'] += 1
+        self.estatisticas['status'][status] = self.estatisticas['status'].get(status, 0) + 1
+        espera = self.latencia + self.variacao_latencia * self._aleatorio.random()
+        if espera > 0:
+            await asyncio.sleep(espera)
+        return status, tipo, conteudo
+
+    def _processar(self, metodo: str, alvo: str, corpo: bytes) -> Tuple[int, str, bytes]:
+        partes = urlsplit(alvo)
+        if metodo != 'POST' or partes.path.rstrip('/') != ENDPOINT_CRIACAO:
+            return self._erro(404, {'404': 'resource not found.'})
+        query = parse_qs(partes.query)
+        if not (('email' in query and 'token' in query) or ('appID' in query and 'appKey' in query)):
+            return self._erro(401, {'401': 'Unauthorized'})
+        if not self._permitir_pelo_limite():
+            return self._erro(429, {'429': 'Too many requests.'})
+        sorteio = self._aleatorio.random()
+        if sorteio < self.taxa_falha:
+            return 503, 'text/html', b'<html><body><h1>503 Service Unavailable</h1></body></html>'
+        if sorteio < self.taxa_falha + self.taxa_erro:
+            return self._erro(400, {'11003': 'receiverEmail invalid value.'})
+        try:
+            json.loads(corpo)
+        except ValueError:
+            return self._erro(400, {'11001': 'invalid json.'})
+        data = datetime.now(_FUSO_BRASILIA).replace(microsecond=0).isoformat()
+        return self._json(200, {'code': uuid.uuid4().hex.upper(), 'date': data})
+
+    def _erro(self, status: int, erros: Dict) -> Tuple[int, str, bytes]:
+        return self._json(status, {'error': True, 'errors': erros})
+
+    @staticmethod
+    def _json(status: int, dados: Dict) -> Tuple[int, str, bytes]:
+        return status, 'application/json;charset=ISO-8859-1', json.dumps(dados).encode('latin-1')
+
+
+def main(argv=None) -> None:
+    """
+    Ponto de entrada de `python -m pygseguro.simulador`
+    """
+    parser = argparse.ArgumentParser(description='Simulador local da API de pagamento recorrente do pagseguro')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8080)
+    parser.add_argument('--latencia', type=float, default=0.0, help='segundos de espera por resposta')
+    parser.add_argument('--variacao-latencia', type=float, default=0.0, help='variação aleatória da latência')
+    parser.add_argument('--taxa-erro', type=float, default=0.0, help='fração de respostas 400 com errors')
+    parser.add_argument('--taxa-falha', type=float, default=0.0, help='fração de respostas 503 em html')
+    parser.add_argument('--limite-rps', type=float, default=None, help='requisições por segundo antes de 429')
+    argumentos = parser.parse_args(argv)
+    simulador = SimuladorPagseguro(argumentos.host, argumentos.porta, argumentos.latencia,
+                                   argumentos.variacao_latencia, argumentos.taxa_erro, argumentos.taxa_falha,
+                                   argumentos.limite_rps)
+    print(f'Simulador do pagseguro escutando em {simulador.url}')
+    try:
+        asyncio.run(simulador.servir_para_sempre())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
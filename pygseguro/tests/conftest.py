@@ -0,0 +1,118 @@
+"""
+Fixtures compartilhadas pelos módulos de teste: configurações, passos finais de planos, transporte assíncrono falso,
+relógio controlado e coletor de eventos de instrumentação
+"""
+import asyncio
+import json
+from decimal import Decimal
+from typing import Callable, Dict, Tuple
+
+import pytest
+
+from pygseguro import Cliente, ConfigConta, CriadorPlanoRecorrente, SANDBOX, registrar_coletor, remover_coletor
+from pygseguro.instrumentacao import ColetorMetricas, EventoChamada
+from pygseguro.transporte_async import Resposta, TransporteAsync
+
+EMAIL = 'renzo@python.pro.br'
+TOKEN = '396FC29DE4A54967BF6DCADE65100E88'
+SUCESSO = {'code': 'ABC', 'date': '2019-04-29T21:38:04-03:00'}
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self) -> float:
+        return self.agora
+
+
+class ColetorLista(ColetorMetricas):
+    def __init__(self):
+        self.eventos = []
+
+    def registrar(self, evento: EventoChamada) -> None:
+        self.eventos.append(evento)
+
+
+class TransporteFalso(TransporteAsync):
+    """
+    Transporte que responde sem acessar a rede, guardando as chamadas e o máximo de chamadas simultâneas
+    """
+
+    def __init__(self, status_code: int = 200, dados: Dict = None, espera: float = 0.0,
+                 responder: Callable[[Dict], Tuple[int, Dict]] = None):
+        """
+        :param status_code: status das respostas
+        :param dados: corpo das respostas. Se omitido responde com SUCESSO
+        :param espera: segundos de espera antes de responder
+        :param responder: função que recebe o payload e devolve status e corpo, usada no lugar dos anteriores
+        """
+        self.status_code = status_code
+        self.dados = SUCESSO if dados is None else dados
+        self.espera = espera
+        self.responder = responder
+        self.chamadas = []
+        self.simultaneas = 0
+        self.max_simultaneas = 0
+
+    async def post(self, url: str, corpo: bytes, headers: Dict) -> Resposta:
+        payload = json.loads(corpo)
+        self.chamadas.append((url, payload, headers))
+        # A resposta é definida antes da espera, na ordem de chegada das chamadas
+        status, dados = (self.status_code, self.dados) if self.responder is None else self.responder(payload)
+        self.simultaneas += 1
+        self.max_simultaneas = max(self.max_simultaneas, self.simultaneas)
+        try:
+            await asyncio.sleep(self.espera)
+        finally:
+            self.simultaneas -= 1
+        return Resposta(status, json.dumps(dados).encode())
+
+
+@pytest.fixture
+def config() -> ConfigConta:
+    return ConfigConta(EMAIL, TOKEN, SANDBOX)
+
+
+@pytest.fixture
+def nova_config() -> Callable[..., ConfigConta]:
+    def fabricar(cliente: Cliente = None, email: str = EMAIL, ambiente: str = SANDBOX) -> ConfigConta:
+        return ConfigConta(email, TOKEN, ambiente, cliente=cliente)
+
+    return fabricar
+
+
+@pytest.fixture
+def novo_passo():
+    """
+    Fábrica do passo final de um plano mensal de R$ 180,00 que expira em 10 meses. Sem config, usa uma conta do
+    sandbox com o cliente informado
+    """
+
+    def fabricar(config: ConfigConta = None, referencia: str = 'REF', nome: str = 'Plano',
+                 valor: Decimal = Decimal('180.00'), email: str = None, cliente: Cliente = None):
+        if config is None:
+            config = ConfigConta(EMAIL, TOKEN, SANDBOX, cliente=cliente)
+        criador = CriadorPlanoRecorrente(config)
+        identificacao = criador.plano_automatico_idenficacao(referencia, nome, receiver_email=email)
+        return identificacao.expiracao_em_meses(10).valores_automaticos(valor).frequencia_mensal()
+
+    return fabricar
+
+
+@pytest.fixture
+def novo_transporte() -> Callable[..., TransporteFalso]:
+    return TransporteFalso
+
+
+@pytest.fixture
+def relogio() -> Relogio:
+    return Relogio()
+
+
+@pytest.fixture
+def coletor():
+    coletor = ColetorLista()
+    registrar_coletor(coletor)
+    yield coletor
+    remover_coletor(coletor)
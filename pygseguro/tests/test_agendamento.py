@@ -0,0 +1,113 @@
+"""
+Módulo destinado a testar a agenda de cobranças das assinaturas
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+from pygseguro import AgendaDeCobrancas, Assinatura
+from pygseguro.agendamento import somar_meses
+
+
+def _datas(assinatura: Assinatura, quantidade: int):
+    return [assinatura.data_da_cobranca(i) for i in range(quantidade)]
+
+
+def test_somar_meses_no_fim_do_mes():
+    assert somar_meses(date(2019, 1, 31), 1) == date(2019, 2, 28)
+    assert somar_meses(date(2020, 1, 31), 1) == date(2020, 2, 29)
+    assert somar_meses(date(2019, 11, 30), 3) == date(2020, 2, 29)
+
+
+def test_mensal_ancorado_no_dia_da_adesao():
+    assinatura = Assinatura('A', 'MONTHLY', date(2019, 1, 31))
+    assert _datas(assinatura, 4) == [date(2019, 1, 31), date(2019, 2, 28), date(2019, 3, 31), date(2019, 4, 30)]
+
+
+@pytest.mark.parametrize(
+    'periodo,segunda',
+    [
+        ('WEEKLY', date(2019, 4, 8)),
+        ('BIMONTHLY', date(2019, 6, 1)),
+        ('TRIMONTHLY', date(2019, 7, 1)),
+        ('SEMIANNUALLY', date(2019, 10, 1)),
+        ('YEARLY', date(2020, 4, 1)),
+    ]
+)
+def test_frequencias(periodo, segunda):
+    assert _datas(Assinatura('A', periodo, date(2019, 4, 1)), 2) == [date(2019, 4, 1), segunda]
+
+
+def test_trial_e_expiracao():
+    assinatura = Assinatura('A', 'MONTHLY', date(2019, 4, 1), dias_trial=10, expiracao=('MONTHS', 3))
+    assert _datas(assinatura, 4) == [date(2019, 4, 11), date(2019, 5, 11), date(2019, 6, 11), None]
+
+
+def test_do_payload():
+    payload = {'reference': 'R', 'preApproval': {'charge': 'AUTO', 'name': 'Plano', 'period': 'WEEKLY',
+                                                 'amountPerPayment': '180.00', 'trialPeriodDuration': 7,
+                                                 'expiration': {'unit': 'DAYS', 'value': 30}}}
+    assinatura = Assinatura.do_payload('A', payload, date(2019, 4, 1))
+    assert assinatura.valor == Decimal('180.00')
+    assert [d for d in _datas(assinatura, 5) if d] == [date(2019, 4, 8), date(2019, 4, 15), date(2019, 4, 22),
+                                                       date(2019, 4, 29)]
+
+
+def test_vencidas_por_dia():
+    agenda = AgendaDeCobrancas()
+    agenda.adicionar(Assinatura('mensal', 'MONTHLY', date(2019, 4, 1)))
+    agenda.adicionar(Assinatura('semanal', 'WEEKLY', date(2019, 4, 3), expiracao=('DAYS', 8)))
+    agenda.adicionar(Assinatura('cancelada', 'MONTHLY', date(2019, 4, 2)))
+    agenda.remover('cancelada')
+    dia = date(2019, 4, 1)
+    cobrancas = []
+    while dia < date(2019, 5, 5):
+        cobrancas.extend((a.codigo, data) for a, data in agenda.vencidas(dia))
+        dia += timedelta(days=1)
+    assert cobrancas == [('mensal', date(2019, 4, 1)), ('semanal', date(2019, 4, 3)), ('semanal', date(2019, 4, 10)),
+                         ('mensal', date(2019, 5, 1))]
+    assert 'semanal' not in agenda
+    assert agenda.proxima_cobranca('mensal') == date(2019, 6, 1)
+
+
+def test_cobrancas_atrasadas():
+    agenda = AgendaDeCobrancas()
+    agenda.adicionar(Assinatura('A', 'WEEKLY', date(2019, 4, 1)))
+    datas = [data for _, data in agenda.vencidas(date(2019, 4, 20))]
+    assert datas == [date(2019, 4, 1), date(2019, 4, 8), date(2019, 4, 15)]
+    assert list(agenda.vencidas(date(2019, 4, 20))) == []
+
+
+def test_dia_processa_apenas_vencidas():
+    agenda = AgendaDeCobrancas()
+    inicio = date(2019, 1, 1)
+    for i in range(50_000):
+        agenda.adicionar(Assinatura(f'S{i}', 'MONTHLY', inicio + timedelta(days=i % 28)))
+    vencidas = list(agenda.vencidas(inicio))
+    assert len(vencidas) == len(range(0, 50_000, 28))
+    assert len(agenda._heap) == 50_000
+
+
+def test_carregar_assinaturas_existentes_sem_cobrancas_retroativas():
+    agenda = AgendaDeCobrancas()
+    hoje = date(2019, 4, 15)
+    agenda.adicionar(Assinatura('mensal', 'MONTHLY', date(2010, 1, 31)), a_partir_de=hoje)
+    agenda.adicionar(Assinatura('semanal', 'WEEKLY', date(2015, 6, 2)), a_partir_de=hoje)
+    agenda.adicionar(Assinatura('expirada', 'MONTHLY', date(2015, 1, 1), expiracao=('YEARS', 1)), a_partir_de=hoje)
+    agenda.adicionar(Assinatura('anual', 'YEARLY', date(2018, 4, 15)), a_partir_de=hoje)
+    assert 'expirada' not in agenda
+    assert [(a.codigo, data) for a, data in agenda.vencidas(hoje)] == [('anual', date(2019, 4, 15))]
+    assert agenda.proxima_cobranca('mensal') == date(2019, 4, 30)
+    assert agenda.proxima_cobranca('semanal') == date(2019, 4, 16)
+
+
+@pytest.mark.parametrize('periodo', ['WEEKLY', 'MONTHLY', 'BIMONTHLY', 'SEMIANNUALLY'])
+def test_avancar_ate_confere_com_as_datas(periodo):
+    for deslocamento in range(0, 400, 13):
+        assinatura = Assinatura('A', periodo, date(2019, 1, 31), dias_trial=3)
+        dia = date(2019, 2, 1) + timedelta(days=deslocamento)
+        assinatura.avancar_ate(dia)
+        anterior = assinatura.data_da_cobranca(assinatura.cobrancas - 1) if assinatura.cobrancas else None
+        assert assinatura.proxima_cobranca() >= dia
+        assert anterior is None or anterior < dia
@@ -0,0 +1,155 @@
+"""
+Módulo destinado a testar o cache de leitura das consultas por código
+"""
+import threading
+import time
+import traceback
+
+import pytest
+import responses
+
+from pygseguro import BuscaRecorrente, CacheDeConsultas, Cliente, ConfigConta, SANDBOX
+from pygseguro.exceptions import PagseguroException
+
+URL_PLANO = 'https://ws.sandbox.pagseguro.uol.com.br/pre-approvals/request/ABC'
+
+
+def _nao_encontrado():
+    raise PagseguroException({'error': True, 'errors': {'404': 'not found.'}}, 404)
+
+
+def test_ttl_e_acertos(relogio):
+    cache = CacheDeConsultas(ttl=10, relogio=relogio)
+    cargas = []
+    carregar = lambda: cargas.append(1) or len(cargas)  # noqa: E731
+    assert cache.obter('a', carregar) == 1
+    relogio.agora = 9.9
+    assert cache.obter('a', carregar) == 1
+    relogio.agora = 10
+    assert cache.obter('a', carregar) == 2
+    assert cache.estatisticas() == {'acertos': 1, 'acertos_negativos': 0, 'falhas': 2, 'coalescidas': 0,
+                                    'descartes': 0, 'itens': 1}
+
+
+def test_lru(relogio):
+    cache = CacheDeConsultas(max_itens=2, relogio=relogio)
+    cache.obter('a', lambda: 'A')
+    cache.obter('b', lambda: 'B')
+    cache.obter('a', lambda: 'X')
+    cache.obter('c', lambda: 'C')
+    assert cache.obter('a', lambda: 'X') == 'A'
+    assert cache.obter('b', lambda: 'novo') == 'novo'
+    assert cache.estatisticas()['descartes'] == 2
+    assert len(cache) == 2
+
+
+def test_cache_negativo(relogio):
+    cache = CacheDeConsultas(ttl_negativo=5, relogio=relogio)
+    for _ in range(3):
+        with pytest.raises(PagseguroException):
+            cache.obter('a', _nao_encontrado)
+    assert cache.estatisticas()['falhas'] == 1
+    assert cache.estatisticas()['acertos_negativos'] == 2
+    relogio.agora = 5
+    assert cache.obter('a', lambda: 'criado') == 'criado'
+
+
+def _profundidade(erro: BaseException) -> int:
+    return len(traceback.extract_tb(erro.__traceback__))
+
+
+def test_acertos_negativos_nao_acumulam_traceback(relogio):
+    cache = CacheDeConsultas(ttl_negativo=5, relogio=relogio)
+    erros = []
+    for _ in range(200):
+        with pytest.raises(PagseguroException) as excinfo:
+            cache.obter('a', _nao_encontrado)
+        erros.append(excinfo.value)
+    assert len({id(erro) for erro in erros}) == 200
+    assert _profundidade(erros[-1]) == _profundidade(erros[1])
+    assert erros[-1].status_code == 404
+    assert erros[-1].erros == {'404': 'not found.'}
+
+
+def test_erros_que_nao_sao_de_codigo_inexistente_nao_ficam_em_cache(relogio):
+    cache = CacheDeConsultas(relogio=relogio)
+
+    def indisponivel():
+        raise PagseguroException({'error': True, 'errors': {'503': 'invalid response from pagseguro.'}}, 503)
+
+    with pytest.raises(PagseguroException):
+        cache.obter('a', indisponivel)
+    assert cache.obter('a', lambda: 'A') == 'A'
+
+
+def test_consultas_simultaneas_coalescidas():
+    cache = CacheDeConsultas()
+    liberar = threading.Event()
+    cargas = []
+
+    def carregar():
+        cargas.append(1)
+        liberar.wait()
+        return 'A'
+
+    resultados = []
+    threads = [threading.Thread(target=lambda: resultados.append(cache.obter('a', carregar))) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    while cache.estatisticas()['coalescidas'] < 9:
+        time.sleep(0.001)
+    liberar.set()
+    for thread in threads:
+        thread.join()
+    assert resultados == ['A'] * 10
+    assert len(cargas) == 1
+
+
+def test_consultas_coalescidas_recebem_copias_do_erro():
+    cache = CacheDeConsultas()
+    liberar = threading.Event()
+
+    def carregar():
+        liberar.wait()
+        _nao_encontrado()
+
+    erros = []
+
+    def consultar():
+        try:
+            cache.obter('a', carregar)
+        except PagseguroException as erro:
+            erros.append(erro)
+
+    threads = [threading.Thread(target=consultar) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while cache.estatisticas()['coalescidas'] < 4:
+        time.sleep(0.001)
+    liberar.set()
+    for thread in threads:
+        thread.join()
+    assert len({id(erro) for erro in erros}) == 5
+    assert {erro.status_code for erro in erros} == {404}
+
+
+def test_invalidar(relogio):
+    cache = CacheDeConsultas(relogio=relogio)
+    cache.obter('a', lambda: 'antigo')
+    cache.invalidar('a')
+    assert cache.obter('a', lambda: 'novo') == 'novo'
+    cache.limpar()
+    assert len(cache) == 0
+
+
+@responses.activate
+def test_busca_por_codigo_usa_cache_do_cliente():
+    responses.add(responses.GET, URL_PLANO, json={'code': 'ABC', 'name': 'Plano'})
+    config = ConfigConta('foo@bar.com', 'token', SANDBOX, cliente=Cliente(cache_consultas=CacheDeConsultas()))
+    busca = BuscaRecorrente(config)
+    assert busca.plano('ABC') == {'code': 'ABC', 'name': 'Plano'}
+    assert busca.plano('ABC') is busca.plano('ABC')
+    assert len(responses.calls) == 1
+    busca.invalidar('ABC')
+    busca.plano('ABC')
+    assert len(responses.calls) == 2
@@ -0,0 +1,176 @@
+"""
+Módulo destinado a testar a caixa de saída de criação de planos
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import pytest
+import responses
+
+from pygseguro import CaixaDeSaida, ConfigConta
+from pygseguro.exceptions import PagseguroException, TempoEsgotadoException
+from pygseguro.simulador import SimuladorPagseguro
+
+URL = 'https://ws.sandbox.pagseguro.uol.com.br/pre-approvals/request'
+SUCESSO = json.dumps({'code': 'ABC', 'date': '2019-04-29T21:38:04-03:00'})
+
+
+@pytest.fixture
+def caminho(tmp_path: Path) -> str:
+    return str(tmp_path / 'saida.db')
+
+
+def test_despacho_em_segundo_plano(caminho: str, novo_passo, nova_config):
+    with SimuladorPagseguro(latencia=0.005) as simulador:
+        config = nova_config(ambiente=simulador.url)
+        with CaixaDeSaida(caminho, concorrencia=8) as caixa:
+            envios = [caixa.enfileirar(novo_passo(config, f'REF{i}')) for i in range(40)]
+            planos = [envio.resultado(timeout=10) for envio in envios]
+    assert len({plano.codigo for plano in planos}) == 40
+    assert all(envio.pronto() for envio in envios)
+    assert caixa.estatisticas() == {'pendente': 0, 'enviando': 0, 'criado': 40, 'erro': 0}
+    caixa.fechar()
+
+
+@responses.activate
+def test_envios_sobrevivem_a_queda(caminho: str, config: ConfigConta, novo_passo):
+    responses.add(responses.POST, URL, body=SUCESSO, content_type='application/json')
+    caixa = CaixaDeSaida(caminho)
+    ids = [caixa.enfileirar(novo_passo(config, f'REF{i}')).id for i in range(3)]
+    with pytest.raises(TempoEsgotadoException):
+        caixa.envio(ids[0]).resultado(timeout=0.05)
+    caixa.fechar()
+    # Simula uma queda no meio de um envio
+    with sqlite3.connect(caminho) as conexao:
+        conexao.execute("UPDATE envios SET estado = 'enviando' WHERE id = ?", (ids[1],))
+
+    with CaixaDeSaida(caminho, configs=[config]) as reaberta:
+        assert [reaberta.envio(id).resultado(timeout=5).codigo for id in ids] == ['ABC'] * 3
+    assert len(responses.calls) == 3
+    reaberta.fechar()
+
+
+@responses.activate
+def test_concessao_de_outro_despachante_respeitada(caminho: str, config: ConfigConta, novo_passo):
+    responses.add(responses.POST, URL, body=SUCESSO, content_type='application/json')
+    caixa = CaixaDeSaida(caminho)
+    id = caixa.enfileirar(novo_passo(config, 'REF1')).id
+    caixa.fechar()
+    # Outro processo, ainda vivo, está enviando o plano
+    with sqlite3.connect(caminho) as conexao:
+        conexao.execute("UPDATE envios SET estado = 'enviando', dono = 'outro', concessao = ? WHERE id = ?",
+                        (time.time() + 0.3, id))
+
+    with CaixaDeSaida(caminho, configs=[config], duracao_concessao=0.3, intervalo_consulta=0.01) as reaberta:
+        time.sleep(0.1)
+        assert reaberta.envio(id).estado() == 'enviando'
+        assert len(responses.calls) == 0
+        # A concessão vence sem ser renovada, como se o outro processo tivesse caído
+        assert reaberta.envio(id).resultado(timeout=5).codigo == 'ABC'
+    assert len(responses.calls) == 1
+    reaberta.fechar()
+
+
+@responses.activate
+def test_tentativas_limitadas(caminho: str, config: ConfigConta, novo_passo):
+    responses.add(responses.POST, URL, status=503, body='<html>503</html>', content_type='text/html')
+    with CaixaDeSaida(caminho, espera_inicial=0.01, max_tentativas=3) as caixa:
+        envio = caixa.enfileirar(novo_passo(config, 'REF1'))
+        with pytest.raises(PagseguroException) as excinfo:
+            envio.resultado(timeout=5)
+    assert excinfo.value.status_code == 503
+    assert len(responses.calls) == 3
+    assert caixa.estatisticas()['erro'] == 1
+    caixa.fechar()
+
+
+@responses.activate
+def test_despachante_sobrevive_a_falha_inesperada(caminho: str, config: ConfigConta, novo_passo, caplog):
+    responses.add(responses.POST, URL, body=SUCESSO, content_type='application/json')
+    caixa = CaixaDeSaida(caminho, intervalo_consulta=0.01)
+    reservar = caixa._reservar
+    falhas = []
+
+    def reservar_com_falha(quantidade):
+        if not falhas:
+            falhas.append(1)
+            raise RuntimeError('falha inesperada')
+        return reservar(quantidade)
+
+    caixa._reservar = reservar_com_falha
+    with caplog.at_level(logging.ERROR, logger='pygseguro.caixa_de_saida'), caixa:
+        assert caixa.enfileirar(novo_passo(config, 'REF1')).resultado(timeout=5).codigo == 'ABC'
+    assert falhas == [1]
+    assert 'falha inesperada' in caplog.text
+    caixa.fechar()
+
+
+@responses.activate
+def test_reenvio_apos_indisponibilidade(caminho: str, config: ConfigConta, novo_passo):
+    responses.add(responses.POST, URL, status=503, body='<html>503</html>', content_type='text/html')
+    responses.add(responses.POST, URL, body=SUCESSO, content_type='application/json')
+    with CaixaDeSaida(caminho, espera_inicial=0.01) as caixa:
+        assert caixa.enfileirar(novo_passo(config, 'REF1')).resultado(timeout=5).codigo == 'ABC'
+    assert len(responses.calls) == 2
+    caixa.fechar()
+
+
+@responses.activate
+def test_erro_do_pagseguro(caminho: str, config: ConfigConta, novo_passo):
+    responses.add(responses.POST, URL, status=400, json={'error': True, 'errors': {'11003': 'invalid.'}})
+    with CaixaDeSaida(caminho) as caixa:
+        envio = caixa.enfileirar(novo_passo(config, 'REF1'))
+        with pytest.raises(PagseguroException) as excinfo:
+            envio.resultado(timeout=5)
+    assert excinfo.value.erros == {'11003': 'invalid.'}
+    assert excinfo.value.status_code == 400
+    assert envio.estado() == 'erro'
+    caixa.fechar()
+
+
+@responses.activate
+def test_ordem_por_referencia(caminho: str, config: ConfigConta, novo_passo):
+    ordem = []
+    simultaneos = {'atual': 0, 'maximo': 0}
+    trava = threading.Lock()
+
+    def callback(request):
+        nome = json.loads(request.body)['preApproval']['name']
+        if nome.startswith('Mesma'):
+            with trava:
+                simultaneos['atual'] += 1
+                simultaneos['maximo'] = max(simultaneos['maximo'], simultaneos['atual'])
+                ordem.append(nome)
+            time.sleep(0.01)
+            with trava:
+                simultaneos['atual'] -= 1
+        return 200, {}, SUCESSO
+
+    responses.add_callback(responses.POST, URL, callback=callback, content_type='application/json')
+    caixa = CaixaDeSaida(caminho, concorrencia=8)
+    envios = []
+    for i in range(5):
+        envios.append(caixa.enfileirar(novo_passo(config, 'MESMA', f'Mesma {i}')))
+        envios.append(caixa.enfileirar(novo_passo(config, f'OUTRA{i}')))
+    with caixa:
+        for envio in envios:
+            envio.resultado(timeout=5)
+    assert ordem == [f'Mesma {i}' for i in range(5)]
+    assert simultaneos['maximo'] == 1
+    caixa.fechar()
+
+
+@responses.activate
+def test_arquivo_de_versao_anterior(caminho: str, config: ConfigConta, novo_passo):
+    responses.add(responses.POST, URL, body=SUCESSO, content_type='application/json')
+    with sqlite3.connect(caminho) as conexao:
+        conexao.execute('CREATE TABLE envios (id INTEGER PRIMARY KEY AUTOINCREMENT, credencial TEXT NOT NULL, '
+                        'referencia TEXT, corpo BLOB NOT NULL, estado TEXT NOT NULL, tentativas INTEGER NOT NULL '
+                        'DEFAULT 0, proxima_tentativa REAL NOT NULL DEFAULT 0, codigo TEXT, criacao TEXT, erro TEXT)')
+    with CaixaDeSaida(caminho) as caixa:
+        assert caixa.enfileirar(novo_passo(config, 'REF1')).resultado(timeout=5).codigo == 'ABC'
+    caixa.fechar()
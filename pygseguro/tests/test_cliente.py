@@ -0,0 +1,53 @@
+"""
+Módulo destinado a testar o cliente HTTP com pool de conexões
+"""
+import pytest
+import responses
+
+from pygseguro import Cliente, ConfigConta, get_cliente_padrao, set_cliente_padrao
+
+
+@pytest.fixture
+def cliente() -> Cliente:
+    cliente = Cliente(tamanho_pool=50, max_hosts=2)
+    yield cliente
+    cliente.fechar()
+
+
+def test_cliente_padrao_criado_sob_demanda():
+    """Verifica que existe um cliente padrão único"""
+    set_cliente_padrao(None)
+    assert get_cliente_padrao() is get_cliente_padrao()
+
+
+def test_config_sem_cliente_usa_padrao():
+    """Configuração sem cliente próprio deve usar o cliente padrão"""
+    cfg = ConfigConta('foo@bar.com', 'blah')
+    assert cfg.obter_cliente() is get_cliente_padrao()
+
+
+def test_config_com_cliente_proprio(cliente: Cliente):
+    """Configuração com cliente próprio não deve usar o cliente padrão"""
+    cfg = ConfigConta('foo@bar.com', 'blah', cliente=cliente)
+    assert cfg.obter_cliente() is cliente
+
+
+def test_tamanho_pool_por_host(cliente: Cliente):
+    """Verifica que o adaptador da sessão respeita o tamanho de pool configurado"""
+    adaptador = cliente.sessao.get_adapter('https://ws.pagseguro.uol.com.br')
+    assert adaptador._pool_maxsize == 50
+    assert adaptador._pool_connections == 2
+
+
+def test_sessao_reaproveitada(cliente: Cliente):
+    """A mesma sessão deve ser usada em todas as chamadas"""
+    assert cliente.sessao is cliente.sessao
+
+
+@responses.activate
+def test_criar_plano_usa_cliente_da_config(cliente: Cliente, novo_passo):
+    responses.add(responses.POST, 'https://ws.sandbox.pagseguro.uol.com.br/pre-approvals/request',
+                  json={'code': '5CDF6542C6C6D5F114674FB885E40FC0', 'date': '2019-04-29T21:38:04-03:00'}, status=200)
+    plano = novo_passo(cliente=cliente).criar_no_pagseguro()
+    assert plano.codigo == '5CDF6542C6C6D5F114674FB885E40FC0'
+    assert cliente._sessao is not None
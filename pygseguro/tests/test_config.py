@@ -50,3 +50,23 @@ def test_config_conta_url_producao(cfg_conta: ConfigConta, endpoint: str):
 def test_config_app_url_producao(cfg_app: ConfigApp, endpoint: str):
     """Testa geração de url apontado para ambiente de produção por padrão e autentação de app"""
     assert cfg_app.construir_url(endpoint) == f'https://ws.pagseguro.uol.com.br{endpoint}?appID=1234&appKey=segredo'
+
+
+def test_credenciais_codificadas_na_url():
+    """Caracteres especiais nas credenciais devem ser codificados"""
+    cfg = ConfigConta(email='foo+loja@bar.com', token='a&b=c')
+    assert cfg.construir_url('/comprar') == (
+        'https://ws.pagseguro.uol.com.br/comprar?email=foo%2Bloja@bar.com&token=a%26b%3Dc')
+
+
+def test_url_em_cache_invalidada_ao_alterar_credencial(cfg_conta: ConfigConta):
+    assert cfg_conta.construir_url('/comprar') is cfg_conta.construir_url('/comprar')
+    cfg_conta.token = 'outro'
+    assert cfg_conta.construir_url('/comprar') == (
+        'https://ws.pagseguro.uol.com.br/comprar?email=foo@bar.com&token=outro')
+
+
+def test_url_em_cache_invalidada_ao_alterar_ambiente(cfg_app: ConfigApp):
+    cfg_app.construir_url('/comprar')
+    cfg_app.ambiente = 'http://localhost:8080'
+    assert cfg_app.construir_url('/comprar') == 'http://localhost:8080/comprar?appID=1234&appKey=segredo'
@@ -0,0 +1,96 @@
+"""
+Módulo destinado a testar a busca paginada de planos e adesões
+"""
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import responses
+
+from pygseguro import BuscaRecorrente, ConfigConta, SANDBOX
+from pygseguro.exceptions import PagseguroException
+
+URL_ADESOES = 'https://ws.sandbox.pagseguro.uol.com.br/pre-approvals/'
+URL_PLANOS = 'https://ws.sandbox.pagseguro.uol.com.br/pre-approvals/request/'
+
+
+def _paginas(chave: str, total: int, por_pagina: int, paginas_pedidas: list):
+    def callback(request):
+        parametros = {nome: valores[0] for nome, valores in parse_qs(urlparse(request.url).query).items()}
+        pagina = int(parametros['page'])
+        paginas_pedidas.append((pagina, threading.current_thread().name))
+        inicio = (pagina - 1) * por_pagina
+        registros = [{'code': f'C{i}'} for i in range(inicio, min(inicio + por_pagina, total))]
+        dados = {'date': '2019-04-29T21:38:04-03:00', 'resultsInThisPage': len(registros), 'currentPage': pagina,
+                 'totalPages': -(-total // por_pagina), chave: registros}
+        return 200, {}, json.dumps(dados)
+
+    return callback
+
+
+@responses.activate
+def test_adesoes_em_varias_paginas(config: ConfigConta):
+    pedidas = []
+    responses.add_callback(responses.GET, URL_ADESOES, callback=_paginas('preApprovalList', 25, 10, pedidas),
+                           content_type='application/json')
+    busca = BuscaRecorrente(config, por_pagina=10)
+    inicio = datetime(2019, 4, 1, tzinfo=timezone(timedelta(hours=-3)))
+    adesoes = busca.adesoes(inicio, datetime(2019, 4, 30, 23, 59), status='ACTIVE')
+    assert [a['code'] for a in adesoes] == [f'C{i}' for i in range(25)]
+    assert [pagina for pagina, _ in pedidas] == [1, 2, 3]
+    # A primeira página é buscada por quem itera, as demais antecipadamente em segundo plano
+    assert all(thread.startswith('pygseguro-busca') for _, thread in pedidas[1:])
+    parametros = parse_qs(urlparse(responses.calls[0].request.url).query)
+    assert parametros['initialDate'] == ['2019-04-01T00:00-03:00']
+    assert parametros['finalDate'] == ['2019-04-30T23:59']
+    assert parametros['status'] == ['ACTIVE']
+    assert parametros['maxPageResults'] == ['10']
+    assert parametros['email'] == ['renzo@python.pro.br']
+
+
+@responses.activate
+def test_proxima_pagina_antecipada(config: ConfigConta):
+    pedidas = []
+    responses.add_callback(responses.GET, URL_PLANOS, callback=_paginas('preApprovalRequestList', 30, 10, pedidas),
+                           content_type='application/json')
+    planos = BuscaRecorrente(config, por_pagina=10).planos(datetime(2019, 1, 1), datetime(2019, 12, 31))
+    assert next(planos) == {'code': 'C0'}
+    planos.close()
+    # Encerrar a busca no meio não pede páginas além da que já estava sendo antecipada
+    assert [pagina for pagina, _ in pedidas] in ([1], [1, 2])
+
+
+@responses.activate
+def test_busca_vazia(config: ConfigConta):
+    responses.add(responses.GET, URL_ADESOES, json={'date': '2019-04-29T21:38:04-03:00', 'resultsInThisPage': 0,
+                                                    'currentPage': 1, 'totalPages': 0, 'preApprovalList': []})
+    assert list(BuscaRecorrente(config).adesoes(datetime(2019, 1, 1), datetime(2019, 1, 31))) == []
+
+
+@responses.activate
+def test_erro_do_pagseguro(config: ConfigConta):
+    responses.add(responses.GET, URL_ADESOES, status=400,
+                  json={'error': True, 'errors': {'10003': 'initialDate invalid value.'}})
+    with pytest.raises(PagseguroException) as excinfo:
+        list(BuscaRecorrente(config).adesoes(datetime(2019, 1, 1), datetime(2018, 1, 31)))
+    assert excinfo.value.erros == {'10003': 'initialDate invalid value.'}
+    assert excinfo.value.status_code == 400
+
+
+@responses.activate
+def test_buscas_e_consultas_instrumentadas(config: ConfigConta, coletor):
+    responses.add_callback(responses.GET, URL_ADESOES, callback=_paginas('preApprovalList', 3, 2, []),
+                           content_type='application/json')
+    responses.add(responses.GET, f'{URL_PLANOS}ABC', status=404, json={'error': True, 'errors': {'404': 'n.'}})
+    busca = BuscaRecorrente(config, por_pagina=2)
+    assert len(list(busca.adesoes(datetime(2019, 1, 1), datetime(2019, 1, 31)))) == 3
+    with pytest.raises(PagseguroException):
+        busca.plano('ABC')
+    assert [(e.endpoint, e.status_code, e.erro) for e in coletor.eventos] == [
+        ('/pre-approvals/', 200, None), ('/pre-approvals/', 200, None),
+        ('/pre-approvals/request/{codigo}', 404, 'PagseguroException')]
+    evento = coletor.eventos[0]
+    assert evento.ambiente == SANDBOX
+    assert evento.bytes_recebidos > 0 and evento.duracao_rede > 0 and evento.duracao_serializacao == 0
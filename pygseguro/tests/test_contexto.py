@@ -0,0 +1,177 @@
+"""
+Módulo destinado a testar a configuração local ao contexto e o cache de clientes por credencial
+"""
+import asyncio
+import threading
+
+import pytest
+import responses
+
+from pygseguro import (CacheDeClientes, Cliente, ConfigApp, ConfigConta, SANDBOX, criar_em_lote, get_cliente_padrao,
+                       get_config_padrao, set_cache_de_clientes, set_config_padrao, usar_config)
+
+URL = 'https://ws.sandbox.pagseguro.uol.com.br/pre-approvals/request'
+
+
+@pytest.fixture
+def global_():
+    config = ConfigConta('global@bar.com', 'token', SANDBOX)
+    set_config_padrao(config)
+    yield config
+    set_config_padrao(None)
+
+
+@pytest.fixture
+def loja() -> ConfigConta:
+    return ConfigConta('loja@bar.com', 'token', SANDBOX)
+
+
+def test_context_manager(global_: ConfigConta, loja: ConfigConta):
+    with usar_config(loja) as config:
+        assert config is loja
+        assert get_config_padrao() is loja
+        with usar_config(global_):
+            assert get_config_padrao() is global_
+        assert get_config_padrao() is loja
+    assert get_config_padrao() is global_
+
+
+def test_decorador(global_: ConfigConta, loja: ConfigConta):
+    @usar_config(loja)
+    def config_atual():
+        return get_config_padrao()
+
+    assert config_atual() is loja
+    assert config_atual.__name__ == 'config_atual'
+    assert get_config_padrao() is global_
+
+
+def test_decorador_async_isolado_por_tarefa(global_: ConfigConta):
+    lojas = [ConfigConta(f'loja{i}@bar.com', 'token', SANDBOX) for i in range(10)]
+
+    async def config_apos_espera():
+        await asyncio.sleep(0.01)
+        return get_config_padrao()
+
+    async def principal():
+        return await asyncio.gather(*(usar_config(loja)(config_apos_espera)() for loja in lojas))
+
+    assert asyncio.run(principal()) == lojas
+    assert get_config_padrao() is global_
+
+
+def test_isolado_por_thread(global_: ConfigConta, loja: ConfigConta):
+    vistas = []
+    dentro = threading.Event()
+    conferido = threading.Event()
+
+    def outra_thread():
+        dentro.wait()
+        vistas.append(get_config_padrao())
+        conferido.set()
+
+    thread = threading.Thread(target=outra_thread)
+    thread.start()
+    with usar_config(loja):
+        dentro.set()
+        conferido.wait()
+    thread.join()
+    assert vistas == [global_]
+
+
+def test_mesma_instancia_em_varias_threads(global_: ConfigConta, loja: ConfigConta):
+    contexto = usar_config(loja)
+    primeira_dentro = threading.Event()
+    segunda_dentro = threading.Event()
+    primeira_saiu = threading.Event()
+    vistas = []
+    erros = []
+
+    def primeira():
+        try:
+            with contexto:
+                primeira_dentro.set()
+                segunda_dentro.wait()
+            vistas.append(get_config_padrao())
+        except Exception as erro:
+            erros.append(erro)
+        primeira_saiu.set()
+
+    def segunda():
+        primeira_dentro.wait()
+        try:
+            with contexto:
+                segunda_dentro.set()
+                primeira_saiu.wait()
+                vistas.append(get_config_padrao())
+            vistas.append(get_config_padrao())
+        except Exception as erro:
+            erros.append(erro)
+
+    threads = [threading.Thread(target=primeira), threading.Thread(target=segunda)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert erros == []
+    assert vistas == [global_, loja, global_]
+
+
+def test_mesma_instancia_em_varias_tarefas(global_: ConfigConta, loja: ConfigConta):
+    contexto = usar_config(loja)
+
+    async def tarefa(espera: float):
+        with contexto:
+            await asyncio.sleep(espera)
+            return get_config_padrao()
+
+    async def principal():
+        return await asyncio.gather(tarefa(0.01), tarefa(0.02))
+
+    assert asyncio.run(principal()) == [loja, loja]
+    assert get_config_padrao() is global_
+
+
+@responses.activate
+def test_criar_em_lote_herda_config_do_contexto(loja: ConfigConta):
+    responses.add(responses.POST, URL, json={'code': 'ABC', 'date': '2019-04-29T21:38:04-03:00'})
+    payloads = [{'reference': f'R{i}', 'preApproval': {'charge': 'AUTO', 'name': 'Plano'}} for i in range(5)]
+    with usar_config(loja):
+        resultados = list(criar_em_lote(payloads, concorrencia=3))
+    assert all(r.sucesso for r in resultados)
+    assert all('email=loja@bar.com' in chamada.request.url for chamada in responses.calls)
+
+
+def test_cache_de_clientes_lru():
+    fechados = []
+
+    class ClienteRegistrado(Cliente):
+        def fechar(self):
+            fechados.append(self)
+
+    cache = CacheDeClientes(max_clientes=2, fabrica=ClienteRegistrado)
+    a = cache.obter('email:a')
+    b = cache.obter('email:b')
+    assert cache.obter('email:a') is a
+    c = cache.obter('email:c')
+    assert fechados == [b]
+    assert len(cache) == 2
+    assert cache.obter('email:a') is a
+    assert cache.obter('email:c') is c
+    cache.fechar()
+    assert len(cache) == 0
+    assert set(fechados) == {a, b, c}
+
+
+def test_config_usa_cache_de_clientes(loja: ConfigConta):
+    cache = CacheDeClientes()
+    set_cache_de_clientes(cache)
+    try:
+        cliente = loja.obter_cliente()
+        assert ConfigConta('loja@bar.com', 'outro_token').obter_cliente() is cliente
+        assert ConfigApp('app', 'chave').obter_cliente() is not cliente
+        proprio = Cliente()
+        assert ConfigConta('loja@bar.com', 'token', cliente=proprio).obter_cliente() is proprio
+    finally:
+        set_cache_de_clientes(None)
+    assert loja.obter_cliente() is get_cliente_padrao()
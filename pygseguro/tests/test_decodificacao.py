@@ -0,0 +1,87 @@
+"""
+Módulo destinado a testar a decodificação das respostas do pagseguro
+"""
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from pygseguro import decodificacao
+from pygseguro.decodificacao import decodificar_data, decodificar_json, definir_backend_json, obter_charset
+from pygseguro.exceptions import PagseguroException
+from pygseguro.plano_recorrente_automatico import UltimoPasso
+from pygseguro.transporte_async import Resposta
+
+ERRO_LATIN1 = '{"error":true,"errors":{"11003":"email inválido."}}'.encode('iso-8859-1')
+
+
+@pytest.fixture(autouse=True)
+def restaurar_backend():
+    yield
+    definir_backend_json('json')
+
+
+@pytest.mark.parametrize('headers,charset', [
+    ({'content-type': 'application/json;charset=ISO-8859-1'}, 'iso-8859-1'),
+    ({'Content-Type': 'application/json; charset="UTF-8"'}, 'utf-8'),
+    ({'content-type': 'application/json'}, 'iso-8859-1'),
+    ({}, 'iso-8859-1'),
+])
+def test_obter_charset(headers, charset):
+    assert obter_charset(headers) == charset
+
+
+def test_decodificar_latin1_sem_charset():
+    assert decodificar_json(ERRO_LATIN1, {})['errors'] == {'11003': 'email inválido.'}
+
+
+def test_decodificar_utf8():
+    conteudo = '{"nome":"ação"}'.encode('utf-8')
+    assert decodificar_json(conteudo, {'content-type': 'application/json;charset=UTF-8'}) == {'nome': 'ação'}
+
+
+def test_json_invalido():
+    with pytest.raises(ValueError):
+        decodificar_json(b'<html>503</html>', {})
+
+
+def test_backend_funcao_recebe_str_quando_nao_aceita_bytes():
+    recebidos = []
+
+    def carregar(conteudo):
+        recebidos.append(conteudo)
+        return json.loads(conteudo)
+
+    definir_backend_json(carregar, aceita_bytes=False)
+    decodificar_json(b'{"code":"ABC"}', {})
+    assert recebidos == ['{"code":"ABC"}']
+
+
+def test_backend_orjson():
+    pytest.importorskip('orjson')
+    definir_backend_json('orjson')
+    assert decodificacao._carregar_json.__module__ == 'orjson'
+    assert decodificar_json(ERRO_LATIN1, {})['errors'] == {'11003': 'email inválido.'}
+    with pytest.raises(ValueError):
+        decodificar_json(b'<html>503</html>', {})
+
+
+def test_decodificar_data_em_utc():
+    data = decodificar_data('2019-04-29T21:38:04-03:00')
+    assert data == datetime(2019, 4, 30, 0, 38, 4, tzinfo=timezone.utc)
+    assert data.tzinfo is timezone.utc
+
+
+def test_construir_plano_com_erro_latin1():
+    resposta = Resposta(400, ERRO_LATIN1, {'content-type': 'application/json;charset=ISO-8859-1'})
+    with pytest.raises(PagseguroException) as excinfo:
+        UltimoPasso._construir_plano(resposta)
+    assert excinfo.value.erros == {'11003': 'email inválido.'}
+
+
+@pytest.mark.parametrize('corpo', [b'{"date":"2019-04-29T21:38:04-03:00"}', b'{"code":"ABC"}',
+                                   b'{"code":"ABC","date":"ontem"}', b'{"code":"ABC","date":null}', b'[]', b'"ABC"'])
+def test_construir_plano_com_resposta_incompleta(corpo):
+    with pytest.raises(PagseguroException) as excinfo:
+        UltimoPasso._construir_plano(Resposta(200, corpo, {'content-type': 'application/json'}))
+    assert excinfo.value.erros == {'200': 'invalid response from pagseguro.'}
@@ -0,0 +1,148 @@
+"""
+Módulo destinado a testar a criação idempotente de planos pela referência
+"""
+import asyncio
+import json
+import threading
+from pathlib import Path
+
+import pytest
+import responses
+
+from pygseguro import ArmazenamentoEmMemoria, ArmazenamentoSqlite, Cliente, Idempotencia
+from pygseguro.exceptions import PagseguroException, TempoEsgotadoException
+
+URL = 'https://ws.sandbox.pagseguro.uol.com.br/pre-approvals/request'
+
+
+@responses.activate
+def test_repeticao_devolve_plano_guardado(novo_passo, nova_config):
+    responses.add(responses.POST, URL, json={'code': 'ABC', 'date': '2019-04-29T21:38:04-03:00'})
+    idempotencia = Idempotencia()
+    config = nova_config(Cliente(idempotencia=idempotencia))
+    primeiro = novo_passo(config, 'REF1').criar_no_pagseguro()
+    assert novo_passo(config, 'REF1').criar_no_pagseguro() == primeiro
+    assert novo_passo(config, 'REF2').criar_no_pagseguro().codigo == 'ABC'
+    assert len(responses.calls) == 2
+    assert idempotencia.estatisticas() == {'criados': 2, 'reaproveitados': 1, 'coalescidos': 0}
+
+
+@responses.activate
+def test_chamadas_simultaneas_coalescidas(novo_passo, nova_config):
+    liberar = threading.Event()
+
+    def callback(request):
+        liberar.wait()
+        return 200, {}, json.dumps({'code': 'ABC', 'date': '2019-04-29T21:38:04-03:00'})
+
+    responses.add_callback(responses.POST, URL, callback=callback, content_type='application/json')
+    idempotencia = Idempotencia()
+    config = nova_config(Cliente(idempotencia=idempotencia))
+    planos = []
+    passo = novo_passo(config, 'REF1')
+    threads = [threading.Thread(target=lambda: planos.append(passo.criar_no_pagseguro())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while idempotencia.estatisticas()['coalescidos'] < 7:
+        threading.Event().wait(0.001)
+    liberar.set()
+    for thread in threads:
+        thread.join()
+    assert len(planos) == 8 and len(set(planos)) == 1
+    assert len(responses.calls) == 1
+
+
+@responses.activate
+def test_falha_nao_e_guardada(novo_passo, nova_config):
+    responses.add(responses.POST, URL, status=400, json={'error': True, 'errors': {'11003': 'invalid.'}})
+    responses.add(responses.POST, URL, json={'code': 'ABC', 'date': '2019-04-29T21:38:04-03:00'})
+    config = nova_config(Cliente(idempotencia=Idempotencia()))
+    with pytest.raises(PagseguroException):
+        novo_passo(config, 'REF1').criar_no_pagseguro()
+    assert novo_passo(config, 'REF1').criar_no_pagseguro().codigo == 'ABC'
+
+
+def test_async_coalescido(novo_passo, nova_config, novo_transporte):
+    transporte = novo_transporte(espera=0.01, responder=lambda payload: (
+        200, {'code': f'C{len(transporte.chamadas)}', 'date': '2019-04-29T21:38:04-03:00'}))
+    config = nova_config(Cliente(idempotencia=Idempotencia(), transporte_async=transporte))
+
+    async def criar():
+        return await asyncio.gather(*(novo_passo(config, 'REF1').criar_no_pagseguro_async() for _ in range(5)),
+                                    novo_passo(config, 'REF2').criar_no_pagseguro_async())
+
+    planos = asyncio.run(criar())
+    assert len(set(planos[:5])) == 1
+    assert planos[5] != planos[0]
+    assert len(transporte.chamadas) == 2
+
+
+def test_async_cancelar_chamada_coalescida(novo_passo, nova_config, novo_transporte):
+    transporte = novo_transporte(espera=0.05)
+    config = nova_config(Cliente(idempotencia=Idempotencia(), transporte_async=transporte))
+
+    async def criar():
+        tarefas = [asyncio.ensure_future(novo_passo(config, 'REF1').criar_no_pagseguro_async()) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        tarefas[1].cancel()
+        return await asyncio.gather(*tarefas, return_exceptions=True)
+
+    lider, cancelada, seguidora = asyncio.run(criar())
+    assert isinstance(cancelada, asyncio.CancelledError)
+    assert lider.codigo == 'ABC' and seguidora == lider
+    assert len(transporte.chamadas) == 1
+
+
+def test_async_chamada_coalescida_respeita_prazo(novo_passo, nova_config, novo_transporte):
+    transporte = novo_transporte(espera=0.2)
+    config = nova_config(Cliente(idempotencia=Idempotencia(), transporte_async=transporte))
+
+    async def criar():
+        lider = asyncio.ensure_future(novo_passo(config, 'REF1').criar_no_pagseguro_async())
+        await asyncio.sleep(0.01)
+        with pytest.raises(TempoEsgotadoException):
+            await novo_passo(config, 'REF1').criar_no_pagseguro_async(prazo=0.02)
+        return await lider
+
+    assert asyncio.run(criar()).codigo == 'ABC'
+
+
+def test_async_cada_chamada_coalescida_recebe_sua_excecao(novo_passo, nova_config, novo_transporte):
+    transporte = novo_transporte(status_code=400, dados={'error': True, 'errors': {'11003': 'invalid.'}}, espera=0.01)
+    config = nova_config(Cliente(idempotencia=Idempotencia(), transporte_async=transporte))
+
+    async def criar():
+        return await asyncio.gather(*(novo_passo(config, 'REF1').criar_no_pagseguro_async() for _ in range(3)),
+                                    return_exceptions=True)
+
+    erros = asyncio.run(criar())
+    assert all(isinstance(erro, PagseguroException) and erro.erros == {'11003': 'invalid.'} for erro in erros)
+    assert len({id(erro) for erro in erros}) == 3
+    assert len(transporte.chamadas) == 1
+
+
+def test_armazenamento_em_memoria_limitado():
+    armazenamento = ArmazenamentoEmMemoria(max_itens=2)
+    for referencia in ('A', 'B', 'C'):
+        armazenamento.guardar(('email:a', referencia), referencia)
+    assert armazenamento.obter(('email:a', 'A')) is None
+    assert len(armazenamento) == 2
+
+
+@responses.activate
+def test_armazenamento_sqlite_sobrevive_a_reinicio(tmp_path: Path, novo_passo, nova_config):
+    responses.add(responses.POST, URL, json={'code': 'ABC', 'date': '2019-04-29T21:38:04-03:00'})
+    caminho = str(tmp_path / 'planos.db')
+    armazenamento = ArmazenamentoSqlite(caminho, max_itens=2)
+    plano = novo_passo(nova_config(Cliente(idempotencia=Idempotencia(armazenamento))), 'REF1').criar_no_pagseguro()
+    armazenamento.fechar()
+
+    reaberto = ArmazenamentoSqlite(caminho, max_itens=2)
+    config = nova_config(Cliente(idempotencia=Idempotencia(reaberto)))
+    assert novo_passo(config, 'REF1').criar_no_pagseguro() == plano
+    assert len(responses.calls) == 1
+    for referencia in ('B', 'C'):
+        reaberto.guardar((config.credencial(), referencia), plano)
+    assert reaberto.obter((config.credencial(), 'REF1')) is None
+    assert len(reaberto) == 2
+    reaberto.fechar()
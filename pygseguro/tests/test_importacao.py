@@ -0,0 +1,71 @@
+"""
+Módulo destinado a testar que o import da biblioteca não carrega dependências pesadas antes de uma requisição.
+Cada teste roda em um subprocesso para partir de um interpretador sem módulos já importados
+"""
+import subprocess
+import sys
+from typing import Dict
+
+import pytest
+
+_PREPARAR_PASSO = '''
+from decimal import Decimal
+config = pygseguro.ConfigConta('renzo@python.pro.br', 'token', pygseguro.SANDBOX, cliente=pygseguro.Cliente())
+passo = pygseguro.CriadorPlanoRecorrente(config).plano_automatico_idenficacao('REF', 'Plano').expiracao_em_meses(
+    10).valores_automaticos(Decimal('180.00')).frequencia_mensal()
+passo.compilar_modelo().corpo('OUTRA')
+'''
+
+
+def _executar(codigo: str) -> str:
+    resultado = subprocess.run([sys.executable, '-X', 'importtime', '-c', codigo], capture_output=True, text=True,
+                               check=True)
+    return resultado.stdout + resultado.stderr
+
+
+def _tempos_de_import(saida: str) -> Dict[str, int]:
+    """
+    :return: tempo cumulativo de import, em microssegundos, por módulo
+    """
+    tempos = {}
+    for linha in saida.splitlines():
+        if linha.startswith('import time:') and '|' in linha:
+            _, cumulativo, modulo = linha[len('import time:'):].split('|')
+            if cumulativo.strip().isdigit():
+                tempos[modulo.strip()] = int(cumulativo)
+    return tempos
+
+
+@pytest.mark.parametrize('codigo', [
+    'import pygseguro',
+    'import pygseguro; pygseguro.ConfigConta',
+    'import pygseguro\n' + _PREPARAR_PASSO,
+])
+def test_dependencias_pesadas_nao_carregadas_antes_da_requisicao(codigo):
+    tempos = _tempos_de_import(_executar(codigo))
+    assert 'pygseguro' in tempos
+    assert 'requests' not in tempos
+    assert 'pytz' not in tempos
+
+
+def test_import_da_configuracao_mais_rapido_que_requests():
+    """Comparação relativa, que independe da velocidade da máquina"""
+    tempos = _tempos_de_import(_executar('import pygseguro; pygseguro.ConfigConta; import requests'))
+    assert tempos['pygseguro'] * 5 < tempos['requests']
+
+
+def test_fachada_carrega_elementos_sob_demanda():
+    saida = _executar('import sys, pygseguro\n'
+                      'assert "pygseguro.plano_recorrente_automatico" not in sys.modules\n'
+                      'assert "CriadorPlanoRecorrente" in dir(pygseguro)\n'
+                      'from pygseguro import CriadorPlanoRecorrente\n'
+                      'assert "CriadorPlanoRecorrente" in vars(pygseguro)\n'
+                      'print("ok")')
+    assert 'ok' in saida.splitlines()
+
+
+def test_elemento_inexistente_na_fachada():
+    import pygseguro
+
+    with pytest.raises(AttributeError):
+        pygseguro.NaoExiste
@@ -0,0 +1,87 @@
+"""
+Módulo destinado a testar os ganchos de instrumentação das chamadas
+"""
+import asyncio
+import json
+import math
+
+import pytest
+import responses
+
+from pygseguro import Cliente, HistogramaEmMemoria, PoliticaRetentativa, SANDBOX, registrar_coletor, remover_coletor
+from pygseguro.exceptions import PagseguroException
+from pygseguro.instrumentacao import EventoChamada, Histograma
+
+URL = 'https://ws.sandbox.pagseguro.uol.com.br/pre-approvals/request'
+SUCESSO = {'code': 'ABC', 'date': '2019-04-29T21:38:04-03:00'}
+
+
+@responses.activate
+def test_evento_de_chamada_com_sucesso(coletor, novo_passo):
+    responses.add(responses.POST, URL, json=SUCESSO, status=200)
+    passo = novo_passo()
+    passo.criar_no_pagseguro()
+    evento, = coletor.eventos
+    assert (evento.endpoint, evento.ambiente, evento.status_code) == ('/pre-approvals/request', SANDBOX, 200)
+    assert evento.bytes_enviados == len(passo._corpo())
+    assert evento.bytes_recebidos == len(json.dumps(SUCESSO))
+    assert evento.duracao_rede > 0 and evento.duracao_serializacao >= 0 and evento.duracao_decodificacao > 0
+    assert (evento.retentativas, evento.erro) == (0, None)
+
+
+@responses.activate
+def test_evento_com_retentativas_e_erro(coletor, novo_passo):
+    responses.add(responses.POST, URL, body='<html>erro</html>', status=503)
+    politica = PoliticaRetentativa(max_tentativas=3, espera_base=0)
+    with pytest.raises(PagseguroException):
+        novo_passo(cliente=Cliente(politica_retentativa=politica)).criar_no_pagseguro()
+    evento, = coletor.eventos
+    assert (evento.status_code, evento.retentativas, evento.erro) == (503, 2, 'PagseguroException')
+
+
+def test_evento_async(coletor, novo_passo, novo_transporte):
+    asyncio.run(novo_passo(cliente=Cliente(transporte_async=novo_transporte())).criar_no_pagseguro_async())
+    assert coletor.eventos[0].status_code == 200
+
+
+@responses.activate
+def test_sem_coletor_nenhum_evento_criado(monkeypatch, novo_passo):
+    responses.add(responses.POST, URL, json=SUCESSO, status=200)
+
+    def falhar(*args):
+        raise AssertionError('Evento não deveria ser criado')
+
+    monkeypatch.setattr(EventoChamada, '__init__', falhar)
+    novo_passo().criar_no_pagseguro()
+
+
+def test_histograma_percentil():
+    histograma = Histograma([1, 2, 4])
+    for valor in (0.5, 1.5, 1.5, 3, 10):
+        histograma.observar(valor)
+    assert histograma.percentil(0.5) == 2
+    assert histograma.percentil(0.8) == 4
+    assert histograma.percentil(1) == float('inf')
+    assert histograma.exportar()['baldes'] == {1: 1, 2: 3, 4: 4, float('inf'): 5}
+
+
+@responses.activate
+def test_histograma_em_memoria_agrega(novo_passo):
+    responses.add(responses.POST, URL, json=SUCESSO, status=200)
+    histograma = HistogramaEmMemoria()
+    registrar_coletor(histograma)
+    try:
+        for _ in range(3):
+            novo_passo().criar_no_pagseguro()
+    finally:
+        remover_coletor(histograma)
+    serie = histograma.exportar()[('/pre-approvals/request', SANDBOX)]
+    assert serie['status'] == {200: 3}
+    assert serie['duracao']['rede']['total'] == 3
+    assert histograma.percentil('/pre-approvals/request', SANDBOX, 'rede', 0.99) > 0
+
+
+def test_percentil_de_serie_inexistente_nao_cria_serie():
+    histograma = HistogramaEmMemoria()
+    assert math.isnan(histograma.percentil('/pre-approvals/request', SANDBOX, 'rede', 0.99))
+    assert histograma.exportar() == {}
@@ -0,0 +1,70 @@
+"""
+Módulo destinado a testar os limitadores de taxa do tipo balde de tokens
+"""
+import multiprocessing
+import time
+
+import responses
+
+from pygseguro import Cliente, ConfigApp, ConfigConta, LimitadorPorCredencial
+from pygseguro.limitador import BaldeDeTokens, BaldeDeTokensArquivo
+
+
+def test_balde_permite_rajada_e_depois_espaca(relogio):
+    balde = BaldeDeTokens(taxa=2, capacidade=3, relogio=relogio)
+    assert [balde.reservar() for _ in range(3)] == [0, 0, 0]
+    assert balde.reservar() == 0.5
+    assert balde.reservar() == 1.0
+    relogio.agora = 10
+    assert balde.reservar() == 0
+
+
+def test_balde_arquivo_compartilha_estado(tmp_path, relogio):
+    caminho = str(tmp_path / 'conta.balde')
+    primeiro = BaldeDeTokensArquivo(caminho, taxa=1, capacidade=2, relogio=relogio)
+    segundo = BaldeDeTokensArquivo(caminho, taxa=1, capacidade=2, relogio=relogio)
+    assert primeiro.reservar() == 0
+    assert segundo.reservar() == 0
+    assert primeiro.reservar() == 1.0
+
+
+def _reservar_em_processo(caminho: str, fila) -> None:
+    balde = BaldeDeTokensArquivo(caminho, taxa=0.1, capacidade=1)
+    fila.put(balde.reservar())
+
+
+def test_balde_arquivo_entre_processos(tmp_path):
+    caminho = str(tmp_path / 'conta.balde')
+    fila = multiprocessing.Queue()
+    processos = [multiprocessing.Process(target=_reservar_em_processo, args=(caminho, fila)) for _ in range(3)]
+    for processo in processos:
+        processo.start()
+    for processo in processos:
+        processo.join()
+    esperas = sorted(fila.get() for _ in processos)
+    assert esperas[0] == 0
+    assert esperas[1] > 5
+    assert esperas[2] > 15
+
+
+def test_limitador_um_balde_por_credencial(tmp_path):
+    limitador = LimitadorPorCredencial(taxa=5)
+    conta = ConfigConta('foo@bar.com', 'blah')
+    outra_conta = ConfigConta('foo@bar.com', 'outro token')
+    app = ConfigApp('1234', 'segredo')
+    assert limitador.balde(conta.credencial()) is limitador.balde(outra_conta.credencial())
+    assert limitador.balde(conta.credencial()) is not limitador.balde(app.credencial())
+    compartilhado = LimitadorPorCredencial(taxa=5, diretorio=str(tmp_path))
+    assert isinstance(compartilhado.balde(app.credencial()), BaldeDeTokensArquivo)
+
+
+@responses.activate
+def test_cliente_passa_pelo_limitador(novo_passo):
+    responses.add(responses.POST, 'https://ws.sandbox.pagseguro.uol.com.br/pre-approvals/request',
+                  json={'code': 'ABC', 'date': '2019-04-29T21:38:04-03:00'}, status=200)
+    limitador = LimitadorPorCredencial(taxa=20, capacidade=1)
+    passo = novo_passo(cliente=Cliente(limitador=limitador))
+    inicio = time.monotonic()
+    for _ in range(4):
+        passo.criar_no_pagseguro()
+    assert time.monotonic() - inicio >= 0.15
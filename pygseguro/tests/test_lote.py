@@ -0,0 +1,89 @@
+"""
+Módulo destinado a testar a criação de planos em lote
+"""
+import asyncio
+import json
+from decimal import Decimal
+from typing import Dict
+
+import responses
+
+from pygseguro import Cliente, ConfigConta, criar_em_lote, criar_em_lote_async
+
+URL = 'https://ws.sandbox.pagseguro.uol.com.br/pre-approvals/request'
+
+
+def _responder(payload: Dict):
+    if payload['reference'].startswith('RUIM'):
+        return 400, {'error': True, 'errors': {'11003': 'receiverEmail invalid value.'}}
+    return 200, {'code': payload['reference'], 'date': '2019-04-29T21:38:04-03:00'}
+
+
+def _callback(request):
+    status, dados = _responder(json.loads(request.body))
+    return status, {}, json.dumps(dados)
+
+
+@responses.activate
+def test_criar_em_lote_com_threads(config: ConfigConta, novo_passo):
+    """Uma falha não deve interromper o lote"""
+    responses.add_callback(responses.POST, URL, callback=_callback, content_type='application/json')
+    referencias = [f'REF{i}' for i in range(20)] + ['RUIM']
+    resultados = list(criar_em_lote((novo_passo(config, referencia) for referencia in referencias), concorrencia=4))
+    assert len(resultados) == 21
+    sucessos = {r.plano.codigo for r in resultados if r.sucesso}
+    assert sucessos == {f'REF{i}' for i in range(20)}
+    falhas = [r for r in resultados if not r.sucesso]
+    assert falhas[0].erro.status_code == 400
+    assert falhas[0].item.__class__.__name__ == 'FrequenciaPlanoAutomatico'
+
+
+@responses.activate
+def test_criar_em_lote_com_payloads(config: ConfigConta):
+    responses.add_callback(responses.POST, URL, callback=_callback, content_type='application/json')
+    payloads = [{'reference': 'P1', 'preApproval': {'charge': 'AUTO', 'name': 'Plano'}}]
+    resultado, = criar_em_lote(payloads, config=config)
+    assert resultado.plano.codigo == 'P1'
+    assert resultado.item is payloads[0]
+
+
+def _payloads_com_item_invalido():
+    # Decimal passa pelo payload mas não é serializável em json: o erro não é uma PygseguroException
+    return [{'reference': 'P1', 'preApproval': {'charge': 'AUTO', 'name': 'Plano'}},
+            {'reference': 'P2', 'preApproval': {'charge': 'AUTO', 'name': 'Plano', 'amountPerPayment': Decimal('1')}},
+            {'reference': 'P3', 'preApproval': {'charge': 'AUTO', 'name': 'Plano'}}]
+
+
+@responses.activate
+def test_criar_em_lote_erro_inesperado_nao_interrompe(config: ConfigConta):
+    responses.add_callback(responses.POST, URL, callback=_callback, content_type='application/json')
+    resultados = list(criar_em_lote(_payloads_com_item_invalido(), concorrencia=1, config=config))
+    assert [r.plano.codigo for r in resultados if r.sucesso] == ['P1', 'P3']
+    falha, = [r for r in resultados if not r.sucesso]
+    assert isinstance(falha.erro, TypeError)
+    assert falha.item['reference'] == 'P2'
+
+
+def test_criar_em_lote_async_erro_inesperado_nao_interrompe(config: ConfigConta, novo_transporte):
+    config.cliente = Cliente(transporte_async=novo_transporte(espera=0.001, responder=_responder))
+
+    async def consumir():
+        return [r async for r in criar_em_lote_async(_payloads_com_item_invalido(), concorrencia=1, config=config)]
+
+    resultados = asyncio.run(consumir())
+    assert [r.plano.codigo for r in resultados if r.sucesso] == ['P1', 'P3']
+    assert isinstance(resultados[1].erro, TypeError)
+
+
+def test_criar_em_lote_async_concorrencia_limitada(config: ConfigConta, novo_passo, novo_transporte):
+    transporte = novo_transporte(espera=0.001, responder=_responder)
+    config.cliente = Cliente(transporte_async=transporte)
+    passos = (novo_passo(config, referencia) for referencia in ['RUIM'] + [f'R{i}' for i in range(50)])
+
+    async def consumir():
+        return [r async for r in criar_em_lote_async(passos, concorrencia=5)]
+
+    resultados = asyncio.run(consumir())
+    assert len(resultados) == 51
+    assert sum(1 for r in resultados if not r.sucesso) == 1
+    assert transporte.max_simultaneas == 5
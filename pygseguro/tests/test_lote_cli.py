@@ -0,0 +1,150 @@
+"""
+Módulo destinado a testar o executor de lotes pela linha de comando, contra o simulador local do pagseguro
+"""
+import csv
+import json
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from pygseguro import ConfigConta
+from pygseguro.lote import (EspecificacaoInvalida, Progresso, carregar_progresso, construir_passo, criar_linha,
+                            executar_lote, ler_especificacoes, main)
+from pygseguro.plano_recorrente_automatico import UltimoPasso
+from pygseguro.simulador import SimuladorPagseguro
+
+CAMPOS = ['referencia', 'nome', 'expiracao_unidade', 'expiracao_valor', 'valor', 'taxa_adesao', 'frequencia', 'trial',
+          'limite_de_uso', 'url_cancelamento']
+
+
+def _especificacao(i: int) -> dict:
+    return {'referencia': f'REF{i}', 'nome': 'Plano', 'expiracao_unidade': 'MONTHS', 'expiracao_valor': '10',
+            'valor': '180.00', 'taxa_adesao': '', 'frequencia': 'monthly', 'trial': '2' if i % 2 else '',
+            'limite_de_uso': '', 'url_cancelamento': ''}
+
+
+def _escrever_csv(caminho: Path, quantidade: int) -> None:
+    with open(caminho, 'w', newline='') as arquivo:
+        escritor = csv.DictWriter(arquivo, CAMPOS)
+        escritor.writeheader()
+        for i in range(1, quantidade + 1):
+            escritor.writerow(_especificacao(i))
+
+
+def _registros(caminho: Path) -> List[dict]:
+    return [json.loads(linha) for linha in caminho.read_text().splitlines()]
+
+
+def test_construir_passo():
+    especificacao = dict(_especificacao(1), taxa_adesao='30.39', limite_de_uso='100',
+                         url_cancelamento='https://seusite.com.br/cancelar')
+    passo = construir_passo(especificacao, ConfigConta('foo@bar.com', 'token'))
+    pre_approval = passo._main_data['preApproval']
+    assert pre_approval['period'] == 'MONTHLY'
+    assert pre_approval['expiration'] == {'unit': 'MONTHS', 'value': 10}
+    assert pre_approval['membershipFee'] == '30.39'
+    assert pre_approval['trialPeriodDuration'] == 2
+    assert pre_approval['cancelURL'] == 'https://seusite.com.br/cancelar'
+    assert passo._main_data['maxUses'] == 100
+
+
+@pytest.mark.parametrize('campo,valor', [('valor', 'abc'), ('valor', 'NaN'), ('taxa_adesao', 'Infinity'),
+                                         ('frequencia', 'DIARIA'), ('nome', '')])
+def test_especificacao_invalida(campo, valor):
+    with pytest.raises(EspecificacaoInvalida):
+        construir_passo(dict(_especificacao(1), **{campo: valor}), ConfigConta('foo@bar.com', 'token'))
+
+
+def test_erro_inesperado_vira_registro_de_erro(monkeypatch):
+    def falhar(self, prazo=None):
+        raise OSError('disco cheio')
+
+    monkeypatch.setattr(UltimoPasso, 'criar_no_pagseguro', falhar)
+    registro = criar_linha(7, _especificacao(7), ConfigConta('foo@bar.com', 'token'))
+    assert registro['estado'] == 'erro'
+    assert registro['erro'] == {'tipo': 'OSError', 'mensagem': 'disco cheio'}
+
+
+def test_progresso_marca_dagua():
+    progresso = Progresso()
+    for linha in (2, 3, 5):
+        progresso.concluir(linha)
+    assert progresso.marca == 0
+    progresso.concluir(1)
+    assert progresso.marca == 3
+    assert progresso.concluidas == {5}
+    assert progresso.concluida(2) and progresso.concluida(5) and not progresso.concluida(4)
+
+
+def test_ler_jsonl(tmp_path: Path):
+    entrada = tmp_path / 'planos.jsonl'
+    entrada.write_text(json.dumps({'referencia': 'A', 'valor': 10.5}) + '\n\n' + json.dumps({'referencia': 'B'}) + '\n')
+    assert list(ler_especificacoes(str(entrada))) == [(1, {'referencia': 'A', 'valor': 10.5}), (2, {'referencia': 'B'})]
+    passo = construir_passo(dict(_especificacao(1), valor=10.5), ConfigConta('a', 'b'))
+    assert passo._main_data['preApproval']['amountPerPayment'] == '10.50'
+
+
+def test_linha_de_comando(tmp_path: Path):
+    entrada, saida = tmp_path / 'planos.csv', tmp_path / 'resultados.jsonl'
+    _escrever_csv(entrada, 30)
+    with SimuladorPagseguro() as simulador:
+        codigo = main([str(entrada), str(saida), '--email', 'foo@bar.com', '--token', 'token', '--ambiente',
+                       simulador.url, '--concorrencia', '4'])
+    assert codigo == 0
+    criados = [r for r in _registros(saida) if r['estado'] == 'criado']
+    assert sorted(r['linha'] for r in criados) == list(range(1, 31))
+    assert {r['referencia'] for r in criados} == {f'REF{i}' for i in range(1, 31)}
+    assert simulador.estatisticas['requisicoes'] == 30
+
+
+def test_retomar_sem_recriar(tmp_path: Path):
+    entrada, saida = tmp_path / 'planos.csv', tmp_path / 'resultados.jsonl'
+    _escrever_csv(entrada, 10)
+    anteriores = [{'linha': 1, 'estado': 'iniciado'}, {'linha': 2, 'estado': 'iniciado'},
+                  {'linha': 3, 'estado': 'iniciado'}, {'linha': 2, 'estado': 'criado', 'codigo': 'X'},
+                  {'linha': 1, 'estado': 'erro', 'erro': {}}, {'linha': 4, 'estado': 'iniciado'}]
+    saida.write_text(''.join(json.dumps(r) + '\n' for r in anteriores) + '{"linha": 3, "esta')
+    progresso = carregar_progresso(str(saida))
+    assert (progresso.marca, progresso.iniciadas) == (2, {3, 4})
+    assert saida.read_text().endswith('"iniciado"}\n')
+
+    with SimuladorPagseguro() as simulador:
+        contagem = executar_lote(ler_especificacoes(str(entrada)), str(saida),
+                                 ConfigConta('foo@bar.com', 'token', simulador.url), concorrencia=3)
+    assert contagem == {'criado': 6, 'erro': 0, 'indeterminado': 2, 'puladas': 4}
+    assert simulador.estatisticas['requisicoes'] == 6
+    registros = _registros(saida)
+    assert {r['linha'] for r in registros if r['estado'] == 'indeterminado'} == {3, 4}
+    assert carregar_progresso(str(saida)).marca == 10
+
+
+def test_erros_e_processos(tmp_path: Path):
+    entrada, saida = tmp_path / 'planos.jsonl', tmp_path / 'resultados.jsonl'
+    especificacoes = [_especificacao(1), dict(_especificacao(2), valor='abc'), _especificacao(3)]
+    entrada.write_text(''.join(json.dumps(e) + '\n' for e in especificacoes))
+    with SimuladorPagseguro() as simulador:
+        contagem = executar_lote(ler_especificacoes(str(entrada)), str(saida),
+                                 ConfigConta('foo@bar.com', 'token', simulador.url), concorrencia=2, processos=True)
+    assert contagem == {'criado': 2, 'erro': 1, 'indeterminado': 0, 'puladas': 0}
+    erro, = [r for r in _registros(saida) if r['estado'] == 'erro']
+    assert erro['linha'] == 2
+    assert erro['erro']['tipo'] == 'EspecificacaoInvalida'
+
+
+def test_janela_limita_distancia_da_marca(tmp_path: Path):
+    entrada, saida = tmp_path / 'planos.csv', tmp_path / 'resultados.jsonl'
+    _escrever_csv(entrada, 40)
+    with SimuladorPagseguro(variacao_latencia=0.01, semente=1) as simulador:
+        executar_lote(ler_especificacoes(str(entrada)), str(saida), ConfigConta('foo@bar.com', 'token', simulador.url),
+                      concorrencia=4, janela=5)
+    marca = 0
+    concluidas = set()
+    for registro in _registros(saida):
+        if registro['estado'] == 'iniciado':
+            assert registro['linha'] - marca <= 5
+        else:
+            concluidas.add(registro['linha'])
+            while marca + 1 in concluidas:
+                marca += 1
+    assert marca == 40
@@ -0,0 +1,88 @@
+"""
+Módulo destinado a testar ramificações da cadeia de passos e modelos imutáveis de plano
+"""
+import json
+from decimal import Decimal
+
+import pytest
+
+from pygseguro import ConfigConta, CriadorPlanoRecorrente, ModeloPlanoRecorrente, SANDBOX
+
+
+@pytest.fixture
+def valores_automaticos():
+    cfg = ConfigConta('renzo@python.pro.br', '396FC29DE4A54967BF6DCADE65100E88', SANDBOX)
+    return CriadorPlanoRecorrente(cfg).plano_automatico_idenficacao(
+        'REF', 'Plano', 'Detalhes', 'renzo@python.pro.br').expiracao_em_meses(10).valores_automaticos(
+        Decimal('180.00'), Decimal('30.39'))
+
+
+def test_ramificacoes_independentes(valores_automaticos):
+    """Ramificações a partir do mesmo passo não devem sobrescrever uma à outra"""
+    mensal = valores_automaticos.frequencia_mensal()
+    anual = valores_automaticos.frequencia_anual().trial(5)
+    assert mensal._main_data['preApproval']['period'] == 'MONTHLY'
+    assert 'trialPeriodDuration' not in mensal._main_data['preApproval']
+    assert anual._main_data['preApproval']['period'] == 'YEARLY'
+    assert 'period' not in valores_automaticos._main_data['preApproval']
+
+
+def test_modelo_gera_variantes(valores_automaticos):
+    modelo = valores_automaticos.frequencia_mensal().compilar_modelo()
+    original = modelo.payload()
+    variante = modelo.payload('OUTRA', Decimal('99.9'), 7)
+    assert original['reference'] == 'REF'
+    assert original['preApproval']['amountPerPayment'] == '180.00'
+    assert 'trialPeriodDuration' not in original['preApproval']
+    assert variante['reference'] == 'OUTRA'
+    assert variante['preApproval']['amountPerPayment'] == '99.90'
+    assert variante['preApproval']['trialPeriodDuration'] == 7
+    assert variante['preApproval']['expiration'] == {'unit': 'MONTHS', 'value': 10}
+    assert variante['receiver'] == {'email': 'renzo@python.pro.br'}
+
+
+def test_modelo_isolado_do_passo(valores_automaticos):
+    """Alterações posteriores na cadeia não devem afetar o modelo compilado"""
+    mensal = valores_automaticos.frequencia_mensal()
+    modelo = mensal.compilar_modelo()
+    mensal._main_data['reference'] = 'ALTERADA'
+    assert modelo.payload()['reference'] == 'REF'
+
+
+def test_modelo_imutavel(valores_automaticos):
+    modelo = valores_automaticos.frequencia_mensal().compilar_modelo()
+    assert isinstance(modelo, ModeloPlanoRecorrente)
+    with pytest.raises(AttributeError):
+        modelo._main_data = {}
+
+
+def test_passo_a_partir_do_modelo_continua_cadeia(valores_automaticos):
+    modelo = valores_automaticos.frequencia_mensal().compilar_modelo()
+    passo = modelo.passo('X').limite_de_uso(3)
+    assert passo._main_data['maxUses'] == 3
+    assert passo._main_data['receiver'] == {'email': 'renzo@python.pro.br'}
+    assert 'maxUses' not in modelo.payload()
+
+
+def test_corpo_serializado_equivale_ao_payload(valores_automaticos):
+    passo = valores_automaticos.frequencia_mensal().trial(2)
+    assert json.loads(passo._corpo()) == passo._main_data
+
+
+def test_corpo_invalidado_ao_alterar_passo(valores_automaticos):
+    passo = valores_automaticos.frequencia_mensal()
+    passo._corpo()
+    passo._alterar_payload('YEARLY')
+    assert json.loads(passo._corpo())['preApproval']['period'] == 'YEARLY'
+
+
+def test_corpo_do_modelo_com_variantes(valores_automaticos):
+    modelo = valores_automaticos.frequencia_mensal().compilar_modelo()
+    assert json.loads(modelo.corpo('NOVA')) == modelo.payload('NOVA')
+    assert json.loads(modelo.corpo('NOVA', Decimal('10'), 3)) == modelo.payload('NOVA', Decimal('10'), 3)
+    assert modelo.passo('NOVA')._corpo() == modelo.corpo('NOVA')
+
+
+def test_corpo_com_caracteres_especiais(valores_automaticos):
+    modelo = valores_automaticos.frequencia_mensal().compilar_modelo()
+    assert json.loads(modelo.corpo('ção "aspas"'))['reference'] == 'ção "aspas"'
@@ -6,7 +6,7 @@ import pytest
 import pytz
 import responses
 
-from pygseguro import ConfigConta, CriadorPlanoRecorrente, SANDBOX, set_config_padrao
+from pygseguro import ConfigConta, CriadorPlanoRecorrente, SANDBOX, set_config_padrao, set_validacao_ativa
 from pygseguro.exceptions import PagseguroException
 
 
@@ -208,5 +208,12 @@ def test_erro_em_dado():
         'renzo.python.pro.br')
     expiracao = plano_identificacao.expiracao_em_meses(meses=10)
     freq = expiracao.valores_automaticos(Decimal('180.00'), Decimal('30.39')).frequencia_mensal()
-    with pytest.raises(PagseguroException):
-        freq.criar_no_pagseguro()
+    # Sem a validação local o e-mail inválido chega ao pagseguro, que responde com o erro
+    set_validacao_ativa(False)
+    try:
+        with pytest.raises(PagseguroException) as excinfo:
+            freq.criar_no_pagseguro()
+    finally:
+        set_validacao_ativa(True)
+    assert excinfo.value.status_code == 400
+    assert excinfo.value.erros == response_content['errors']
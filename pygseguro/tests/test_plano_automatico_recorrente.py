@@ -0,0 +1,55 @@
+"""
+Módulo destinado a testar os objetos compactos da cadeia de passos e do plano criado
+"""
+import pickle
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+from pygseguro import ConfigConta, CriadorPlanoRecorrente, SANDBOX
+from pygseguro.plano_recorrente_automatico import PlanoAutomaticoRecorrente, ResultadoLote
+
+CRIACAO = datetime(2019, 4, 30, 0, 38, 4, tzinfo=timezone.utc)
+
+
+def test_passos_sem_dict():
+    config = ConfigConta('renzo@python.pro.br', '396FC29DE4A54967BF6DCADE65100E88', SANDBOX)
+    passos = [CriadorPlanoRecorrente(config)]
+    passos.append(passos[-1].plano_automatico_idenficacao('REF', 'Plano'))
+    passos.append(passos[-1].expiracao_em_meses(10))
+    passos.append(passos[-1].valores_automaticos(Decimal('180.00')))
+    passos.append(passos[-1].frequencia_mensal())
+    passos.append(passos[-1].trial(2))
+    passos.append(passos[-1].limite_de_uso(10))
+    passos.append(passos[-1].urls_gancho('https://seusite.com.br/obrigado'))
+    for passo in passos:
+        assert not hasattr(passo, '__dict__'), type(passo).__name__
+
+
+def test_plano_igualdade_e_hash():
+    plano = PlanoAutomaticoRecorrente('5CDF6542C6C6D5F114674FB885E40FC0', CRIACAO)
+    igual = PlanoAutomaticoRecorrente('5CDF6542C6C6D5F114674FB885E40FC0', CRIACAO)
+    assert plano == igual
+    assert hash(plano) == hash(igual)
+    assert len({plano, igual}) == 1
+    assert plano != PlanoAutomaticoRecorrente('OUTRO', CRIACAO)
+    assert plano != '5CDF6542C6C6D5F114674FB885E40FC0'
+
+
+def test_plano_imutavel_e_sem_dict():
+    plano = PlanoAutomaticoRecorrente('5CDF6542C6C6D5F114674FB885E40FC0', CRIACAO)
+    assert not hasattr(plano, '__dict__')
+    with pytest.raises(AttributeError):
+        plano.codigo = 'OUTRO'
+
+
+def test_plano_pickle():
+    plano = PlanoAutomaticoRecorrente('5CDF6542C6C6D5F114674FB885E40FC0', CRIACAO)
+    recuperado = pickle.loads(pickle.dumps(plano))
+    assert recuperado == plano
+    assert recuperado.criacao.tzinfo is not None
+
+
+def test_resultado_lote_sem_dict():
+    assert not hasattr(ResultadoLote({}), '__dict__')
@@ -0,0 +1,121 @@
+"""
+Módulo destinado a testar a projeção vetorizada de cobranças e receita
+"""
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from pygseguro import Assinatura  # noqa: E402
+from pygseguro.agendamento import INTERVALOS, somar_meses  # noqa: E402
+from pygseguro.projecao import TabelaDePlanos, projetar, projetar_em_blocos  # noqa: E402
+from pygseguro.projecao import somar_meses as somar_meses_vetorizado  # noqa: E402
+
+
+def _payload(periodo, valor, taxa=None, trial=None, expiracao=None):
+    pre_approval = {'charge': 'AUTO', 'name': 'Plano', 'period': periodo, 'amountPerPayment': valor}
+    if taxa is not None:
+        pre_approval['membershipFee'] = taxa
+    if trial is not None:
+        pre_approval['trialPeriodDuration'] = trial
+    if expiracao is not None:
+        pre_approval['expiration'] = {'unit': expiracao[0], 'value': expiracao[1]}
+    return {'preApproval': pre_approval}
+
+
+def _esperado(payloads, indices, adesoes, inicio, meses):
+    """Projeção calculada assinatura a assinatura, com Assinatura"""
+    primeiro_mes = date(inicio.year, inicio.month, 1)
+    fim = somar_meses(primeiro_mes, meses)
+    totais = {}
+    for i, (indice, adesao) in enumerate(zip(indices, adesoes)):
+        payload = payloads[indice]
+        assinatura = Assinatura.do_payload(str(i), payload, adesao)
+        taxa = payload['preApproval'].get('membershipFee')
+        if taxa and primeiro_mes <= adesao < fim:
+            totais[adesao.strftime('%Y-%m')] = totais.get(adesao.strftime('%Y-%m'), 0) + Decimal(taxa)
+        k = 0
+        while True:
+            data = assinatura.data_da_cobranca(k)
+            if data is None or data >= fim:
+                break
+            if data >= primeiro_mes:
+                totais[data.strftime('%Y-%m')] = totais.get(data.strftime('%Y-%m'), 0) + assinatura.valor
+            k += 1
+    return totais
+
+
+def test_somar_meses_vetorizado():
+    inicio = date(2019, 1, 1)
+    datas = [inicio + timedelta(days=i) for i in range(800)]
+    deslocamentos = [i % 37 for i in range(800)]
+    calculadas = somar_meses_vetorizado(np.array(datas, 'datetime64[D]'), np.array(deslocamentos))
+    assert calculadas.tolist() == [somar_meses(d, m) for d, m in zip(datas, deslocamentos)]
+
+
+def test_centavos_exatos():
+    planos = TabelaDePlanos(['A', 'B'], [_payload('MONTHLY', '0.10', taxa='0.20'), _payload('MONTHLY', '0.20')])
+    indices = np.array([0, 1] * 500)
+    adesoes = np.full(1000, np.datetime64('2019-04-10'))
+    projecao = projetar(planos, indices, adesoes, date(2019, 4, 1), meses=12)
+    assert projecao.receita_centavos.tolist() == [15000] * 12
+    assert projecao.taxas_centavos.tolist() == [10000] + [0] * 11
+    assert projecao.cobrancas.tolist() == [1000] * 12
+    assert projecao.total_centavos() == 190000
+    assert projecao.por_mes()['2019-04'] == Decimal('250.00')
+
+
+@pytest.mark.parametrize('valor,taxa', [('10.005', None), ('10.00', '0.001'), ('NaN', None)])
+def test_fracao_de_centavo_rejeitada(valor, taxa):
+    with pytest.raises(ValueError):
+        TabelaDePlanos(['A'], [_payload('MONTHLY', valor, taxa=taxa)])
+
+
+def test_trial_expiracao_e_cancelamento():
+    planos = TabelaDePlanos(['A'], [_payload('MONTHLY', '10.00', trial=10, expiracao=('MONTHS', 3))])
+    projecao = projetar(planos, [0, 0], np.array(['2019-04-01', '2019-04-01'], 'datetime64[D]'), date(2019, 4, 1),
+                        meses=6, cancelamentos=np.array(['NaT', '2019-05-11'], 'datetime64[D]'))
+    # Cobranças em 11/04, 11/05 e 11/06; a cancelada só paga a de abril
+    assert projecao.cobrancas.tolist() == [2, 1, 1, 0, 0, 0]
+    assert str(projecao.meses[0]) == '2019-04'
+
+
+def test_confere_com_assinatura():
+    gerador = random.Random(7)
+    payloads = []
+    for periodo in INTERVALOS:
+        for expiracao in (None, ('DAYS', 45), ('MONTHS', 7), ('YEARS', 1)):
+            payloads.append(_payload(periodo, f'{gerador.randint(1, 99999) / 100:.2f}', taxa='15.50',
+                                     trial=gerador.choice([None, 0, 7, 31]), expiracao=expiracao))
+    planos = TabelaDePlanos([str(i) for i in range(len(payloads))], payloads)
+    indices = [gerador.randrange(len(payloads)) for _ in range(3000)]
+    adesoes = [date(2017, 1, 1) + timedelta(days=gerador.randrange(1500)) for _ in range(3000)]
+    inicio = date(2019, 2, 17)
+
+    projecao = projetar(planos, np.array(indices), np.array(adesoes, 'datetime64[D]'), inicio)
+    esperado = _esperado(payloads, indices, adesoes, inicio, 24)
+    obtido = {mes: total for mes, total in projecao.por_mes().items() if total}
+    assert len(projecao.meses) == 24
+    assert obtido == esperado
+
+
+def test_em_blocos_igual_ao_total():
+    planos = TabelaDePlanos(['A', 'B'], [_payload('WEEKLY', '3.33'), _payload('YEARLY', '99.99', taxa='1.01')])
+    indices = np.arange(10000) % 2
+    adesoes = np.datetime64('2018-01-01') + np.arange(10000) % 700
+    completa = projetar(planos, indices, adesoes, date(2019, 1, 1))
+    blocos = ((indices[i:i + 1024], adesoes[i:i + 1024]) for i in range(0, 10000, 1024))
+    em_blocos = projetar_em_blocos(planos, blocos, date(2019, 1, 1))
+    assert em_blocos.receita_centavos.tolist() == completa.receita_centavos.tolist()
+    assert em_blocos.taxas_centavos.tolist() == completa.taxas_centavos.tolist()
+    assert em_blocos.total_centavos() == completa.total_centavos()
+
+
+def test_sem_assinaturas():
+    planos = TabelaDePlanos(['A'], [_payload('MONTHLY', '10.00')])
+    projecao = projetar(planos, [], [], date(2019, 1, 1), meses=3)
+    assert projecao.total_centavos() == 0
+    assert projecao.cobrancas.tolist() == [0, 0, 0]
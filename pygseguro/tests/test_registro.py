@@ -0,0 +1,102 @@
+"""
+Módulo destinado a testar o registro de planos endereçado pelo conteúdo
+"""
+import asyncio
+import json
+import threading
+from decimal import Decimal
+from pathlib import Path
+
+import responses
+
+from pygseguro import ArmazenamentoSqlite, Cliente, RegistroDePlanos
+from pygseguro.registro import hash_do_plano
+
+URL = 'https://ws.sandbox.pagseguro.uol.com.br/pre-approvals/request'
+
+
+def test_hash_ignora_referencia_e_ordem():
+    payload = {'reference': 'A', 'preApproval': {'name': 'Plano', 'charge': 'AUTO'}}
+    reordenado = {'preApproval': {'charge': 'AUTO', 'name': 'Plano'}, 'reference': 'B'}
+    assert hash_do_plano(payload) == hash_do_plano(reordenado)
+    assert hash_do_plano(payload) != hash_do_plano({'preApproval': {'name': 'Outro', 'charge': 'AUTO'}})
+
+
+@responses.activate
+def test_plano_identico_reaproveitado(novo_passo, nova_config):
+    responses.add(responses.POST, URL, json={'code': 'ABC', 'date': '2019-04-29T21:38:04-03:00'})
+    registro = RegistroDePlanos()
+    config = nova_config(Cliente(registro_planos=registro))
+    primeiro = novo_passo(config, 'REF1').criar_no_pagseguro()
+    assert novo_passo(config, 'REF2').criar_no_pagseguro() is primeiro
+    novo_passo(config, 'REF3', valor=Decimal('99.90')).criar_no_pagseguro()
+    # A mesma definição em outra conta é um plano diferente
+    novo_passo(nova_config(Cliente(registro_planos=registro), 'outra@bar.com'), 'REF1').criar_no_pagseguro()
+    assert len(responses.calls) == 3
+    assert registro.estatisticas() == {'registrados': 3, 'reaproveitados': 1, 'coalescidos': 0}
+
+
+@responses.activate
+def test_planos_identicos_simultaneos_coalescidos(novo_passo, nova_config):
+    liberar = threading.Event()
+
+    def callback(request):
+        liberar.wait(5)
+        return 200, {}, json.dumps({'code': 'ABC', 'date': '2019-04-29T21:38:04-03:00'})
+
+    responses.add_callback(responses.POST, URL, callback=callback, content_type='application/json')
+    registro = RegistroDePlanos()
+    config = nova_config(Cliente(registro_planos=registro))
+    planos = []
+    threads = [threading.Thread(target=lambda i=i: planos.append(novo_passo(config, f'REF{i}').criar_no_pagseguro()))
+               for i in range(6)]
+    for thread in threads:
+        thread.start()
+    while registro.estatisticas()['coalescidos'] < 5:
+        threading.Event().wait(0.001)
+    liberar.set()
+    for thread in threads:
+        thread.join()
+    assert len(planos) == 6 and len(set(planos)) == 1
+    assert len(responses.calls) == 1
+    assert registro.estatisticas() == {'registrados': 1, 'reaproveitados': 0, 'coalescidos': 5}
+
+
+def test_planos_identicos_simultaneos_coalescidos_async(novo_passo, nova_config, novo_transporte):
+    transporte = novo_transporte(espera=0.01)
+    config = nova_config(Cliente(registro_planos=RegistroDePlanos(), transporte_async=transporte))
+
+    async def criar():
+        return await asyncio.gather(*(novo_passo(config, f'REF{i}').criar_no_pagseguro_async() for i in range(4)),
+                                    novo_passo(config, 'OUTRO', valor=Decimal('99.90')).criar_no_pagseguro_async())
+
+    planos = asyncio.run(criar())
+    assert len(set(planos[:4])) == 1
+    assert len(transporte.chamadas) == 2
+
+
+@responses.activate
+def test_invalidar(novo_passo, nova_config):
+    responses.add(responses.POST, URL, json={'code': 'ABC', 'date': '2019-04-29T21:38:04-03:00'})
+    registro = RegistroDePlanos()
+    config = nova_config(Cliente(registro_planos=registro))
+    novo_passo(config, 'REF1').criar_no_pagseguro()
+    registro.invalidar(novo_passo(config, 'QUALQUER'))
+    novo_passo(config, 'REF2').criar_no_pagseguro()
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+def test_registro_persistente(tmp_path: Path, novo_passo, nova_config):
+    responses.add(responses.POST, URL, json={'code': 'ABC', 'date': '2019-04-29T21:38:04-03:00'})
+    caminho = str(tmp_path / 'planos.db')
+    armazenamento = ArmazenamentoSqlite(caminho, tabela='planos_por_conteudo')
+    config = nova_config(Cliente(registro_planos=RegistroDePlanos(armazenamento)))
+    plano = novo_passo(config, 'REF1').criar_no_pagseguro()
+    armazenamento.fechar()
+
+    reaberto = ArmazenamentoSqlite(caminho, tabela='planos_por_conteudo')
+    config = nova_config(Cliente(registro_planos=RegistroDePlanos(reaberto)))
+    assert novo_passo(config, 'REF2').criar_no_pagseguro() == plano
+    assert len(responses.calls) == 1
+    reaberto.fechar()
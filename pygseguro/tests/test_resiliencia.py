@@ -0,0 +1,143 @@
+"""
+Módulo destinado a testar retentativas e o disjuntor (circuit breaker) do cliente
+"""
+import asyncio
+import json
+
+import pytest
+import requests
+import responses
+
+from pygseguro import Cliente, Disjuntor, LimitadorPorCredencial, PoliticaRetentativa
+from pygseguro.exceptions import (CircuitoAbertoException, PagseguroException, TempoEsgotadoException,
+                                  TransporteException)
+
+URL = 'https://ws.sandbox.pagseguro.uol.com.br/pre-approvals/request'
+SUCESSO = {'code': '5CDF6542C6C6D5F114674FB885E40FC0', 'date': '2019-04-29T21:38:04-03:00'}
+
+
+@pytest.fixture
+def politica() -> PoliticaRetentativa:
+    return PoliticaRetentativa(max_tentativas=3, espera_base=0, espera_maxima=0)
+
+
+def test_espera_exponencial_limitada_com_jitter():
+    politica = PoliticaRetentativa(espera_base=0.5, espera_maxima=3, aleatorio=lambda: 1.0)
+    assert [politica.espera(t) for t in range(5)] == [0.5, 1.0, 2.0, 3, 3]
+    politica_metade = PoliticaRetentativa(espera_base=0.5, espera_maxima=3, aleatorio=lambda: 0.5)
+    assert politica_metade.espera(1) == 0.5
+
+
+@responses.activate
+def test_retenta_status_temporario(politica: PoliticaRetentativa, novo_passo):
+    responses.add(responses.POST, URL, body='<html>Service Unavailable</html>', status=503)
+    responses.add(responses.POST, URL, json=SUCESSO, status=200)
+    cliente = Cliente(politica_retentativa=politica)
+    plano = novo_passo(cliente=cliente).criar_no_pagseguro()
+    assert plano.codigo == SUCESSO['code']
+    assert len(responses.calls) == 2
+    assert cliente.estatisticas()['retentativas'] == 1
+
+
+@responses.activate
+def test_nao_retenta_erro_de_dado(politica: PoliticaRetentativa, novo_passo):
+    responses.add(responses.POST, URL, json={'error': True, 'errors': {'11003': 'receiverEmail invalid value.'}},
+                  status=400)
+    with pytest.raises(PagseguroException):
+        novo_passo(cliente=Cliente(politica_retentativa=politica)).criar_no_pagseguro()
+    assert len(responses.calls) == 1
+
+
+@responses.activate
+def test_pagina_html_de_erro_vira_pagseguro_exception(novo_passo):
+    responses.add(responses.POST, URL, body='<html>Bad Gateway</html>', status=502)
+    with pytest.raises(PagseguroException) as excinfo:
+        novo_passo(cliente=Cliente()).criar_no_pagseguro()
+    assert excinfo.value.status_code == 502
+    assert '502' in excinfo.value.erros
+
+
+@responses.activate
+def test_erro_de_rede_esgota_retentativas(politica: PoliticaRetentativa, novo_passo):
+    responses.add(responses.POST, URL, body=requests.ConnectionError('conexão recusada'))
+    cliente = Cliente(politica_retentativa=politica)
+    with pytest.raises(TransporteException):
+        novo_passo(cliente=cliente).criar_no_pagseguro()
+    assert len(responses.calls) == 3
+    assert cliente.estatisticas()['erros_de_rede'] == 3
+
+
+def test_disjuntor_abre_e_fecha(relogio):
+    disjuntor = Disjuntor(limiar_erros=0.5, janela=4, minimo_chamadas=4, tempo_aberto=10, relogio=relogio)
+    for sucesso in (True, False, True, False):
+        disjuntor.permitir()
+        disjuntor.registrar(sucesso)
+    assert disjuntor.estado == Disjuntor.ABERTO
+    with pytest.raises(CircuitoAbertoException):
+        disjuntor.permitir()
+    relogio.agora = 10
+    assert disjuntor.estado == Disjuntor.MEIO_ABERTO
+    disjuntor.permitir()
+    with pytest.raises(CircuitoAbertoException):
+        disjuntor.permitir()
+    disjuntor.registrar(True)
+    assert disjuntor.estatisticas() == {'estado': Disjuntor.FECHADO, 'taxa_erros': 0.0, 'chamadas_na_janela': 0,
+                                        'aberturas': 1, 'rejeitadas': 2}
+
+
+@responses.activate
+def test_disjuntor_aberto_falha_sem_acessar_rede(novo_passo):
+    responses.add(responses.POST, URL, body='erro', status=500)
+    cliente = Cliente(disjuntor=Disjuntor(minimo_chamadas=2, janela=2))
+    for _ in range(2):
+        with pytest.raises(PagseguroException):
+            novo_passo(cliente=cliente).criar_no_pagseguro()
+    with pytest.raises(CircuitoAbertoException):
+        novo_passo(cliente=cliente).criar_no_pagseguro()
+    assert len(responses.calls) == 2
+    assert cliente.estatisticas()['disjuntor']['estado'] == Disjuntor.ABERTO
+    assert json.loads(responses.calls[0].request.body)['reference'] == 'REF'
+
+
+def _disjuntor_meio_aberto(relogio) -> Disjuntor:
+    disjuntor = Disjuntor(janela=1, minimo_chamadas=1, tempo_aberto=10, relogio=relogio)
+    disjuntor.permitir()
+    disjuntor.registrar(False)
+    relogio.agora += 10
+    assert disjuntor.estado == Disjuntor.MEIO_ABERTO
+    return disjuntor
+
+
+@responses.activate
+def test_chamada_de_teste_sem_prazo_no_limitador_reabre_o_disjuntor(novo_passo, relogio):
+    responses.add(responses.POST, URL, json=SUCESSO)
+    limitador = LimitadorPorCredencial(taxa=0.001, capacidade=1)
+    cliente = Cliente(disjuntor=_disjuntor_meio_aberto(relogio), limitador=limitador)
+    passo = novo_passo(cliente=cliente)
+    limitador.adquirir(passo._config.credencial())
+    with pytest.raises(TempoEsgotadoException):
+        passo.criar_no_pagseguro(prazo=0.5)
+    assert cliente.disjuntor.estado == Disjuntor.ABERTO
+    relogio.agora += 10
+    cliente.limitador = None
+    assert novo_passo(cliente=cliente).criar_no_pagseguro().codigo == SUCESSO['code']
+    assert cliente.disjuntor.estado == Disjuntor.FECHADO
+    assert len(responses.calls) == 1
+
+
+def test_chamada_de_teste_cancelada_reabre_o_disjuntor(novo_passo, novo_transporte, relogio):
+    transporte = novo_transporte(espera=3600)
+    cliente = Cliente(disjuntor=_disjuntor_meio_aberto(relogio), transporte_async=transporte)
+
+    async def cancelar():
+        tarefa = asyncio.ensure_future(novo_passo(cliente=cliente).criar_no_pagseguro_async())
+        while not transporte.chamadas:
+            await asyncio.sleep(0)
+        tarefa.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await tarefa
+
+    asyncio.run(cancelar())
+    assert cliente.disjuntor.estado == Disjuntor.ABERTO
+    relogio.agora += 10
+    assert cliente.disjuntor.permitir() is True
@@ -0,0 +1,76 @@
+"""
+Módulo destinado a testar o simulador local do pagseguro
+"""
+import asyncio
+import json
+import time
+
+import pytest
+import requests
+
+from pygseguro import Cliente, criar_em_lote
+from pygseguro.exceptions import PagseguroException
+from pygseguro.simulador import SimuladorPagseguro
+
+
+def test_criacao_com_sucesso(novo_passo, nova_config):
+    with SimuladorPagseguro() as simulador:
+        plano = novo_passo(nova_config(Cliente(), ambiente=simulador.url)).criar_no_pagseguro()
+    assert len(plano.codigo) == 32
+    assert plano.criacao.tzinfo is not None
+    assert simulador.estatisticas == {'requisicoes': 1, 'status': {200: 1}}
+
+
+def test_criacao_assincrona(novo_passo, nova_config):
+    with SimuladorPagseguro() as simulador:
+        cliente = Cliente()
+
+        async def criar():
+            try:
+                return await novo_passo(nova_config(cliente, ambiente=simulador.url)).criar_no_pagseguro_async()
+            finally:
+                await cliente.fechar_async()
+
+        plano = asyncio.run(criar())
+    assert len(plano.codigo) == 32
+
+
+def test_erro_de_dados(novo_passo, nova_config):
+    with SimuladorPagseguro(taxa_erro=1) as simulador:
+        with pytest.raises(PagseguroException) as excinfo:
+            novo_passo(nova_config(Cliente(), ambiente=simulador.url)).criar_no_pagseguro()
+    assert excinfo.value.status_code == 400
+    assert excinfo.value.erros == {'11003': 'receiverEmail invalid value.'}
+
+
+def test_falha_do_servidor_em_html(novo_passo, nova_config):
+    with SimuladorPagseguro(taxa_falha=1) as simulador:
+        with pytest.raises(PagseguroException) as excinfo:
+            novo_passo(nova_config(Cliente(), ambiente=simulador.url)).criar_no_pagseguro()
+    assert excinfo.value.status_code == 503
+
+
+def test_limite_de_requisicoes(novo_passo, nova_config):
+    with SimuladorPagseguro(limite_rps=5) as simulador:
+        resultados = list(criar_em_lote((novo_passo(nova_config(ambiente=simulador.url), f'R{i}') for i in range(10)),
+                                        concorrencia=1))
+    assert sum(1 for r in resultados if r.sucesso) == 5
+    assert {r.erro.status_code for r in resultados if not r.sucesso} == {429}
+
+
+def test_latencia(novo_passo, nova_config):
+    with SimuladorPagseguro(latencia=0.05) as simulador:
+        inicio = time.perf_counter()
+        novo_passo(nova_config(Cliente(), ambiente=simulador.url)).criar_no_pagseguro()
+    assert time.perf_counter() - inicio >= 0.05
+
+
+def test_credenciais_e_rotas():
+    with SimuladorPagseguro() as simulador:
+        sem_credencial = requests.post(f'{simulador.url}/pre-approvals/request', data='{}')
+        rota_invalida = requests.post(f'{simulador.url}/outra?email=a&token=b', data='{}')
+        json_invalido = requests.post(f'{simulador.url}/pre-approvals/request?appID=a&appKey=b', data='{')
+    assert sem_credencial.status_code == 401
+    assert rota_invalida.status_code == 404
+    assert json_invalido.status_code == 400
+    assert json.loads(json_invalido.content)['error'] is True
@@ -0,0 +1,90 @@
+"""
+Módulo destinado a testar timeouts e prazo total das chamadas ao pagseguro
+"""
+import asyncio
+import time
+
+import pytest
+import requests
+import responses
+
+from pygseguro import Cliente, LimitadorPorCredencial, PoliticaRetentativa
+from pygseguro.exceptions import PagseguroException, PygseguroException, TempoEsgotadoException
+
+URL = 'https://ws.sandbox.pagseguro.uol.com.br/pre-approvals/request'
+
+
+def test_tempo_esgotado_irma_de_pagseguro_exception():
+    assert issubclass(TempoEsgotadoException, PygseguroException)
+    assert not issubclass(TempoEsgotadoException, PagseguroException)
+
+
+@responses.activate
+def test_timeouts_do_cliente_enviados_ao_requests(novo_passo):
+    responses.add(responses.POST, URL, json={'code': 'ABC', 'date': '2019-04-29T21:38:04-03:00'}, status=200)
+    novo_passo(cliente=Cliente(timeout_conexao=1.5, timeout_leitura=7)).criar_no_pagseguro()
+    assert responses.calls[0].request.req_kwargs['timeout'] == (1.5, 7)
+
+
+@responses.activate
+def test_prazo_limita_timeouts(novo_passo):
+    responses.add(responses.POST, URL, json={'code': 'ABC', 'date': '2019-04-29T21:38:04-03:00'}, status=200)
+    novo_passo(cliente=Cliente(timeout_conexao=5, timeout_leitura=30)).criar_no_pagseguro(prazo=2)
+    conexao, leitura = responses.calls[0].request.req_kwargs['timeout']
+    assert conexao <= 2 and leitura <= 2
+
+
+@responses.activate
+def test_timeout_de_leitura_levanta_tempo_esgotado(novo_passo):
+    responses.add(responses.POST, URL, body=requests.ReadTimeout('lento'))
+    with pytest.raises(TempoEsgotadoException):
+        novo_passo(cliente=Cliente()).criar_no_pagseguro()
+
+
+@responses.activate
+def test_prazo_cobre_retentativas(novo_passo):
+    responses.add(responses.POST, URL, body='<html>Service Unavailable</html>', status=503)
+    politica = PoliticaRetentativa(max_tentativas=5, espera_base=1, espera_maxima=1, aleatorio=lambda: 1.0)
+    inicio = time.monotonic()
+    with pytest.raises(PagseguroException):
+        novo_passo(cliente=Cliente(politica_retentativa=politica)).criar_no_pagseguro(prazo=0.5)
+    assert time.monotonic() - inicio < 0.5
+    assert len(responses.calls) == 1
+
+
+def test_prazo_esgotado_esperando_limitador(novo_passo):
+    limitador = LimitadorPorCredencial(taxa=1, capacidade=1)
+    passo = novo_passo(cliente=Cliente(limitador=limitador))
+    balde = limitador.balde(passo._config.credencial())
+    balde.reservar()
+    inicio = time.monotonic()
+    with pytest.raises(TempoEsgotadoException):
+        passo.criar_no_pagseguro(prazo=0.2)
+    assert time.monotonic() - inicio < 0.2
+    assert balde.reservar() > 0.5, 'Tokens devolvidos não devem ser perdidos nem duplicados'
+
+
+def test_prazo_async(novo_passo, novo_transporte):
+    passo = novo_passo(cliente=Cliente(transporte_async=novo_transporte(espera=10)))
+    inicio = time.monotonic()
+    with pytest.raises(TempoEsgotadoException):
+        asyncio.run(passo.criar_no_pagseguro_async(prazo=0.1))
+    assert time.monotonic() - inicio < 1
+
+
+@pytest.mark.parametrize('timeout_conexao,timeout_leitura', [(None, 0.1), (0.1, None)])
+def test_timeout_async_com_apenas_um_limite(novo_passo, novo_transporte, timeout_conexao, timeout_leitura):
+    cliente = Cliente(transporte_async=novo_transporte(espera=10), timeout_conexao=timeout_conexao,
+                      timeout_leitura=timeout_leitura)
+    inicio = time.monotonic()
+    with pytest.raises(TempoEsgotadoException):
+        asyncio.run(novo_passo(cliente=cliente).criar_no_pagseguro_async())
+    assert time.monotonic() - inicio < 1
+
+
+def test_prazo_async_menor_que_timeout(novo_passo, novo_transporte):
+    cliente = Cliente(transporte_async=novo_transporte(espera=10), timeout_conexao=None, timeout_leitura=5)
+    inicio = time.monotonic()
+    with pytest.raises(TempoEsgotadoException):
+        asyncio.run(novo_passo(cliente=cliente).criar_no_pagseguro_async(prazo=0.1))
+    assert time.monotonic() - inicio < 1
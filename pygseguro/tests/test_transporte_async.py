@@ -0,0 +1,181 @@
+"""
+Módulo destinado a testar a criação assíncrona de planos e o transporte asyncio
+"""
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from pygseguro import Cliente, ConfigConta
+from pygseguro.exceptions import PagseguroException, TransporteException
+from pygseguro.transporte_async import TransporteAsyncio
+
+SUCESSO = json.dumps({'code': 'ABC', 'date': '2019-04-29T21:38:04-03:00'}).encode()
+RESPOSTA = (b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n' % len(SUCESSO)
+            + SUCESSO)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        corpo = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.recebidos.append((self.path, json.loads(corpo)))
+        self.server.portas_cliente.add(self.client_address[1])
+        resposta = json.dumps({'code': 'ABC', 'date': '2019-04-29T21:38:04-03:00'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json;charset=ISO-8859-1')
+        self.send_header('Content-Length', str(len(resposta)))
+        self.end_headers()
+        self.wfile.write(resposta)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor():
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    servidor.recebidos = []
+    servidor.portas_cliente = set()
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_criar_plano_async_transporte_plugavel(novo_passo, novo_transporte):
+    transporte = novo_transporte(200, {'code': 'ABC', 'date': '2019-04-29T21:38:04-03:00'})
+    cfg = ConfigConta('foo@bar.com', 'blah', 'https://exemplo', cliente=Cliente(transporte_async=transporte))
+    plano = asyncio.run(novo_passo(cfg).trial(2).criar_no_pagseguro_async())
+    assert plano.codigo == 'ABC'
+    url, payload, headers = transporte.chamadas[0]
+    assert url == 'https://exemplo/pre-approvals/request?email=foo@bar.com&token=blah'
+    assert payload['preApproval']['trialPeriodDuration'] == 2
+    assert headers['Content-Type'] == 'application/json;charset=UTF-8'
+
+
+def test_criar_plano_async_erro(novo_passo, novo_transporte):
+    transporte = novo_transporte(400, {'error': True, 'errors': {'11003': 'receiverEmail invalid value.'}})
+    cfg = ConfigConta('foo@bar.com', 'blah', 'https://exemplo', cliente=Cliente(transporte_async=transporte))
+    with pytest.raises(PagseguroException) as excinfo:
+        asyncio.run(novo_passo(cfg).criar_no_pagseguro_async())
+    assert excinfo.value.status_code == 400
+    assert excinfo.value.erros == {'11003': 'receiverEmail invalid value.'}
+
+
+def test_transporte_asyncio_reaproveita_conexao(servidor, novo_passo):
+    """Várias criações concorrentes devem compartilhar poucas conexões keep-alive"""
+    porta = servidor.server_address[1]
+    cliente = Cliente(tamanho_pool=2)
+    cfg = ConfigConta('foo@bar.com', 'blah', f'http://127.0.0.1:{porta}', cliente=cliente)
+
+    async def criar_varios():
+        planos = await asyncio.gather(*(novo_passo(cfg).criar_no_pagseguro_async() for _ in range(20)))
+        await cliente.fechar_async()
+        return planos
+
+    planos = asyncio.run(criar_varios())
+    assert [p.codigo for p in planos] == ['ABC'] * 20
+    assert len(servidor.recebidos) == 20
+    assert servidor.recebidos[0][0] == '/pre-approvals/request?email=foo@bar.com&token=blah'
+    assert len(servidor.portas_cliente) <= 2
+
+
+async def _ler_requisicao(leitor: asyncio.StreamReader) -> bool:
+    tamanho = 0
+    while True:
+        linha = await leitor.readline()
+        if not linha:
+            return False
+        if linha == b'\r\n':
+            break
+        nome, _, valor = linha.decode('latin-1').partition(':')
+        if nome.lower() == 'content-length':
+            tamanho = int(valor)
+    await leitor.readexactly(tamanho)
+    return True
+
+
+async def _com_servidor(atender, usar):
+    """Executa `usar(url)` com um servidor asyncio que trata cada conexão com `atender`"""
+    servidor = await asyncio.start_server(atender, '127.0.0.1', 0)
+    porta = servidor.sockets[0].getsockname()[1]
+    try:
+        return await usar(f'http://127.0.0.1:{porta}/pre-approvals/request')
+    finally:
+        servidor.close()
+
+
+@pytest.mark.parametrize('reenviar', [False, True])
+def test_post_enviado_em_conexao_fechada_so_reenviado_se_permitido(reenviar):
+    recebidas = []
+
+    async def atender(leitor, escritor):
+        # Responde a primeira requisição da conexão e fecha sem responder a segunda
+        while await _ler_requisicao(leitor):
+            recebidas.append(escritor)
+            if recebidas.count(escritor) == 2:
+                break
+            escritor.write(RESPOSTA)
+        escritor.close()
+
+    async def usar(url):
+        transporte = TransporteAsyncio(reenviar_apos_envio=reenviar)
+        await transporte.post(url, b'{}', {})
+        try:
+            return await transporte.post(url, b'{}', {})
+        except ConnectionError as erro:
+            return erro
+        finally:
+            await transporte.fechar()
+
+    resultado = asyncio.run(_com_servidor(atender, usar))
+    if reenviar:
+        assert resultado.status_code == 200
+        assert len(recebidas) == 3
+    else:
+        assert isinstance(resultado, ConnectionError)
+        assert len(recebidas) == 2
+
+
+def test_conexao_fechada_enquanto_ociosa_e_substituida():
+    recebidas = []
+
+    async def atender(leitor, escritor):
+        if await _ler_requisicao(leitor):
+            recebidas.append(escritor)
+            escritor.write(RESPOSTA)
+            await escritor.drain()
+        escritor.close()
+
+    async def usar(url):
+        transporte = TransporteAsyncio()
+        await transporte.post(url, b'{}', {})
+        await asyncio.sleep(0.05)
+        resposta = await transporte.post(url, b'{}', {})
+        await transporte.fechar()
+        return resposta
+
+    assert asyncio.run(_com_servidor(atender, usar)).status_code == 200
+    assert len(recebidas) == 2
+
+
+def test_resposta_http_invalida_levanta_transporte_exception(novo_passo):
+    async def atender(leitor, escritor):
+        await _ler_requisicao(leitor)
+        escritor.write(b'LIXO\r\n\r\n')
+        await escritor.drain()
+        escritor.close()
+
+    async def usar(url):
+        with pytest.raises(TransporteException):
+            await TransporteAsyncio().post(url, b'{}', {})
+        config = ConfigConta('foo@bar.com', 'blah', url.rsplit('/pre-approvals', 1)[0], cliente=Cliente())
+        with pytest.raises(TransporteException):
+            await novo_passo(config).criar_no_pagseguro_async()
+
+    asyncio.run(_com_servidor(atender, usar))
@@ -0,0 +1,91 @@
+"""
+Módulo destinado a testar a validação local dos planos, feita antes de qualquer chamada ao pagseguro
+"""
+from decimal import Decimal
+
+import pytest
+import responses
+
+from pygseguro import ConfigConta, criar_em_lote, set_validacao_ativa
+from pygseguro.exceptions import ValidacaoException
+from pygseguro.validacao import Validador, tamanho_maximo, validador_plano
+
+URL = 'https://ws.sandbox.pagseguro.uol.com.br/pre-approvals/request'
+
+
+def test_passo_completo_valido(config: ConfigConta, novo_passo):
+    passo = novo_passo(config, email='loja@bar.com').limite_de_uso(100).trial(7).urls_gancho(
+        'https://seusite.com.br/obrigado', 'https://seusite.com.br/revisar', 'https://seusite.com.br/cancelar')
+    assert validador_plano.violacoes(passo._main_data) == {}
+
+
+@responses.activate
+def test_todas_as_violacoes_sem_chamada(config: ConfigConta, novo_passo):
+    passo = novo_passo(config, nome='x' * 101, valor=Decimal('-1'), email='invalido').urls_gancho(
+        cancelamento_url='seusite/cancelar')
+    with pytest.raises(ValidacaoException) as excinfo:
+        passo.criar_no_pagseguro()
+    assert set(excinfo.value.erros) == {'preApproval.name', 'preApproval.amountPerPayment', 'receiver.email',
+                                        'preApproval.cancelURL'}
+    assert excinfo.value.status_code is None
+    assert len(responses.calls) == 0
+
+
+@pytest.mark.parametrize(
+    'payload,campo',
+    [
+        ({'preApproval': {'charge': 'AUTO'}}, 'preApproval.name'),
+        ({'preApproval': {'charge': 'SEMPRE', 'name': 'Plano'}}, 'preApproval.charge'),
+        ({'preApproval': {'charge': 'AUTO', 'name': 'Plano', 'period': 'DAILY'}}, 'preApproval.period'),
+        ({'preApproval': {'charge': 'AUTO', 'name': 'Plano', 'expiration': {'unit': 'DAYS', 'value': 0}}},
+         'preApproval.expiration.value'),
+        ({'preApproval': {'charge': 'AUTO', 'name': 'Plano'}, 'maxUses': True}, 'maxUses'),
+        ({'preApproval': {'charge': 'AUTO', 'name': 'Plano', 'amountPerPayment': 'NaN'}},
+         'preApproval.amountPerPayment'),
+        ({'preApproval': {'charge': 'AUTO', 'name': 'Plano', 'membershipFee': Decimal('sNaN')}},
+         'preApproval.membershipFee'),
+        ({'preApproval': {'charge': 'AUTO', 'name': 'Plano', 'amountPerPayment': '-Infinity'}},
+         'preApproval.amountPerPayment'),
+    ]
+)
+def test_violacao_por_campo(payload, campo):
+    assert list(validador_plano.violacoes(payload)) == [campo]
+
+
+@pytest.mark.parametrize('expiracao,ausente,presente', [({'unit': 'MONTHS'}, 'value', 'unit'),
+                                                        ({'value': 10}, 'unit', 'value')])
+def test_expiracao_incompleta(expiracao, ausente, presente):
+    payload = {'preApproval': {'charge': 'AUTO', 'name': 'Plano', 'expiration': expiracao}}
+    campo = f'preApproval.expiration.{ausente}'
+    assert validador_plano.violacoes(payload) == {campo: f'{campo} is required with preApproval.expiration.{presente}.'}
+
+
+def test_regra_entre_campos():
+    def mesmo_tamanho(payload):
+        return {} if len(payload['a']) == len(payload['b']) else {'b': 'b must have the length of a.'}
+
+    validador = Validador({'a': (True, tamanho_maximo(3)), 'b': (True, tamanho_maximo(3))}, [mesmo_tamanho])
+    assert validador.violacoes({'a': 'x', 'b': 'x'}) == {}
+    assert validador.violacoes({'a': 'x', 'b': 'xy'}) == {'b': 'b must have the length of a.'}
+    assert validador.violacoes({'a': 'x', 'b': 'xyzw'}) == {'b': 'b invalid length. Max 3 characters.'}
+
+
+@responses.activate
+def test_validacao_desligada(config: ConfigConta, novo_passo):
+    responses.add(responses.POST, URL, json={'code': 'ABC', 'date': '2019-04-29T21:38:04-03:00'})
+    set_validacao_ativa(False)
+    try:
+        plano = novo_passo(config, valor=Decimal('5000.00')).criar_no_pagseguro()
+    finally:
+        set_validacao_ativa(True)
+    assert plano.codigo == 'ABC'
+
+
+@responses.activate
+def test_criar_em_lote_reporta_violacoes(config: ConfigConta, novo_passo):
+    responses.add(responses.POST, URL, json={'code': 'ABC', 'date': '2019-04-29T21:38:04-03:00'})
+    resultados = list(criar_em_lote([novo_passo(config), novo_passo(config, valor=Decimal('0.50'))]))
+    erros = [r.erro for r in resultados if not r.sucesso]
+    assert len(erros) == 1
+    assert isinstance(erros[0], ValidacaoException)
+    assert len(responses.calls) == 1
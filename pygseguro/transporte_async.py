@@ -0,0 +1,241 @@
+"""
+Esse módulo contém os transportes assíncronos usados para conversar com a API do Pagseguro dentro de um event loop.
+
+TransporteAsync define a interface que qualquer transporte deve seguir, permitindo plugar outra implementação
+(aiohttp, httpx, etc). TransporteAsyncio é a implementação padrão, feita apenas com a biblioteca padrão, que
+mantém conexões HTTP/1.1 keep-alive reaproveitadas entre requisições para o mesmo host.
+"""
+import asyncio
+import ssl
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit
+
+from pygseguro.decodificacao import decodificar_json
+from pygseguro.exceptions import TransporteException
+
+
+class Resposta:
+    """
+    Classe que representa uma resposta HTTP já lida por completo
+    """
+
+    def __init__(self, status_code: int, conteudo: bytes, headers: Dict = None):
+        self.status_code = status_code
+        self.conteudo = conteudo
+        self.headers = {} if headers is None else headers
+
+    def __repr__(self) -> str:
+        return f'Resposta(status_code={self.status_code!r}, conteudo={len(self.conteudo)} bytes)'
+
+    @property
+    def content(self) -> bytes:
+        """
+        Conteúdo da resposta, com o mesmo nome usado pelo requests
+        """
+        return self.conteudo
+
+    def json(self) -> Dict:
+        """
+        Decodifica o conteúdo da resposta como json, com o charset informado nos cabeçalhos
+        :return: dicionário com os dados da resposta
+        """
+        return decodificar_json(self.conteudo, self.headers)
+
+
+class TransporteAsync:
+    """
+    Classe base para transportes assíncronos. Subclasses devem implementar post e fechar
+    """
+
+    async def post(self, url: str, corpo: bytes, headers: Dict) -> Resposta:
+        """
+        Metodo abstrato que deve enviar o corpo já serializado para a url
+        :param url: url completa da requisição
+        :param corpo: corpo da requisição já serializado
+        :param headers: cabeçalhos da requisição
+        :return: Resposta
+        """
+        raise NotImplementedError()
+
+    async def fechar(self) -> None:
+        """
+        Metodo que deve liberar as conexões mantidas pelo transporte
+        """
+
+
+class _ConexaoDescartada(Exception):
+    """
+    Sinaliza que uma conexão reaproveitada do pool foi fechada pelo servidor antes de responder
+    """
+
+    def __init__(self, enviada: bool):
+        """
+        :param enviada: se a requisição chegou a ser escrita na conexão, caso em que o servidor pode tê-la recebido
+        """
+        super().__init__(enviada)
+        self.enviada = enviada
+
+
+class TransporteAsyncio(TransporteAsync):
+    """
+    Transporte HTTP/1.1 implementado sobre asyncio, com pool de conexões keep-alive por host.
+
+    Cada instância fica associada ao event loop em que foi usada pela primeira vez. Caso seja usada em outro loop,
+    as conexões antigas são descartadas.
+    """
+
+    def __init__(self, tamanho_pool: int = 100, contexto_ssl: ssl.SSLContext = None,
+                 reenviar_apos_envio: bool = False):
+        """
+        :param tamanho_pool: quantidade máxima de conexões simultâneas por host
+        :param contexto_ssl: contexto ssl usado nas conexões https
+        :param reenviar_apos_envio: reenvia em outra conexão uma requisição já escrita em uma conexão reaproveitada
+        que o servidor fechou sem responder. Como o pagseguro pode ter recebido a primeira, só deve ser usado com
+        criação idempotente. Requisições que não chegaram a ser escritas são sempre reenviadas
+        """
+        self.tamanho_pool = tamanho_pool
+        self.reenviar_apos_envio = reenviar_apos_envio
+        self._contexto_ssl = contexto_ssl
+        self._loop = None
+        self._ociosas = {}
+        self._semaforos = {}
+
+    def __repr__(self) -> str:
+        return (f'TransporteAsyncio(tamanho_pool={self.tamanho_pool!r}, '
+                f'reenviar_apos_envio={self.reenviar_apos_envio!r})')
+
+    def _verificar_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            for _, escritor in (c for conexoes in self._ociosas.values() for c in conexoes):
+                escritor.close()
+            self._loop = loop
+            self._ociosas = {}
+            self._semaforos = {}
+
+    def _semaforo(self, chave: Tuple) -> asyncio.Semaphore:
+        semaforo = self._semaforos.get(chave)
+        if semaforo is None:
+            semaforo = self._semaforos[chave] = asyncio.Semaphore(self.tamanho_pool)
+        return semaforo
+
+    async def _abrir_conexao(self, chave: Tuple):
+        esquema, host, porta = chave
+        contexto = None
+        if esquema == 'https':
+            if self._contexto_ssl is None:
+                self._contexto_ssl = ssl.create_default_context()
+            contexto = self._contexto_ssl
+        return await asyncio.open_connection(host, porta, ssl=contexto)
+
+    async def post(self, url: str, corpo: bytes, headers: Dict) -> Resposta:
+        """
+        Envia o corpo reaproveitando conexões ociosas do pool
+        :param url: url completa da requisição
+        :param corpo: corpo da requisição já serializado
+        :param headers: cabeçalhos da requisição
+        :return: Resposta
+        :raises ConnectionError: se a conexão foi fechada sem resposta depois de a requisição ser enviada
+        :raises TransporteException: se a resposta não é HTTP válido
+        """
+        self._verificar_loop()
+        partes = urlsplit(url)
+        porta = partes.port or (443 if partes.scheme == 'https' else 80)
+        chave = (partes.scheme, partes.hostname, porta)
+        caminho = partes.path or '/'
+        if partes.query:
+            caminho = f'{caminho}?{partes.query}'
+        requisicao = self._montar_requisicao(caminho, partes.netloc, headers, corpo)
+        async with self._semaforo(chave):
+            ociosas = self._ociosas.setdefault(chave, [])
+            while ociosas:
+                conexao = ociosas.pop()
+                try:
+                    return await self._enviar(chave, conexao, requisicao)
+                except _ConexaoDescartada as erro:
+                    # Um POST que pode ter sido recebido não é repetido, pois criaria o plano duas vezes
+                    if erro.enviada and not self.reenviar_apos_envio:
+                        raise ConnectionError(f'Conexão reaproveitada fechada por {partes.netloc} sem resposta; '
+                                              'a requisição pode ter sido recebida') from erro
+                    continue
+            conexao = await self._abrir_conexao(chave)
+            try:
+                return await self._enviar(chave, conexao, requisicao)
+            except _ConexaoDescartada as erro:
+                raise ConnectionError(f'Conexão fechada por {partes.netloc} sem resposta') from erro
+
+    @staticmethod
+    def _montar_requisicao(caminho: str, host: str, headers: Dict, corpo: bytes) -> bytes:
+        linhas = [f'POST {caminho} HTTP/1.1', f'Host: {host}', f'Content-Length: {len(corpo)}',
+                  'Connection: keep-alive']
+        linhas.extend(f'{nome}: {valor}' for nome, valor in headers.items())
+        return ('\r\n'.join(linhas) + '\r\n\r\n').encode('latin-1') + corpo
+
+    async def _enviar(self, chave: Tuple, conexao, requisicao: bytes) -> Resposta:
+        leitor, escritor = conexao
+        if leitor.at_eof() or escritor.is_closing():
+            # Fechada pelo servidor enquanto estava ociosa: nada foi enviado
+            escritor.close()
+            raise _ConexaoDescartada(enviada=False)
+        try:
+            escritor.write(requisicao)
+            await escritor.drain()
+            linha_status = await leitor.readline()
+        except (ConnectionError, OSError) as erro:
+            escritor.close()
+            raise _ConexaoDescartada(enviada=True) from erro
+        except BaseException:
+            escritor.close()
+            raise
+        if not linha_status:
+            escritor.close()
+            raise _ConexaoDescartada(enviada=True)
+        try:
+            status_code, headers, conteudo = await self._ler_resposta(linha_status, leitor)
+        except (ValueError, IndexError) as erro:
+            escritor.close()
+            raise TransporteException(f'Resposta HTTP inválida: {linha_status[:100]!r}') from erro
+        except BaseException:
+            escritor.close()
+            raise
+        if headers.get('connection', '').lower() == 'close':
+            escritor.close()
+        else:
+            self._ociosas[chave].append(conexao)
+        return Resposta(status_code, conteudo, headers)
+
+    @staticmethod
+    async def _ler_resposta(linha_status: bytes, leitor: asyncio.StreamReader) -> Tuple[int, Dict, bytes]:
+        status_code = int(linha_status.split()[1])
+        headers = {}
+        while True:
+            linha = await leitor.readline()
+            if linha in (b'\r\n', b'\n', b''):
+                break
+            nome, _, valor = linha.decode('latin-1').partition(':')
+            headers[nome.strip().lower()] = valor.strip()
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            pedacos: List[bytes] = []
+            while True:
+                tamanho = int((await leitor.readline()).split(b';')[0], 16)
+                if tamanho == 0:
+                    await leitor.readline()
+                    break
+                pedacos.append(await leitor.readexactly(tamanho))
+                await leitor.readline()
+            conteudo = b''.join(pedacos)
+        elif 'content-length' in headers:
+            conteudo = await leitor.readexactly(int(headers['content-length']))
+        else:
+            conteudo = await leitor.read()
+            headers['connection'] = 'close'
+        return status_code, headers, conteudo
+
+    async def fechar(self) -> None:
+        """
+        Fecha todas as conexões ociosas do pool
+        """
+        for conexoes in self._ociosas.values():
+            for _, escritor in conexoes:
+                escritor.close()
+        self._ociosas = {}
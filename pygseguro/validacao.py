@@ -0,0 +1,191 @@
+"""
+Esse módulo contém a validação local dos planos, feita antes de qualquer chamada ao pagseguro.
+
+Um Validador é compilado uma única vez a partir de um esquema: os caminhos dos campos são quebrados e cada regra vira
+uma função, de forma que validar um payload é só percorrer uma lista de funções. Regras que envolvem mais de um campo,
+como unidade e valor da expiração, são funções que recebem o payload inteiro. Todas as violações são reportadas de
+uma vez, na mesma estrutura de erros usada pela API, em uma ValidacaoException.
+
+Os limites seguem a documentação da API de pagamento recorrente. A validação pode ser desligada com
+set_validacao_ativa(False), por exemplo se o pagseguro mudar algum limite antes de uma nova versão da biblioteca.
+"""
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from pygseguro.exceptions import ValidacaoException
+
+ativa = True
+
+# Recebe o valor do campo e retorna None se ele for válido ou a descrição da violação
+Verificador = Callable[[Any], Optional[str]]
+
+# Recebe o payload inteiro e retorna as violações que envolvem mais de um campo, indexadas pelo caminho do campo
+Regra = Callable[[Dict], Dict[str, str]]
+
+_EMAIL = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+_URL = re.compile(r'^https?://[^\s/?#]+\.[^\s/?#]+(?:[/?#]\S*)?$', re.IGNORECASE)
+
+
+def tamanho_maximo(maximo: int) -> Verificador:
+    def verificar(valor) -> Optional[str]:
+        if not isinstance(valor, str):
+            return 'invalid value.'
+        if len(valor) > maximo:
+            return f'invalid length. Max {maximo} characters.'
+        return None
+
+    return verificar
+
+
+def um_de(*opcoes: str) -> Verificador:
+    permitidas = frozenset(opcoes)
+    mensagem = f'invalid value. Must be one of {", ".join(opcoes)}.'
+    return lambda valor: None if valor in permitidas else mensagem
+
+
+def decimal_entre(minimo: str, maximo: str) -> Verificador:
+    minimo_decimal, maximo_decimal = Decimal(minimo), Decimal(maximo)
+
+    def verificar(valor) -> Optional[str]:
+        try:
+            numero = Decimal(valor)
+        except (InvalidOperation, TypeError, ValueError):
+            return 'invalid value.'
+        # NaN não pode ser comparado e infinitos não são valores monetários
+        if not numero.is_finite():
+            return 'invalid value.'
+        if not minimo_decimal <= numero <= maximo_decimal:
+            return f'invalid value. Must be between {minimo} and {maximo}.'
+        return None
+
+    return verificar
+
+
+def inteiro_entre(minimo: int, maximo: int) -> Verificador:
+    def verificar(valor) -> Optional[str]:
+        if not isinstance(valor, int) or isinstance(valor, bool):
+            return 'invalid value.'
+        if not minimo <= valor <= maximo:
+            return f'invalid value. Must be between {minimo} and {maximo}.'
+        return None
+
+    return verificar
+
+
+def formato(expressao: re.Pattern, maximo: int) -> Verificador:
+    verificar_tamanho = tamanho_maximo(maximo)
+
+    def verificar(valor) -> Optional[str]:
+        violacao = verificar_tamanho(valor)
+        if violacao is None and expressao.match(valor) is None:
+            return 'invalid value.'
+        return violacao
+
+    return verificar
+
+
+UNIDADES_DE_EXPIRACAO = ('DAYS', 'MONTHS', 'YEARS')
+PERIODOS = ('WEEKLY', 'MONTHLY', 'BIMONTHLY', 'TRIMONTHLY', 'SEMIANNUALLY', 'YEARLY')
+
+
+# caminho do campo -> (obrigatório, verificador)
+ESQUEMA_PLANO = {
+    'reference': (False, tamanho_maximo(200)),
+    'preApproval.charge': (True, um_de('AUTO', 'MANUAL')),
+    'preApproval.name': (True, tamanho_maximo(100)),
+    'preApproval.details': (False, tamanho_maximo(255)),
+    'preApproval.period': (False, um_de(*PERIODOS)),
+    'preApproval.amountPerPayment': (False, decimal_entre('1.00', '2000.00')),
+    'preApproval.membershipFee': (False, decimal_entre('0.00', '1000000.00')),
+    'preApproval.trialPeriodDuration': (False, inteiro_entre(1, 1000000)),
+    'preApproval.expiration.value': (False, inteiro_entre(1, 1000000)),
+    'preApproval.expiration.unit': (False, um_de(*UNIDADES_DE_EXPIRACAO)),
+    'preApproval.cancelURL': (False, formato(_URL, 255)),
+    'redirectURL': (False, formato(_URL, 255)),
+    'reviewURL': (False, formato(_URL, 255)),
+    'maxUses': (False, inteiro_entre(1, 1000000)),
+    'receiver.email': (False, formato(_EMAIL, 60)),
+}
+
+
+def expiracao_completa(payload: Dict) -> Dict[str, str]:
+    """
+    A expiração só tem sentido com unidade e valor: um sem o outro é rejeitado pelo pagseguro
+    """
+    pre_approval = payload.get('preApproval')
+    expiracao = pre_approval.get('expiration') if isinstance(pre_approval, dict) else None
+    if not isinstance(expiracao, dict):
+        return {}
+    erros = {}
+    for campo, outro in (('unit', 'value'), ('value', 'unit')):
+        if expiracao.get(campo) is not None and expiracao.get(outro) is None:
+            caminho = f'preApproval.expiration.{outro}'
+            erros[caminho] = f'{caminho} is required with preApproval.expiration.{campo}.'
+    return erros
+
+
+REGRAS_PLANO = (expiracao_completa,)
+
+_AUSENTE = object()
+
+
+class Validador:
+    """
+    Validador compilado a partir de um esquema de campos e de regras que envolvem mais de um campo
+    """
+
+    def __init__(self, esquema: Dict[str, Tuple[bool, Verificador]], regras: Iterable[Regra] = ()):
+        """
+        :param esquema: caminho do campo separado por pontos -> (obrigatório, verificador)
+        :param regras: funções que recebem o payload e retornam as violações entre campos
+        """
+        self._campos = tuple((caminho, tuple(caminho.split('.')), obrigatorio, verificador)
+                             for caminho, (obrigatorio, verificador) in esquema.items())
+        self._regras = tuple(regras)
+
+    @staticmethod
+    def _obter(payload: Dict, chaves: Tuple[str, ...]):
+        valor = payload
+        for chave in chaves:
+            if not isinstance(valor, dict):
+                return _AUSENTE
+            valor = valor.get(chave, _AUSENTE)
+            if valor is _AUSENTE:
+                return _AUSENTE
+        return valor
+
+    def violacoes(self, payload: Dict) -> Dict[str, str]:
+        """
+        Valida o payload
+        :param payload: payload no formato enviado ao pagseguro
+        :return: campo -> descrição da violação. Vazio se o payload é válido
+        """
+        erros = {}
+        for caminho, chaves, obrigatorio, verificador in self._campos:
+            valor = self._obter(payload, chaves)
+            if valor is _AUSENTE or valor is None:
+                if obrigatorio:
+                    erros[caminho] = f'{caminho} is required.'
+                continue
+            violacao = verificador(valor)
+            if violacao is not None:
+                erros[caminho] = f'{caminho} {violacao}'
+        for regra in self._regras:
+            # A violação do próprio campo, mais específica, prevalece sobre a da regra
+            for caminho, violacao in regra(payload).items():
+                erros.setdefault(caminho, violacao)
+        return erros
+
+    def validar(self, payload: Dict) -> None:
+        """
+        Valida o payload levantando todas as violações de uma vez
+        :param payload: payload no formato enviado ao pagseguro
+        :raises ValidacaoException: se houver ao menos uma violação
+        """
+        erros = self.violacoes(payload)
+        if erros:
+            raise ValidacaoException({'error': True, 'errors': erros})
+
+
+validador_plano = Validador(ESQUEMA_PLANO, REGRAS_PLANO)
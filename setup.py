@@ -133,5 +133,13 @@ setup(
     install_requires=[
 
     ],
+    extras_require={
+        'projecao': ['numpy'],
+    },
+    entry_points={
+        'console_scripts': [
+            'pygseguro-lote = pygseguro.lote:main',
+        ],
+    },
     zip_safe=False,
 )